@@ -0,0 +1,59 @@
+# benchmarks/bench_beo_engine.py
+# BEO computation on synthetic events of 10 to 1,000 menu items, with no
+# database or Qt involved: scaling, per-item unit display, shopping list
+# consolidation and allergens.
+#
+#   python -m benchmarks.bench_beo_engine [--sizes 10 100 1000]
+import argparse
+import datetime
+import random
+import timeit
+
+from controllers.beo_engine import Event, RecipeData, compute_beo
+from models.allergens import ALLERGENS, allergen_mask
+
+UOMS = ['oz', 'oz', 'oz', 'ea', 'ea', 'fl oz', 'lb', 'grams', 'slices', 'cup', 'tsp', 'qt']
+CATEGORIES = ["Appetizers", "Entrees", "Sides", "Desserts", "Beverages", None]
+
+
+def synthetic_recipes(count, master_ingredients=500, lines_per_recipe=12):
+    random.seed(0)
+    recipes = {}
+    for recipe_id in range(1, count + 1):
+        ingredients = tuple(
+            (master_id, f"Ingredient {master_id}", random.uniform(0.1, 8), random.choice(UOMS))
+            for master_id in random.sample(range(1, master_ingredients + 1), lines_per_recipe)
+        )
+        allergens = frozenset(random.sample(ALLERGENS, random.randint(0, 3)))
+        # With the mask set, as fetch_recipes reads it from the recipe row
+        recipes[recipe_id] = RecipeData(
+            recipe_id,
+            f"Recipe {recipe_id}",
+            random.choice(CATEGORIES),
+            "Synthetic menu item",
+            ingredients,
+            allergens,
+            allergen_mask=allergen_mask(allergens)
+        )
+    return recipes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the headless BEO engine")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="menu items per event")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per size; the best is reported")
+    args = parser.parse_args()
+
+    event = Event("Benchmark", datetime.date.today(), 250, "")
+    for size in args.sizes:
+        recipes = synthetic_recipes(size)
+        selections = [(recipe_id, random.randint(1, 200)) for recipe_id in recipes]
+        best = min(timeit.repeat(lambda: compute_beo(event, selections, recipes), number=1, repeat=args.repeat))
+        result = compute_beo(event, selections, recipes)
+        lines = sum(len(recipe.ingredients) for recipe in recipes.values())
+        print(f"{size:>6} items  {lines:>6} lines  {len(result.shopping_list):>5} shopping lines  "
+              f"{best * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
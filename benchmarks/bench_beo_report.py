@@ -0,0 +1,73 @@
+# benchmarks/bench_beo_report.py
+# BEO PDF rendering in pages per second: styles and table styles rebuilt for
+# every render and every table, as the renderer used to, against the shared
+# report template. Events are synthetic and rendered in memory. With
+# --workers, the same events are also rendered in parallel sections.
+#
+#   python -m benchmarks.bench_beo_report [--sizes 10 100 500] [--workers N]
+import argparse
+import datetime
+import io
+import random
+import re
+import time
+
+from reportlab.platypus import Table, TableStyle
+
+from benchmarks.bench_beo_engine import synthetic_recipes
+from controllers.beo_engine import Event, compute_beo
+from controllers.beo_report import ReportTemplate, render_beo_pdf, report_template
+
+PAGE_OBJECT = re.compile(rb"/Type /Page\b(?!s)")
+
+
+class LegacyTemplate(ReportTemplate):
+    # A fresh TableStyle per table, as before the template layer
+    def quantity_table(self, header, rows):
+        return Table(
+            [header] + rows,
+            colWidths=self.quantity_col_widths,
+            style=TableStyle(self.quantity_table_style.getCommands())
+        )
+
+
+def render(result, template_factory, workers=1):
+    buffer = io.BytesIO()
+    render_beo_pdf(result, buffer, template_factory(), workers)
+    return len(PAGE_OBJECT.findall(buffer.getvalue()))
+
+
+def pages_per_second(result, template_factory, repeat, workers=1):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pages = render(result, template_factory, workers)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return pages, pages / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BEO PDF rendering")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500], help="menu items per event")
+    parser.add_argument("--repeat", type=int, default=3, help="renders per size; the best is reported")
+    parser.add_argument("--workers", type=int, default=1, help="also render in parallel sections (needs pypdf)")
+    args = parser.parse_args()
+
+    event = Event("Benchmark", datetime.date.today(), 250, "")
+    for size in args.sizes:
+        recipes = synthetic_recipes(size)
+        selections = [(recipe_id, random.randint(1, 200)) for recipe_id in recipes]
+        result = compute_beo(event, selections, recipes)
+        pages, before = pages_per_second(result, LegacyTemplate, args.repeat)
+        _, after = pages_per_second(result, report_template, args.repeat)
+        line = (f"{size:>6} items  {pages:>5} pages  before {before:8.1f} pages/s  "
+                f"after {after:8.1f} pages/s  ({after / before:.2f}x)")
+        if args.workers > 1:
+            _, parallel = pages_per_second(result, report_template, args.repeat, args.workers)
+            line += f"  {args.workers} workers {parallel:8.1f} pages/s"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
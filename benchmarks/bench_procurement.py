@@ -0,0 +1,85 @@
+# benchmarks/bench_procurement.py
+# The cross-event procurement rollup for a quarter of synthetic events, in a
+# scratch database: recipes with realistic unit spellings, and events with
+# menus of 10 to --max-items items spread over 91 days. Range totals alone
+# and with the per-day and per-event breakdowns are timed separately.
+#
+#   python -m benchmarks.bench_procurement [--events 200] [--recipes 2000] [--max-items 30]
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+from benchmarks.bench_beo_engine import UOMS
+from controllers.procurement import procurement_report
+from models.database import Database
+from models.models import Event, EventItem, Ingredient, MasterIngredient, Recipe
+
+
+def populate(session, recipes, events, max_items=30, master_ingredients=800, lines_per_recipe=12):
+    random.seed(0)
+    session.execute(insert(MasterIngredient), [
+        {"id": master_id, "name": f"Ingredient {master_id}"}
+        for master_id in range(1, master_ingredients + 1)
+    ])
+    session.execute(insert(Recipe), [
+        {"id": recipe_id, "name": f"Recipe {recipe_id}", "category": "Entrees"}
+        for recipe_id in range(1, recipes + 1)
+    ])
+    session.execute(insert(Ingredient), [
+        {"recipe_id": recipe_id, "ingredient": f"Ingredient {master_id}", "quantity": random.uniform(0.1, 8),
+         "uom": random.choice(UOMS), "master_ingredient_id": master_id}
+        for recipe_id in range(1, recipes + 1)
+        for master_id in random.sample(range(1, master_ingredients + 1), lines_per_recipe)
+    ])
+    start = datetime.date(2026, 1, 1)
+    session.execute(insert(Event), [
+        {"id": event_id, "name": f"Event {event_id}", "event_date": start + datetime.timedelta(days=random.randrange(91)),
+         "guest_count": random.randint(20, 400), "status": random.choice(["draft", "confirmed", "confirmed"])}
+        for event_id in range(1, events + 1)
+    ])
+    session.execute(insert(EventItem), [
+        {"event_id": event_id, "recipe_id": recipe_id, "quantity": random.randint(10, 400), "position": position}
+        for event_id in range(1, events + 1)
+        for position, recipe_id in enumerate(random.sample(range(1, recipes + 1), random.randint(10, max_items)))
+    ])
+    session.commit()
+    return start, start + datetime.timedelta(days=90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the procurement rollup")
+    parser.add_argument("--events", type=int, default=200, help="events in the quarter")
+    parser.add_argument("--recipes", type=int, default=2000, help="recipes to draw menus from")
+    parser.add_argument("--max-items", type=int, default=30, help="most menu items per event")
+    parser.add_argument("--repeat", type=int, default=5, help="runs; the best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        database = Database(os.path.join(work_dir, "procurement.db"))
+        session = database.new_session()
+        try:
+            start, end = populate(session, args.recipes, args.events, args.max_items)
+            lines = session.query(EventItem).count()
+            for label, breakdowns in (("totals only", False), ("with breakdowns", True)):
+                best = None
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    report = procurement_report(session, start, end, by_day=breakdowns, by_event=breakdowns)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                rows = sum(len(day) for day in report.by_day.values()) + sum(
+                    len(event) for event in report.by_event.values())
+                print(f"{len(report.events)} events  {lines} menu items  {len(report.totals)} totals  "
+                      f"{rows:>6} breakdown lines  {label:<16} {best * 1000:8.1f} ms")
+        finally:
+            session.close()
+            database.dispose()
+
+
+if __name__ == '__main__':
+    main()
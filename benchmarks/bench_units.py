@@ -0,0 +1,89 @@
+# benchmarks/bench_units.py
+# Unit conversion per ingredient line: the original convert_units, which
+# rebuilt its table on every call, against the compiled registry one line at
+# a time and as a batch.
+#
+#   python -m benchmarks.bench_units [--lines N]
+import argparse
+import random
+import timeit
+
+from utils.unit_converter import convert_units
+from utils.units import units
+
+
+def legacy_convert_units(quantity, uom):
+    # convert_units as it was before the unit registry, kept for comparison
+    uom = uom.lower().strip()
+    if uom.endswith('es'):
+        uom = uom[:-2]
+    elif uom.endswith('s'):
+        uom = uom[:-1]
+
+    conversions = {
+        'fl oz': {'conversion_factor': 128, 'new_uom': 'gallon'},
+        'oz': {'conversion_factor': 16, 'new_uom': 'pound'},
+        'tsp': {'conversion_factor': 3, 'new_uom': 'tbsp'},
+        'tbsp': {'conversion_factor': 16, 'new_uom': 'cup'},
+        'cup': {'conversion_factor': 4, 'new_uom': 'quart'},
+        'quart': {'conversion_factor': 4, 'new_uom': 'gallon'},
+        'ml': {'conversion_factor': 1000, 'new_uom': 'liter'},
+        'cl': {'conversion_factor': 100, 'new_uom': 'liter'},
+        'gram': {'conversion_factor': 1000, 'new_uom': 'kg'},
+        'kg': {'conversion_factor': 2.205, 'new_uom': 'pound'},
+        'stick': {'conversion_factor': 4, 'new_uom': 'cup'},
+        'pinch': {'conversion_factor': 4, 'new_uom': 'tsp'},
+        'dash': {'conversion_factor': 8, 'new_uom': 'tsp'},
+        'pint': {'conversion_factor': 2, 'new_uom': 'quart'},
+        'gallon': {'conversion_factor': 4, 'new_uom': 'quart'}
+    }
+
+    if uom in conversions:
+        conversion_factor = conversions[uom]['conversion_factor']
+        new_uom = conversions[uom]['new_uom']
+        if quantity >= conversion_factor:
+            new_quantity = quantity / conversion_factor
+            if new_quantity > 1:
+                new_uom = f"{new_uom}s"
+            return new_quantity, new_uom
+
+    if quantity > 1:
+        uom = f"{uom}s"
+    return quantity, uom
+
+
+# Roughly the mix of units in the sample database
+UOMS = ['oz'] * 8 + ['ea'] * 5 + ['fl oz'] * 2 + ['lb'] * 2 + ['grams', 'slices', 'pt', 'cup', 'tsp', 'qt', 'can']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark unit conversion per ingredient line")
+    parser.add_argument("--lines", type=int, default=10000, help="ingredient lines to convert")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per variant; the best is reported")
+    args = parser.parse_args()
+
+    random.seed(0)
+    lines = [(random.uniform(0.1, 200), random.choice(UOMS)) for _ in range(args.lines)]
+
+    def legacy():
+        for quantity, uom in lines:
+            legacy_convert_units(quantity, uom)
+
+    def per_line():
+        for quantity, uom in lines:
+            convert_units(quantity, uom)
+
+    def batch():
+        units.to_base_batch(lines)
+
+    print(f"{args.lines} lines, best of {args.repeat}")
+    baseline = None
+    for name, func in (('legacy convert_units', legacy), ('convert_units', per_line),
+                       ('UnitRegistry.to_base_batch', batch)):
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"  {name:<28} {best * 1000:8.2f} ms  {best / args.lines * 1e6:6.2f} us/line  {baseline / best:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
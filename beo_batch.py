@@ -0,0 +1,221 @@
+# beo_batch.py
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from controllers.beo_engine import Event, compute_beo, fetch_recipes
+from controllers.beo_export import FORMATS, export_beo, export_filename
+from controllers.beo_report import render_beo_pdf, report_filename
+from models.database import Database
+from models.loaders import recipe_ids_by_name
+
+# Input: JSON, either a list of events or {"events": [...]}, each like
+#   {"name": "Smith Wedding", "date": "2026-10-24", "guest_count": 180,
+#    "special_requirements": "", "items": [{"recipe": "BBQ Meatballs", "quantity": 20},
+#                                          {"recipe_id": 12, "quantity": 180}]}
+# or CSV with one row per menu item, grouped into events by name and date:
+#   event,date,guest_count,special_requirements,recipe,quantity
+CSV_COLUMNS = ["event", "date", "guest_count", "special_requirements", "recipe", "quantity"]
+
+
+class EventSpec:
+    # One event as read from the input file, before recipes are resolved
+    def __init__(self, name, date, guest_count, special_requirements, items):
+        self.name = name
+        self.date = date
+        self.guest_count = guest_count
+        self.special_requirements = special_requirements
+        # [(recipe name or None, recipe id or None, quantity), ...]
+        self.items = items
+        self.error = None
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("events", [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of events")
+    specs = []
+    for number, entry in enumerate(data, 1):
+        if not isinstance(entry, dict):
+            # Reported as a failed event; the others still run
+            spec = EventSpec(f"Event {number}", None, None, "", [])
+            spec.error = f"Not an event object: {entry!r:.60}"
+            specs.append(spec)
+            continue
+        name = str(entry.get("name") or f"Event {number}")
+        spec = EventSpec(name, entry.get("date"), entry.get("guest_count"),
+                         entry.get("special_requirements") or "", [])
+        try:
+            for item in entry.get("items", []):
+                spec.items.append((item.get("recipe"), item.get("recipe_id"), item["quantity"]))
+        except (KeyError, TypeError, AttributeError) as e:
+            spec.error = f"Malformed items: {e}"
+        specs.append(spec)
+    return specs
+
+
+def read_csv(path):
+    specs = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+        for row in reader:
+            key = (row["event"].strip(), row["date"].strip())
+            spec = specs.get(key)
+            if spec is None:
+                spec = specs[key] = EventSpec(key[0], key[1], row["guest_count"],
+                                              row["special_requirements"] or "", [])
+            spec.items.append((row["recipe"].strip(), None, row["quantity"]))
+    return list(specs.values())
+
+
+def read_events(path):
+    if path.lower().endswith(".csv"):
+        return read_csv(path)
+    return read_json(path)
+
+
+def resolve(spec, recipe_ids):
+    # (Event, [(recipe id, quantity), ...]) for a spec; raises ValueError
+    if spec.error:
+        raise ValueError(spec.error)
+    try:
+        date = datetime.date.fromisoformat(str(spec.date))
+    except ValueError:
+        raise ValueError(f"Invalid date '{spec.date}' (expected YYYY-MM-DD)")
+    try:
+        guest_count = int(spec.guest_count)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid guest count '{spec.guest_count}'")
+    selections = []
+    unknown = []
+    for recipe_name, recipe_id, quantity in spec.items:
+        if recipe_id is None:
+            recipe_id = recipe_ids.get(recipe_name)
+        if recipe_id is None:
+            unknown.append(str(recipe_name))
+            continue
+        try:
+            selections.append((int(recipe_id), int(quantity)))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid quantity '{quantity}' for {recipe_name or recipe_id}")
+    if unknown:
+        raise ValueError(f"Unknown menu items: {', '.join(unknown)}")
+    if not selections:
+        raise ValueError("No menu items")
+    return Event(spec.name, date, guest_count, spec.special_requirements), selections
+
+
+def render_event(event, selections, recipes, path, fmt="pdf"):
+    # Runs in a worker process; returns (compute seconds, render seconds)
+    started = time.perf_counter()
+    result = compute_beo(event, selections, recipes)
+    computed = time.perf_counter()
+    if fmt == "pdf":
+        render_beo_pdf(result, path)
+    else:
+        export_beo(result, path, fmt)
+    return computed - started, time.perf_counter() - computed
+
+
+def output_paths(specs, out_dir, fmt="pdf"):
+    # One file per event; a repeated event name gets a numbered suffix
+    used = set()
+    paths = []
+    for spec in specs:
+        filename = report_filename(spec.name) if fmt == "pdf" else export_filename(spec.name, fmt)
+        path = os.path.join(out_dir, filename)
+        stem, extension = os.path.splitext(path)
+        number = 2
+        while path in used:
+            path = f"{stem}_{number}{extension}"
+            number += 1
+        used.add(path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate BEO reports for a file of events")
+    parser.add_argument("events", help="JSON or CSV file of events and their menu items")
+    parser.add_argument("--out", default=".", help="directory for the output files (default: current directory)")
+    parser.add_argument("--format", choices=["pdf"] + list(FORMATS), default="pdf",
+                        help="PDF report, or BEO data as an XLSX workbook, JSON Lines or a CSV "
+                             "shopping list (default: pdf)")
+    parser.add_argument("--db", help="path to the SQLite database (defaults to the configured one)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    batch_started = time.perf_counter()
+    try:
+        specs = read_events(args.events)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read {args.events}: {e}", file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    # Resolve names and load every recipe once, in the parent; workers get
+    # plain data and never open the database
+    database = Database(args.db)
+    session = database.new_session()
+    try:
+        recipe_ids = recipe_ids_by_name(
+            session, {name for spec in specs for name, recipe_id, _ in spec.items if recipe_id is None}
+        )
+        jobs = []
+        failures = []
+        for spec, path in zip(specs, output_paths(specs, args.out, args.format)):
+            try:
+                event, selections = resolve(spec, recipe_ids)
+            except ValueError as e:
+                failures.append((spec.name, str(e)))
+                continue
+            jobs.append((event, selections, path))
+        recipes = fetch_recipes(session, {recipe_id for _, selections, _ in jobs for recipe_id, _ in selections})
+    finally:
+        session.close()
+        database.dispose()
+
+    for name, message in failures:
+        print(f"FAIL  {name}: {message}")
+
+    succeeded = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            pool.submit(
+                render_event, event, selections,
+                {recipe_id: recipes[recipe_id] for recipe_id, _ in selections if recipe_id in recipes},
+                path,
+                args.format
+            ): (event, path)
+            for event, selections, path in jobs
+        }
+        for future in as_completed(futures):
+            event, path = futures[future]
+            try:
+                compute_seconds, render_seconds = future.result()
+            except Exception as e:
+                failures.append((event.name, str(e)))
+                print(f"FAIL  {event.name}: {e}")
+                continue
+            succeeded += 1
+            print(f"OK    {event.name}: compute {compute_seconds * 1000:.1f} ms, "
+                  f"render {render_seconds * 1000:.1f} ms -> {path}")
+
+    elapsed = time.perf_counter() - batch_started
+    print(f"{succeeded} generated, {len(failures)} failed in {elapsed:.2f} s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
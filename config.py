@@ -0,0 +1,15 @@
+# config.py
+import os
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# SQLite database file. Resolved against the project directory rather than the
+# working directory; FEAST_MASTER_DB overrides it per deployment or per tool.
+DATABASE_PATH = os.environ.get(
+    "FEAST_MASTER_DB",
+    os.path.join(PROJECT_DIR, "banquet_planning.db")
+)
+
+# Named SQLite tuning profile applied to every connection (see
+# models/database.py for the available profiles)
+SQLITE_PROFILE = os.environ.get("FEAST_MASTER_SQLITE_PROFILE", "desktop")
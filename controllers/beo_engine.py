@@ -0,0 +1,114 @@
+from collections import namedtuple
+from itertools import chain, repeat
+from operator import itemgetter, mul
+
+from models.allergens import allergen_mask, allergen_names, unlisted_allergens
+from models.loaders import CHUNK_SIZE
+from models.models import Recipe
+from models.recipe_graph import YIELD_COLUMNS, recipe_flattener, recipe_yield
+from utils.scaling import menu_batches, portions_per_batch
+from utils.shopping_list import consolidate_base
+from utils.units import units
+
+# Everything here is plain data, so results can cross threads and processes
+# and the computation runs (and is profiled) without Qt or a database.
+
+Event = namedtuple('Event', ['name', 'date', 'guest_count', 'special_requirements'])
+
+# A recipe as the engine needs it; ingredients are
+# (master_ingredient_id, name, quantity, uom) per batch of the recipe, with
+# sub-recipes already expanded. portions_per_batch is None when the recipe
+# has no usable yield; batch_increment rounds batches up (None: exactly).
+# allergen_mask is Recipe.allergen_mask, or None to derive it from allergens.
+RecipeData = namedtuple('RecipeData', [
+    'id', 'name', 'category', 'menu_description', 'ingredients', 'allergens',
+    'portions_per_batch', 'batch_increment', 'allergen_mask'
+], defaults=(None, None, None))
+
+ScaledIngredient = namedtuple('ScaledIngredient', ['name', 'quantity', 'uom', 'master_ingredient_id'])
+
+# quantity as selected (portions, or batches for recipes without a yield);
+# batches as made, after rounding
+MenuItem = namedtuple('MenuItem', ['recipe_id', 'name', 'menu_description', 'quantity', 'ingredients', 'batches'])
+
+# menu: {category: [MenuItem, ...]} in selection order; shopping_list:
+# [ShoppingItem, ...] by name; allergens: sorted names
+BEOResult = namedtuple('BEOResult', ['event', 'menu', 'shopping_list', 'allergens'])
+
+UNCATEGORIZED = "Uncategorized"
+
+
+def fetch_recipes(session, recipe_ids):
+    # {id: RecipeData} for the selected recipes, with sub-recipes flattened
+    # into raw ingredients and their allergens added
+    flat = recipe_flattener.get(session, recipe_ids)
+    recipes = {}
+    ids = list(flat)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        for row in session.query(
+            Recipe.id, Recipe.name, Recipe.category, Recipe.menu_description, Recipe.allergen_mask,
+            *(getattr(Recipe, column) for column in YIELD_COLUMNS)
+        ).filter(Recipe.id.in_(ids[start:start + CHUNK_SIZE])):
+            scaling = recipe_yield(row)
+            recipes[row.id] = RecipeData(
+                row.id, row.name, row.category, row.menu_description,
+                flat[row.id].lines, flat[row.id].allergens,
+                portions_per_batch(scaling), scaling.increment, row.allergen_mask
+            )
+    return recipes
+
+
+def compute_beo(event, selections, recipes, registry=units):
+    # selections: [(recipe_id, quantity), ...]; recipes: {id: RecipeData}.
+    # Selections of recipes that no longer exist are skipped. All lines of
+    # the event are scaled as one column: a multiply pass by each item's
+    # batches, then one conversion pass to base units, shared by the
+    # per-item tables and the shopping list.
+    chosen = []
+    for recipe_id, quantity in selections:
+        recipe = recipes.get(recipe_id)
+        if recipe is not None:
+            chosen.append((recipe, quantity, menu_batches(quantity, recipe.portions_per_batch, recipe.batch_increment)))
+
+    lines = [line for recipe, _, _ in chosen for line in recipe.ingredients]
+    multipliers = chain.from_iterable(repeat(batches, len(recipe.ingredients)) for recipe, _, batches in chosen)
+    converted = registry.to_base_batch(list(zip(
+        map(mul, map(itemgetter(2), lines), multipliers),
+        map(itemgetter(3), lines)
+    )))
+
+    menu = {}
+    mask = 0
+    unlisted = set()
+    start = 0
+    for recipe, quantity, batches in chosen:
+        end = start + len(recipe.ingredients)
+        scaled = []
+        for (master_id, name, _, _), (base_quantity, unit) in zip(lines[start:end], converted[start:end]):
+            display_quantity, display_uom = registry.display(base_quantity, unit)
+            scaled.append(ScaledIngredient(name, display_quantity, display_uom, master_id))
+        start = end
+        menu.setdefault(recipe.category or UNCATEGORIZED, []).append(MenuItem(
+            recipe.id,
+            recipe.name,
+            recipe.menu_description,
+            quantity,
+            scaled,
+            batches
+        ))
+        # The event's allergens are the OR of its recipes' masks; only names
+        # outside the fixed list are collected by name
+        mask |= recipe.allergen_mask if recipe.allergen_mask is not None else allergen_mask(recipe.allergens)
+        if len(recipe.allergens) > bin(recipe.allergen_mask or 0).count("1"):
+            unlisted.update(unlisted_allergens(recipe.allergens))
+    shopping_list = consolidate_base(
+        [(master_id, name, base_quantity, unit)
+         for (master_id, name, _, _), (base_quantity, unit) in zip(lines, converted)],
+        registry
+    )
+    return BEOResult(event, menu, shopping_list, sorted(set(allergen_names(mask)) | unlisted))
+
+
+def build_beo(session, event, selections):
+    recipes = fetch_recipes(session, [recipe_id for recipe_id, _ in selections])
+    return compute_beo(event, selections, recipes)
@@ -0,0 +1,211 @@
+import csv
+import json
+import os
+import zipfile
+from xml.sax.saxutils import escape
+
+from utils.filenames import filename_part
+
+# Row-by-row exports of a beo_engine.BEOResult for purchasing and accounting.
+# Every writer pulls rows from generators and writes them as it goes, so
+# memory does not grow with the event. Plain stdlib, like the PDF renderer
+# usable from the GUI, a worker or a script.
+
+FORMATS = {
+    "csv": ".csv",
+    "jsonl": ".jsonl",
+    "xlsx": ".xlsx",
+}
+
+
+def event_rows(result):
+    event = result.event
+    yield [event.name, event.date.isoformat(), event.guest_count, event.special_requirements]
+
+
+def menu_rows(result):
+    for category, items in result.menu.items():
+        for item in items:
+            yield [category, item.recipe_id, item.name, item.menu_description or "", item.quantity, item.batches]
+
+
+def ingredient_rows(result):
+    # Scaled ingredients per menu item, in display units
+    for category, items in result.menu.items():
+        for item in items:
+            for ingredient in item.ingredients:
+                yield [category, item.recipe_id, item.name, ingredient.name,
+                       round(ingredient.quantity, 4), ingredient.uom, ingredient.master_ingredient_id]
+
+
+def shopping_rows(result):
+    for item in result.shopping_list:
+        yield [item.name, round(item.quantity, 4), item.uom, item.master_ingredient_id]
+
+
+def allergen_rows(result):
+    for allergen in result.allergens:
+        yield [allergen]
+
+
+# name: (columns, rows(result)), in export order
+TABLES = {
+    "event": (["name", "date", "guest_count", "special_requirements"], event_rows),
+    "menu": (["category", "recipe_id", "item", "description", "quantity", "batches"], menu_rows),
+    "ingredients": (["category", "recipe_id", "item", "ingredient", "quantity", "uom", "master_ingredient_id"],
+                    ingredient_rows),
+    "shopping_list": (["ingredient", "quantity", "uom", "master_ingredient_id"], shopping_rows),
+    "allergens": (["allergen"], allergen_rows),
+}
+
+
+def _tables(tables):
+    tables = list(tables or TABLES)
+    unknown = [name for name in tables if name not in TABLES]
+    if unknown:
+        raise ValueError(f"Unknown export tables: {', '.join(unknown)}; expected {', '.join(TABLES)}")
+    return tables
+
+
+def write_csv(result, f, table="shopping_list"):
+    # One table to an open text file (newline="")
+    columns, rows = TABLES[_tables([table])[0]]
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    for row in rows(result):
+        writer.writerow(["" if value is None else value for value in row])
+
+
+def write_jsonl(result, f, tables=None):
+    # One JSON object per line, tagged with its table
+    for table in _tables(tables):
+        columns, rows = TABLES[table]
+        for row in rows(result):
+            record = {"type": table}
+            record.update(zip(columns, row))
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _column_name(index):
+    name = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def _xlsx_cell(reference, value):
+    if value is None:
+        return ""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+    return f'<c r="{reference}"><v>{value!r}</v></c>'
+
+
+def _xlsx_sheet(f, columns, rows):
+    f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    references = [_column_name(index) for index in range(len(columns))]
+    for number, row in enumerate(_with_header(columns, rows), 1):
+        cells = "".join(_xlsx_cell(f"{reference}{number}", value) for reference, value in zip(references, row))
+        f.write(f'<row r="{number}">{cells}</row>'.encode("utf-8"))
+    f.write(b'</sheetData></worksheet>')
+
+
+def _with_header(columns, rows):
+    yield columns
+    yield from rows
+
+
+def write_xlsx(result, path, tables=None):
+    # One worksheet per table. Sheets are streamed into the archive row by
+    # row; only the workbook parts listing the sheets are built in memory.
+    tables = _tables(tables)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{number}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for number in range(1, len(tables) + 1)
+            ) +
+            '</Types>'
+        ))
+        archive.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        archive.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(
+                f'<sheet name="{table}" sheetId="{number}" r:id="rId{number}"/>'
+                for number, table in enumerate(tables, 1)
+            ) +
+            '</sheets></workbook>'
+        ))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{number}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{number}.xml"/>'
+                for number in range(1, len(tables) + 1)
+            ) +
+            '</Relationships>'
+        ))
+        for number, table in enumerate(tables, 1):
+            columns, rows = TABLES[table]
+            with archive.open(f"xl/worksheets/sheet{number}.xml", "w", force_zip64=True) as f:
+                _xlsx_sheet(f, columns, rows(result))
+
+
+def export_filename(event_name, fmt):
+    return f"BEO_Export_{filename_part(event_name)}{FORMATS[fmt]}"
+
+
+def export_format(path):
+    # The format for a file name, by extension
+    extension = os.path.splitext(path)[1].lower()
+    for fmt, fmt_extension in FORMATS.items():
+        if extension == fmt_extension:
+            return fmt
+    raise ValueError(f"Unknown export format '{extension}'; expected one of {', '.join(FORMATS.values())}")
+
+
+def export_beo(result, path, fmt=None, tables=None):
+    # Writes result to path in the format given or implied by its extension.
+    # CSV holds one table per file: the shopping list unless tables are
+    # given, and with several tables each goes to <stem>_<table>.csv.
+    # Returns the paths written.
+    fmt = fmt or export_format(path)
+    if fmt == "xlsx":
+        write_xlsx(result, path, tables)
+        return [path]
+    if fmt == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            write_jsonl(result, f, tables)
+        return [path]
+    if fmt != "csv":
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {', '.join(FORMATS)}")
+    tables = _tables(tables or ["shopping_list"])
+    stem, extension = os.path.splitext(path)
+    paths = []
+    for table in tables:
+        table_path = path if len(tables) == 1 else f"{stem}_{table}{extension or '.csv'}"
+        with open(table_path, "w", newline="", encoding="utf-8") as f:
+            write_csv(result, f, table)
+        paths.append(table_path)
+    return paths
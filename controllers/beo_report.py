@@ -0,0 +1,424 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER
+from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table,
+                              TableStyle, PageBreak)
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from utils.filenames import filename_part
+
+# Joining separately rendered chunks needs pypdf (the parallel-reports
+# extra in pyproject.toml); without it large reports are still streamed, in
+# one process
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import ContentStream, DictionaryObject, NameObject
+except ImportError:
+    PdfReader = PdfWriter = None
+
+# Menu items or shopping list rows per section, and shopping list rows per
+# table. Sections are the unit of parallel rendering; tables are split so no
+# single flowable grows with the event.
+SECTION_ITEMS = 100
+SECTION_ROWS = 1000
+TABLE_ROWS = 200
+
+# Flowables kept ahead of the layout while streaming
+STREAM_WINDOW = 64
+
+# Events with at least this many menu items are rendered in parallel when
+# there is more than one CPU; below it, starting worker processes costs more
+# than it saves
+PARALLEL_MIN_ITEMS = 300
+
+# kind: 'cover', 'menu' or 'shopping'. entries: (event, allergens) for the
+# cover, [(category, [MenuItem, ...], continued), ...] for the menu and
+# [ShoppingItem, ...] for the shopping list. first: whether the section opens
+# its part of the report (and so carries its title).
+ReportSection = namedtuple('ReportSection', ['kind', 'entries', 'first'])
+
+
+class ReportCancelled(Exception):
+    pass
+
+
+def report_filename(event_name):
+    return f"BEO_Report_{filename_part(event_name)}.pdf"
+
+
+class ReportTemplate:
+    # Paragraph styles, table styles and the page footer for BEO reports.
+    # Built once per process by report_template() and shared by every render;
+    # nothing here is modified while a document is built.
+
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        self.styles.add(ParagraphStyle(
+            name='CoverTitle',
+            parent=self.styles['Title'],
+            fontSize=24,
+            textColor=colors.HexColor('#4a90e2'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ))
+        self.styles.add(ParagraphStyle(
+            name='SectionTitle',
+            parent=self.styles['Heading1'],
+            fontSize=18,
+            textColor=colors.HexColor('#4a90e2'),
+            spaceBefore=20,
+            spaceAfter=10
+        ))
+        self.styles.add(ParagraphStyle(
+            name='SubsectionTitle',
+            parent=self.styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#2d2d2d'),
+            spaceBefore=15,
+            spaceAfter=8
+        ))
+
+        self.event_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f5f5f5')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2d2d2d')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('LEFTPADDING', (0, 0), (-1, -1), 15),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 15),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
+        ])
+        # Ingredient and shopping list tables: header row, then striped rows
+        self.quantity_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a90e2')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dddddd')),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1),
+            [colors.HexColor('#ffffff'), colors.HexColor('#f8f9fa')]),
+        ])
+        self.event_col_widths = [2*inch, 4*inch]
+        self.quantity_col_widths = [4*inch, 1.5*inch, 1.5*inch]
+
+    @staticmethod
+    def draw_page_number(canvas, page_num, page_width):
+        # Footer with page numbers
+        text = f"Page {page_num}"
+        canvas.saveState()
+        canvas.setFont('Helvetica', 9)
+        canvas.setFillColor(colors.HexColor('#666666'))
+        canvas.drawRightString(page_width - 72, 72, text)
+        canvas.restoreState()
+
+    def add_page_number(self, canvas, doc):
+        self.draw_page_number(canvas, canvas.getPageNumber(), doc.pagesize[0])
+
+    def document(self, pdf_file):
+        return SimpleDocTemplate(
+            pdf_file,
+            pagesize=A4,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=72
+        )
+
+    def quantity_table(self, header, rows):
+        return Table(
+            [header] + rows,
+            colWidths=self.quantity_col_widths,
+            style=self.quantity_table_style
+        )
+
+
+_template = None
+
+
+def report_template():
+    global _template
+    if _template is None:
+        _template = ReportTemplate()
+    return _template
+
+
+class FlowableStream(list):
+    # doc.build consumes flowables from the front of a list (and puts split
+    # remainders back there). This list is topped up from a generator as it
+    # drains, so only a window of flowables exists at any time.
+
+    def __init__(self, flowables, window=STREAM_WINDOW):
+        super().__init__()
+        self._source = iter(flowables)
+        self._window = window
+
+    def __len__(self):
+        if self._source is not None and list.__len__(self) < self._window:
+            for flowable in self._source:
+                self.append(flowable)
+                if list.__len__(self) >= 2 * self._window:
+                    break
+            else:
+                self._source = None
+        return list.__len__(self)
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def beo_sections(result, section_items=SECTION_ITEMS):
+    # The report as ReportSections of at most section_items menu items or
+    # SECTION_ROWS shopping rows, in document order
+    yield ReportSection('cover', (result.event, result.allergens), True)
+
+    section = []
+    count = 0
+    first = True
+    for category, items in result.menu.items():
+        for part, chunk in enumerate(_chunks(items, section_items)):
+            if count and count + len(chunk) > section_items:
+                yield ReportSection('menu', section, first)
+                section, count, first = [], 0, False
+            section.append((category, chunk, part > 0))
+            count += len(chunk)
+    if section or first:
+        yield ReportSection('menu', section, first)
+
+    shopping = result.shopping_list
+    for number, rows in enumerate(_chunks(shopping, SECTION_ROWS)):
+        yield ReportSection('shopping', rows, number == 0)
+    if not shopping:
+        yield ReportSection('shopping', [], True)
+
+
+def section_flowables(section, template):
+    # Flowables for one ReportSection, produced as they are needed
+    styles = template.styles
+
+    if section.kind == 'cover':
+        event, allergens = section.entries
+
+        # Cover Page
+        yield Paragraph("Banquet Event Order", styles['CoverTitle'])
+        yield Spacer(1, 30)
+
+        # Event Information Table
+        # Includes day of week
+        event_date = f"{event.date:%A, %B} {event.date.day}, {event.date.year}"
+        event_data = [
+            ["Event Name:", event.name],
+            ["Date:", event_date],
+            ["Guest Count:", str(event.guest_count)],
+            ["Special Requirements:", event.special_requirements if event.special_requirements else "None"]
+        ]
+        yield Table(event_data, colWidths=template.event_col_widths, style=template.event_table_style)
+
+        # Allergens Warning (if any)
+        if allergens:
+            yield Spacer(1, 20)
+            allergens_text = "⚠️ ALLERGENS PRESENT: " + ", ".join(allergens)
+            yield Paragraph(
+                f'<para fontSize=12 textColor="red"><b>{allergens_text}</b></para>',
+                styles['Normal']
+            )
+
+    elif section.kind == 'menu':
+        # Menu Items Section
+        if section.first:
+            yield Paragraph("Menu Items", styles['SectionTitle'])
+
+        for category, items, continued in section.entries:
+            title = f"{category} (continued)" if continued else category
+            yield Paragraph(title, styles['SubsectionTitle'])
+
+            for item in items:
+                # Menu Item Header
+                quantity = f"Quantity: {item.quantity}"
+                if item.batches != item.quantity:
+                    quantity += f", Batches: {item.batches:g}"
+                item_header = f"{item.name} ({quantity})"
+                yield Paragraph(f"<b>{item_header}</b>", styles['Normal'])
+
+                if item.menu_description:
+                    yield Paragraph(f"<i>{item.menu_description}</i>", styles['Normal'])
+
+                # Ingredients Table
+                yield template.quantity_table(
+                    ["Ingredient", "Quantity", "Unit"],
+                    [
+                        [ingredient.name, f"{ingredient.quantity:.2f}", ingredient.uom]
+                        for ingredient in item.ingredients
+                    ]
+                )
+                yield Spacer(1, 15)
+
+            yield Spacer(1, 20)
+
+    else:
+        if section.first:
+            yield Paragraph("Consolidated Shopping List", styles['SectionTitle'])
+
+        # Group shopping list by category (future enhancement)
+        for rows in _chunks(section.entries, TABLE_ROWS):
+            yield template.quantity_table(
+                ["Ingredient", "Total Quantity", "Unit"],
+                [[item.name, f"{item.quantity:.2f}", item.uom] for item in rows]
+            )
+
+
+def section_label(section):
+    if section.kind == 'cover':
+        return "Cover page"
+    if section.kind == 'menu':
+        return "Menu: " + ", ".join(category for category, _, _ in section.entries)
+    return "Shopping list"
+
+
+def beo_flowables(result, template, progress=None, cancelled=None):
+    # The whole report as one stream of flowables. Every section starts a
+    # new page, as it does when sections are rendered in parallel and
+    # joined, so an event gets the same pages whichever way it is rendered.
+    sections = list(beo_sections(result))
+    for number, section in enumerate(sections):
+        if cancelled is not None and cancelled():
+            raise ReportCancelled()
+        if progress is not None:
+            progress(number, len(sections), section_label(section))
+        if number:
+            yield PageBreak()
+        yield from section_flowables(section, template)
+
+
+def render_beo_pdf(result, pdf_file, template=None, workers=1, progress=None, cancelled=None):
+    # Writes the BEO for a beo_engine.BEOResult to pdf_file. Pure reportlab,
+    # so it runs the same in the GUI, a worker thread or a batch process.
+    # Flowables are streamed into the layout rather than built up front. With
+    # workers > 1 (and pypdf installed) sections are rendered in parallel
+    # processes and joined; see render_beo_pdf_parallel.
+    # progress(done, total, label) is called as each section starts, and
+    # ReportCancelled is raised between sections once cancelled() is true.
+    if workers > 1 and PdfWriter is not None:
+        return render_beo_pdf_parallel(result, pdf_file, workers, progress, cancelled)
+    template = template or report_template()
+    doc = template.document(pdf_file)
+    # Build the PDF with page numbers
+    doc.build(FlowableStream(beo_flowables(result, template, progress, cancelled)),
+              onFirstPage=template.add_page_number, onLaterPages=template.add_page_number)
+    return pdf_file
+
+
+def report_workers(result):
+    # Worker processes worth using for a report of this size
+    items = sum(len(items) for items in result.menu.values())
+    if items < PARALLEL_MIN_ITEMS or PdfWriter is None:
+        return 1
+    return os.cpu_count() or 1
+
+
+def render_section(section, pdf_file):
+    # Runs in a worker process: one section, without page numbers, to its
+    # own file. Returns the number of pages written.
+    template = report_template()
+    doc = template.document(pdf_file)
+    doc.build(FlowableStream(section_flowables(section, template)))
+    return doc.page
+
+
+# Font the joined pages' footers are set in, as ReportTemplate sets them
+FOOTER_FONT = {
+    "/Type": "/Font",
+    "/Subtype": "/Type1",
+    "/BaseFont": "/Helvetica",
+    "/Encoding": "/WinAnsiEncoding",
+}
+
+
+def stamp_page_number(writer, page, page_num):
+    # Appends the footer to a page added to writer, drawn as
+    # ReportTemplate.draw_page_number draws it, by replacing the page's
+    # content with itself plus the footer. Cheaper than merging an overlay
+    # page, which parses every page's content into operators.
+    text = f"Page {page_num}"
+    x = float(page.mediabox.width) - 72 - stringWidth(text, 'Helvetica', 9)
+    footer = f"BT /FPageNo 9 Tf 0.4 0.4 0.4 rg {x:.2f} 72 Td ({text}) Tj ET".encode("ascii")
+    contents = page.get_contents()
+    stream = ContentStream(None, writer)
+    stream.set_data(b"q\n" + (contents.get_data() if contents is not None else b"") + b"\nQ " + footer)
+    page.replace_contents(stream)
+    resources = page[NameObject("/Resources")].get_object()
+    if NameObject("/Font") not in resources:
+        resources[NameObject("/Font")] = DictionaryObject()
+    resources[NameObject("/Font")].get_object()[NameObject("/FPageNo")] = DictionaryObject({
+        NameObject(key): NameObject(value) for key, value in FOOTER_FONT.items()
+    })
+
+
+def render_beo_pdf_parallel(result, pdf_file, workers=None, progress=None, cancelled=None):
+    # Renders each section in a process pool to a temporary file, then joins
+    # them in order and stamps continuous page numbers. Every section starts
+    # on a new page, as in beo_flowables. Progress is reported as sections
+    # finish. Needs pypdf.
+    if PdfWriter is None:
+        raise RuntimeError("Parallel report rendering needs pypdf")
+    sections = list(beo_sections(result))
+    workers = min(workers or os.cpu_count() or 1, len(sections))
+    work_dir = tempfile.mkdtemp(prefix="beo_report_")
+    try:
+        paths = [os.path.join(work_dir, f"section_{number:05d}.pdf") for number in range(len(sections))]
+        # Spawned rather than forked: the GUI calls this with Qt threads running
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            pending = {
+                pool.submit(render_section, section, path): section
+                for section, path in zip(sections, paths)
+            }
+            if progress is not None:
+                progress(0, len(sections), f"Rendering {len(sections)} sections")
+            while pending:
+                if cancelled is not None and cancelled():
+                    raise ReportCancelled()
+                # Wake up now and then to notice a cancel
+                done, _ = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    finished = pending.pop(future)
+                    if progress is not None:
+                        progress(len(sections) - len(pending), len(sections), section_label(finished))
+        finally:
+            pool.shutdown(wait=not (cancelled and cancelled()), cancel_futures=True)
+
+        writer = PdfWriter()
+        if progress is not None:
+            progress(len(sections), len(sections), "Joining sections")
+        page_num = 0
+        for path in paths:
+            for page in PdfReader(path).pages:
+                page_num += 1
+                stamp_page_number(writer, writer.add_page(page), page_num)
+        # The joined contents were decoded to be stamped
+        for page in writer.pages:
+            page.compress_content_streams()
+        writer.write(pdf_file)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return pdf_file
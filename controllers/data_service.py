@@ -0,0 +1,110 @@
+from itertools import count
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+from PyQt6.QtWidgets import QApplication
+
+from models.database import db
+
+
+class DataJob:
+    _ids = count(1)
+
+    def __init__(self, func, on_result=None, on_error=None, key=None):
+        self.id = next(self._ids)
+        self.func = func
+        self.on_result = on_result
+        self.on_error = on_error
+        self.key = key
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class DataWorker(QObject):
+    # Lives on the service's thread; every job runs with a fresh session of
+    # its own, and only plain data (never ORM objects) is sent back.
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+
+    @pyqtSlot(object)
+    def run(self, job):
+        if job.cancelled:
+            return
+        session = db.new_session()
+        try:
+            result = job.func(session)
+        except Exception as e:
+            session.rollback()
+            self.failed.emit(job, str(e))
+        else:
+            self.finished.emit(job, result)
+        finally:
+            session.close()
+
+
+class DataService(QObject):
+    # Runs queries and commits off the GUI thread. Jobs run one at a time in
+    # submission order, which also keeps SQLite writers from contending.
+    # Submitting with a key supersedes any earlier job with the same key: it
+    # is skipped if it has not started, and its result is dropped if it has.
+    dispatch = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._latest = {}
+        self._thread = QThread()
+        self._thread.setObjectName("data-service")
+        self._worker = DataWorker()
+        self._worker.moveToThread(self._thread)
+        self.dispatch.connect(self._worker.run)
+        self._worker.finished.connect(self._on_finished)
+        self._worker.failed.connect(self._on_failed)
+        self._thread.start()
+
+    def submit(self, func, on_result=None, on_error=None, key=None):
+        job = DataJob(func, on_result, on_error, key)
+        if key is not None:
+            self.cancel(key)
+            self._latest[key] = job
+        self.dispatch.emit(job)
+        return job
+
+    def cancel(self, key):
+        job = self._latest.pop(key, None)
+        if job is not None:
+            job.cancel()
+
+    def shutdown(self):
+        for job in self._latest.values():
+            job.cancel()
+        self._latest.clear()
+        self._thread.quit()
+        self._thread.wait()
+
+    def _release(self, job):
+        if job.key is not None and self._latest.get(job.key) is job:
+            del self._latest[job.key]
+
+    def _on_finished(self, job, result):
+        self._release(job)
+        if not job.cancelled and job.on_result:
+            job.on_result(result)
+
+    def _on_failed(self, job, message):
+        self._release(job)
+        if not job.cancelled and job.on_error:
+            job.on_error(message)
+
+
+_service = None
+
+
+def data_service():
+    global _service
+    if _service is None:
+        _service = DataService()
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_service.shutdown)
+    return _service
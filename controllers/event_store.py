@@ -0,0 +1,95 @@
+import datetime
+from collections import namedtuple
+
+from sqlalchemy import func
+
+from controllers import beo_engine
+from models.models import Event, EventItem, Recipe
+
+EVENT_STATUSES = ["draft", "tentative", "confirmed", "cancelled"]
+
+# Events dated this many days back or later count as recent
+RECENT_DAYS = 30
+
+# items: [(recipe_id, recipe name, quantity), ...] in menu order; items
+# whose recipe has since been deleted are left out
+SavedEvent = namedtuple('SavedEvent', ['id', 'event', 'status', 'items'])
+
+EventSummary = namedtuple('EventSummary', ['id', 'name', 'date', 'guest_count', 'status'])
+
+
+def save_event(session, event, selections, status="draft", event_id=None):
+    # Inserts or updates an event and its menu; selections are
+    # [(recipe_id, quantity), ...]. Only items whose recipe, quantity or
+    # position changed are written. Returns the event id; the caller commits.
+    if status not in EVENT_STATUSES:
+        raise ValueError(f"Unknown event status '{status}'")
+    record = session.get(Event, event_id) if event_id is not None else None
+    if record is None:
+        record = Event()
+        session.add(record)
+    record.name = event.name
+    record.event_date = event.date
+    record.guest_count = event.guest_count
+    record.special_requirements = event.special_requirements
+    record.status = status
+    record.updated_at = datetime.datetime.now().isoformat(timespec="seconds")
+
+    items = list(record.items)
+    for position, (recipe_id, quantity) in enumerate(selections):
+        if position < len(items):
+            item = items[position]
+            if (item.recipe_id, item.quantity) != (recipe_id, quantity):
+                item.recipe_id = recipe_id
+                item.quantity = quantity
+        else:
+            record.items.append(EventItem(recipe_id=recipe_id, quantity=quantity, position=position))
+    for item in items[len(selections):]:
+        record.items.remove(item)
+    session.flush()
+    return record.id
+
+
+def load_event(session, event_id):
+    # SavedEvent for the id, or None, in two queries
+    record = session.get(Event, event_id)
+    if record is None:
+        return None
+    items = [
+        tuple(row) for row in session.query(
+            EventItem.recipe_id, Recipe.name, EventItem.quantity
+        ).join(Recipe, Recipe.id == EventItem.recipe_id).filter(
+            EventItem.event_id == event_id
+        ).order_by(EventItem.position)
+    ]
+    event = beo_engine.Event(
+        record.name, record.event_date, record.guest_count, record.special_requirements or ""
+    )
+    return SavedEvent(record.id, event, record.status, items)
+
+
+def delete_event(session, event_id):
+    record = session.get(Event, event_id)
+    if record is not None:
+        session.delete(record)
+
+
+def event_summaries(session, since=None, limit=None):
+    # Newest first, without loading menus
+    query = session.query(
+        Event.id, Event.name, Event.event_date, Event.guest_count, Event.status
+    )
+    if since is not None:
+        query = query.filter(Event.event_date >= since)
+    query = query.order_by(Event.event_date.desc(), Event.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return [EventSummary(*row) for row in query]
+
+
+def recent_event_count(session, today=None):
+    since = (today or datetime.date.today()) - datetime.timedelta(days=RECENT_DAYS)
+    return session.query(func.count(Event.id)).filter(
+        Event.event_date >= since,
+        Event.status != "cancelled"
+    ).scalar()
@@ -0,0 +1,234 @@
+from collections import namedtuple
+
+from sqlalchemy import (Float, Integer, String, and_, case, cast, column, exists, func, literal, literal_column, or_,
+                        values)
+
+from controllers.event_store import EventSummary
+from models.models import Event, EventItem, Ingredient, MasterIngredient, Recipe
+from models.recipe_graph import MAX_DEPTH, YIELD_COLUMNS, recipe_yield
+from utils.scaling import EPSILON, batches_for
+from utils.units import PORTION, units
+
+# What buyers order for a date range: every non-cancelled event's menu,
+# totalled per master ingredient (per name for unlinked lines) and dimension
+# in base units, as in utils.shopping_list.consolidate. Menu portions are
+# scaled by recipe yield as in the BEO engine, and sub-recipes count through
+# their raw ingredients.
+
+ProcurementLine = namedtuple('ProcurementLine', [
+    'name', 'quantity', 'uom', 'master_ingredient_id', 'base_quantity', 'dimension'
+])
+
+# totals: [ProcurementLine, ...] by name; by_day: {date: [...]};
+# by_event: {event id: [...]}; events: [EventSummary, ...] by date
+ProcurementReport = namedtuple('ProcurementReport', ['start', 'end', 'events', 'totals', 'by_day', 'by_event'])
+
+
+def _events_in_range(start, end):
+    return and_(Event.event_date >= start, Event.event_date <= end, Event.status != "cancelled")
+
+
+def _unit_values(name, spellings, registry):
+    # (uom, dimension, factor) for the spellings as a VALUES CTE
+    return values(
+        column('uom', String), column('dimension', String), column('factor', Float),
+        name=name
+    ).data([
+        (uom, unit.dimension, unit.factor)
+        for uom, unit in ((uom, registry.lookup(uom)) for uom in spellings)
+    ]).cte(name)
+
+
+def per_portion(session, registry=units):
+    # Batches per menu portion of Recipe, as a SQL expression to use with
+    # the returned joins: utils.scaling.portions_per_batch inverted, and 1
+    # for recipes with no usable yield, whose menu quantities are batches.
+    # Only the few yield and portion unit spellings are resolved in Python.
+    spellings = {
+        uom for row in session.query(Recipe.yield_uom, Recipe.portion_uom).distinct() for uom in row if uom
+    }
+    if not spellings:
+        return literal(1.0), []
+    yield_units = _unit_values('yield_units', spellings, registry)
+    portion_units = yield_units.alias('portion_units')
+    batch_size = Recipe.yield_quantity * yield_units.c.factor
+    expression = case(
+        (Recipe.yield_quantity > 0, case(
+            (yield_units.c.dimension == PORTION, 1.0 / batch_size),
+            (and_(Recipe.portion_size > 0, portion_units.c.dimension == yield_units.c.dimension),
+             Recipe.portion_size * portion_units.c.factor / batch_size),
+            else_=1.0
+        )),
+        else_=1.0
+    )
+    return expression, [
+        (yield_units, yield_units.c.uom == Recipe.yield_uom),
+        (portion_units, portion_units.c.uom == Recipe.portion_uom),
+    ]
+
+
+def sub_recipe_factors(session, registry=units):
+    # (sub_recipe_id, uom, factor) for every unit a sub-recipe line is given
+    # in, as a VALUES CTE: batches of the sub-recipe per unit of the line
+    pairs = session.query(Ingredient.sub_recipe_id, Ingredient.uom).distinct().filter(
+        Ingredient.sub_recipe_id.isnot(None)
+    ).all()
+    if not pairs:
+        return None
+    yields = {
+        row.id: recipe_yield(row) for row in session.query(
+            Recipe.id, *(getattr(Recipe, column) for column in YIELD_COLUMNS)
+        ).filter(Recipe.id.in_(session.query(Ingredient.sub_recipe_id).filter(Ingredient.sub_recipe_id.isnot(None))))
+    }
+    return values(
+        column('sub_recipe_id', Integer), column('uom', String), column('factor', Float),
+        name='sub_recipe_factors'
+    ).data([
+        (sub_recipe_id, uom, batches_for(1.0, uom, yields.get(sub_recipe_id), registry))
+        for sub_recipe_id, uom in pairs
+    ]).cte('sub_recipe_factors')
+
+
+def _round_up(batches, increment):
+    # utils.scaling.round_batches in SQL, for increment > 0
+    steps = batches / increment - EPSILON
+    whole = cast(steps, Integer)
+    return (whole + case((steps > whole, 1), else_=0)) * increment
+
+
+def expanded_demand(session, start, end, *grain, registry=units):
+    # Subquery of (*grain, recipe_id, batches): menu portions turned into
+    # batches per recipe, rounded as in the BEO engine, with sub-recipes
+    # expanded by a recursive CTE into batches of the recipes they use.
+    # Writes refuse cycles, and MAX_DEPTH bounds the walk should one get
+    # into the data another way.
+    keys = [column.key for column in grain]
+    scale, joins = per_portion(session, registry)
+    batches = EventItem.quantity * scale
+    expand = session.query(
+        *(column.label(key) for column, key in zip(grain, keys)),
+        EventItem.recipe_id.label('recipe_id'),
+        case((Recipe.batch_increment > 0, _round_up(batches, Recipe.batch_increment)), else_=batches).label('batches'),
+        literal(0).label('depth')
+    ).join(Event, Event.id == EventItem.event_id).join(Recipe, Recipe.id == EventItem.recipe_id)
+    for table, on in joins:
+        expand = expand.outerjoin(table, on)
+    expand = expand.filter(_events_in_range(start, end)).cte('expand', recursive=True)
+    factors = sub_recipe_factors(session, registry)
+    if factors is not None:
+        expand = expand.union_all(
+            session.query(
+                *(expand.c[key] for key in keys),
+                Ingredient.sub_recipe_id,
+                expand.c.batches * Ingredient.quantity * factors.c.factor,
+                expand.c.depth + 1
+            ).join(Ingredient, Ingredient.recipe_id == expand.c.recipe_id).join(
+                factors, and_(factors.c.sub_recipe_id == Ingredient.sub_recipe_id, factors.c.uom == Ingredient.uom)
+            ).filter(expand.c.depth < MAX_DEPTH)
+        )
+    grain_columns = [expand.c[key] for key in keys]
+    return session.query(
+        *grain_columns,
+        expand.c.recipe_id,
+        func.sum(expand.c.batches).label('batches')
+    ).group_by(*grain_columns, expand.c.recipe_id).subquery('demand')
+
+
+def _raw_lines():
+    # Sub-recipe lines are expanded; one whose recipe was deleted is kept
+    # as an ingredient under its own name, as when flattening
+    return or_(
+        Ingredient.sub_recipe_id.is_(None),
+        ~exists().where(Recipe.id == Ingredient.sub_recipe_id)
+    )
+
+
+def unit_table(session, demand, registry=units):
+    # Every unit spelling used by the demanded recipes, resolved by the
+    # registry to its dimension and base factor, as a VALUES CTE the
+    # aggregate can join
+    spellings = [
+        uom for (uom,) in session.query(Ingredient.uom).distinct().join(
+            demand, demand.c.recipe_id == Ingredient.recipe_id
+        ).filter(_raw_lines())
+    ]
+    if not spellings:
+        return None
+    return _unit_values('unit_factors', spellings, registry)
+
+
+def grouped_totals(session, start, end, *grain, registry=units):
+    # Rows of (*grain, master id, name, dimension, base quantity, a unit
+    # spelling used), summed in SQL. grain is nothing (the whole range),
+    # Event.event_date or Event.id. Batches are first summed per recipe at
+    # that grain, so each recipe's ingredients are joined once per group
+    # rather than once per menu item.
+    demand = expanded_demand(session, start, end, *grain, registry=registry)
+    unit_factors = unit_table(session, demand, registry)
+    if unit_factors is None:
+        return []
+    grain_columns = [demand.c[column.key] for column in grain]
+    name_key = case(
+        (Ingredient.master_ingredient_id.is_(None), func.lower(func.trim(Ingredient.ingredient))),
+        else_=literal_column("NULL")
+    )
+    return session.query(
+        *grain_columns,
+        Ingredient.master_ingredient_id,
+        func.min(func.coalesce(MasterIngredient.name, func.trim(Ingredient.ingredient))),
+        unit_factors.c.dimension,
+        func.sum(demand.c.batches * Ingredient.quantity * unit_factors.c.factor),
+        func.min(Ingredient.uom)
+    ).select_from(demand).join(
+        Ingredient, Ingredient.recipe_id == demand.c.recipe_id
+    ).filter(_raw_lines()).join(
+        unit_factors, unit_factors.c.uom == Ingredient.uom
+    ).outerjoin(
+        MasterIngredient, MasterIngredient.id == Ingredient.master_ingredient_id
+    ).group_by(
+        *grain_columns, Ingredient.master_ingredient_id, name_key, unit_factors.c.dimension
+    ).all()
+
+
+def _lines(rows, registry):
+    # ProcurementLines for rows of (master id, name, dimension, base
+    # quantity, unit spelling); each spelling is resolved once
+    resolved = {}
+    lines = []
+    for master_id, name, dimension, base_quantity, uom in rows:
+        unit = resolved.get(uom)
+        if unit is None:
+            unit = resolved[uom] = registry.lookup(uom)
+        quantity, display_uom = registry.display(base_quantity, unit)
+        lines.append(ProcurementLine(name, quantity, display_uom, master_id, base_quantity, dimension))
+    lines.sort(key=lambda line: (line.name.lower(), line.uom))
+    return lines
+
+
+def _breakdown(rows, registry):
+    groups = {}
+    for key, *line in rows:
+        groups.setdefault(key, []).append(line)
+    return {key: _lines(group, registry) for key, group in groups.items()}
+
+
+def procurement_report(session, start, end, by_day=True, by_event=True, registry=units):
+    # Range, per-day and per-event totals, each from one grouped query. The
+    # breakdowns have a row per ingredient per day or event, so callers that
+    # only need the order can leave them out.
+    events = [
+        EventSummary(*row) for row in session.query(
+            Event.id, Event.name, Event.event_date, Event.guest_count, Event.status
+        ).filter(_events_in_range(start, end)).order_by(Event.event_date, Event.id)
+    ]
+    days = {}
+    if by_day:
+        days = _breakdown(grouped_totals(session, start, end, Event.event_date, registry=registry), registry)
+    return ProcurementReport(
+        start,
+        end,
+        events,
+        _lines(grouped_totals(session, start, end, registry=registry), registry),
+        dict(sorted(days.items())),
+        _breakdown(grouped_totals(session, start, end, Event.id, registry=registry), registry) if by_event else {}
+    )
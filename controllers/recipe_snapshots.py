@@ -0,0 +1,90 @@
+from threading import RLock
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes, object_session
+
+from controllers.beo_engine import fetch_recipes
+from models.models import Allergen, Ingredient, MasterIngredient, Recipe
+
+
+class RecipeSnapshots:
+    # RecipeData for recipes already used in a BEO, so regenerating a report
+    # only loads recipes that were added to the menu or changed since. A
+    # commit that touches a recipe, its ingredients or its allergens drops
+    # that recipe's snapshot; bulk statements drop them all.
+
+    def __init__(self):
+        self._recipes = {}
+        self._lock = RLock()
+
+    def get(self, session, recipe_ids):
+        # {id: RecipeData} for the ids, querying only for the missing ones
+        with self._lock:
+            missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in self._recipes]
+            if missing:
+                self._recipes.update(fetch_recipes(session, missing))
+            return {
+                recipe_id: self._recipes[recipe_id]
+                for recipe_id in recipe_ids if recipe_id in self._recipes
+            }
+
+    def discard(self, recipe_ids):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._recipes.pop(recipe_id, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._recipes.clear()
+
+
+recipe_snapshots = RecipeSnapshots()
+
+
+def _mark_stale(target, recipe_id):
+    session = object_session(target)
+    if session is None:
+        recipe_snapshots.invalidate()
+    elif recipe_id is not None:
+        session.info.setdefault('stale_recipes', set()).add(recipe_id)
+
+
+def _recipe_changed(mapper, connection, target):
+    _mark_stale(target, target.id)
+
+
+def _line_changed(mapper, connection, target):
+    # A line moved to another recipe changes both
+    _mark_stale(target, target.recipe_id)
+    for old_id in attributes.get_history(target, 'recipe_id').deleted:
+        _mark_stale(target, old_id)
+
+
+for _mapped, _listener in ((Recipe, _recipe_changed), (Ingredient, _line_changed), (Allergen, _line_changed)):
+    for _name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_mapped, _name, _listener)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    # Flags of master ingredients feed every linked recipe's allergen mask
+    if mapper is not None and mapper.class_ in (Recipe, Ingredient, Allergen, MasterIngredient):
+        orm_execute_state.session.info['recipes_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    stale = session.info.pop('stale_recipes', None)
+    if session.info.pop('recipes_stale', False):
+        recipe_snapshots.invalidate()
+    elif stale:
+        recipe_snapshots.discard(stale)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('stale_recipes', None)
+    session.info.pop('recipes_stale', None)
@@ -0,0 +1,57 @@
+import os
+from threading import Event
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from controllers.beo_report import ReportCancelled, render_beo_pdf, report_workers
+
+
+class ReportSignals(QObject):
+    # Created on the GUI thread, so emits from the pool thread are queued
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class ReportJob(QRunnable):
+    # Renders one BEOResult to a PDF on the global thread pool, reporting
+    # progress by section. cancel() stops it at the next section boundary and
+    # removes the partial file.
+
+    def __init__(self, result, pdf_file):
+        super().__init__()
+        self.result = result
+        self.pdf_file = pdf_file
+        self.signals = ReportSignals()
+        self._cancel = Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self):
+        try:
+            render_beo_pdf(
+                self.result,
+                self.pdf_file,
+                workers=report_workers(self.result),
+                progress=self.signals.progress.emit,
+                cancelled=self._cancel.is_set
+            )
+        except ReportCancelled:
+            if os.path.exists(self.pdf_file):
+                os.remove(self.pdf_file)
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(self.pdf_file)
+
+
+def start_report(job):
+    QThreadPool.globalInstance().start(job)
+    return job
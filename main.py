@@ -1,9 +1,11 @@
 import sys
 from PyQt6.QtWidgets import QApplication
+from models.database import db
 from views.main_window import MainWindow
 
 if __name__ == '__main__':
+    print(f"Database: {db.describe()}")
     app = QApplication(sys.argv)
     main_window = MainWindow()
     main_window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
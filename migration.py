@@ -1,26 +1,36 @@
-# migration_recipe_categories.py
-from models.models import session, Recipe, Base, engine
-from menu_categories import MENU_CATEGORIES
-
-def add_category_columns():
-    import sqlite3
-    conn = sqlite3.connect('banquet_planning.db')
-    cursor = conn.cursor()
-    
-    try:
-        # Add category column
-        cursor.execute("ALTER TABLE recipes ADD COLUMN category TEXT")
-        # Add subcategory column
-        cursor.execute("ALTER TABLE recipes ADD COLUMN subcategory TEXT")
-        conn.commit()
-        print("Added category columns to recipes table")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e):
-            print("Category columns already exist")
-        else:
-            raise e
-    finally:
-        conn.close()
+# migration.py
+import argparse
+
+from sqlalchemy import create_engine
+
+from models.database import database_path
+from models.migrations import MIGRATIONS, current_version, query_plans, run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bring the FEAST MASTER database schema up to date")
+    parser.add_argument("--db", help="path to the SQLite database (defaults to the configured one)")
+    parser.add_argument("--explain", action="store_true", help="show the query plans of the hot lookups")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{database_path(args.db)}")
+    with engine.connect() as connection:
+        version = current_version(connection)
+        connection.commit()
+    latest = MIGRATIONS[-1][0] if MIGRATIONS else 0
+    print(f"Schema version {version} (latest {latest})")
+
+    applied = run_migrations(engine, report=print)
+    if applied:
+        print(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        print("Schema is up to date")
+
+    if args.explain:
+        with engine.connect() as connection:
+            for label, plan in query_plans(connection).items():
+                print(f"  {label}: {plan}")
+
 
 if __name__ == "__main__":
-    add_category_columns()
\ No newline at end of file
+    main()
@@ -0,0 +1,145 @@
+from sqlalchemy import bindparam, update
+
+from models.loaders import CHUNK_SIZE, recipe_summaries
+from models.models import Allergen, Ingredient, MasterIngredient, Recipe
+
+# The allergens an ingredient or recipe can be flagged with. Each has a bit
+# in MasterIngredient.allergen_mask and Recipe.allergen_mask by its
+# position, so only ever append to this list. The mask of a recipe covers
+# the master ingredients its lines are linked to, its own allergen rows
+# (for what no linked ingredient declares) and, through sub-recipes,
+# everything it uses; models.recipe_graph keeps it in step on every flush.
+ALLERGENS = ["Dairy", "Eggs", "Peanuts", "Tree Nuts", "Fish", "Shellfish", "Soy", "Wheat"]
+
+ALLERGEN_BITS = {name.casefold(): 1 << position for position, name in enumerate(ALLERGENS)}
+
+# allergen_free lists the matching masks for the index to seek while there
+# are at most this many, and tests the bits on an index scan beyond that
+MAX_MASK_SEEKS = 1024
+
+
+def allergen_mask(names):
+    # Bits of the listed allergens among names; others have no bit
+    mask = 0
+    for name in names:
+        mask |= ALLERGEN_BITS.get(name.strip().casefold(), 0)
+    return mask
+
+
+def allergen_names(mask):
+    return [name for position, name in enumerate(ALLERGENS) if mask & (1 << position)]
+
+
+def unlisted_allergens(names):
+    # Names with no bit, e.g. typed into the database by hand
+    return {name for name in names if name.strip().casefold() not in ALLERGEN_BITS}
+
+
+def allergen_free(names, column=Recipe.allergen_mask):
+    # Criterion for recipes free of every named allergen. Masks are small, so
+    # every mask without those bits can usually be listed and looked up in
+    # ix_recipes_allergen_mask rather than testing each recipe's bits.
+    unknown = unlisted_allergens(names)
+    if unknown:
+        raise ValueError(f"Unknown allergens: {', '.join(sorted(unknown))}; expected {', '.join(ALLERGENS)}")
+    excluded = allergen_mask(names)
+    free_bits = [1 << position for position in range(len(ALLERGENS)) if not excluded & (1 << position)]
+    if 1 << len(free_bits) > MAX_MASK_SEEKS:
+        return column.op('&')(excluded) == 0
+    masks = [0]
+    for bit in free_bits:
+        masks += [mask | bit for mask in masks]
+    return column.in_(masks)
+
+
+def recipes_free_of(session, names, *criteria):
+    # (id, name, category, subcategory) of the recipes free of every named
+    # allergen and matching criteria, e.g. Recipe.category == "Buffet"
+    return recipe_summaries(session, allergen_free(names), *criteria)
+
+
+def combined_masks(own, uses, known):
+    # {id: mask} for the recipes in own ({id: own mask}), adding the masks
+    # of the recipes each uses (uses: {id: [sub-recipe ids]}). Sub-recipes
+    # outside own take their mask from known. A cycle adds nothing more.
+    masks = {}
+
+    def visit(recipe_id, path):
+        if recipe_id in masks:
+            return masks[recipe_id]
+        if recipe_id not in own:
+            return known.get(recipe_id, 0)
+        if recipe_id in path:
+            return 0
+        path.add(recipe_id)
+        mask = own[recipe_id]
+        for sub_recipe_id in uses.get(recipe_id, ()):
+            mask |= visit(sub_recipe_id, path)
+        path.discard(recipe_id)
+        masks[recipe_id] = mask
+        return mask
+
+    for recipe_id in own:
+        visit(recipe_id, set())
+    return masks
+
+
+def ingredient_masks(session, recipe_ids):
+    # {id: OR of the masks of the master ingredients its lines are linked
+    # to} for the recipes with a flagged ingredient
+    recipe_ids = list(recipe_ids)
+    masks = {}
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        for recipe_id, mask in session.query(Ingredient.recipe_id, MasterIngredient.allergen_mask).join(
+            MasterIngredient, MasterIngredient.id == Ingredient.master_ingredient_id
+        ).filter(
+            Ingredient.recipe_id.in_(recipe_ids[start:start + CHUNK_SIZE]), MasterIngredient.allergen_mask != 0
+        ):
+            masks[recipe_id] = masks.get(recipe_id, 0) | mask
+    return masks
+
+
+def update_allergen_masks(session, recipe_ids):
+    # Recomputes the masks of the recipes from their linked ingredients,
+    # allergen rows and sub-recipes. recipe_ids must include every recipe
+    # using one of them, as models.recipe_graph passes. Writes on the
+    # connection, like the version bump, so no ORM events fire from inside
+    # a flush.
+    recipe_ids = list(recipe_ids)
+    own = {}
+    uses = {}
+    linked = ingredient_masks(session, recipe_ids)
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        chunk = recipe_ids[start:start + CHUNK_SIZE]
+        own.update(
+            (recipe_id, linked.get(recipe_id, 0))
+            for (recipe_id,) in session.query(Recipe.id).filter(Recipe.id.in_(chunk))
+        )
+        for recipe_id, allergen in session.query(Allergen.recipe_id, Allergen.allergen).filter(
+            Allergen.recipe_id.in_(chunk)
+        ):
+            if recipe_id in own:
+                own[recipe_id] |= allergen_mask([allergen])
+        for recipe_id, sub_recipe_id in session.query(Ingredient.recipe_id, Ingredient.sub_recipe_id).filter(
+            Ingredient.recipe_id.in_(chunk), Ingredient.sub_recipe_id.isnot(None)
+        ):
+            uses.setdefault(recipe_id, []).append(sub_recipe_id)
+    outside = list({sub_recipe_id for subs in uses.values() for sub_recipe_id in subs} - own.keys())
+    known = {}
+    for start in range(0, len(outside), CHUNK_SIZE):
+        known.update(session.query(Recipe.id, Recipe.allergen_mask).filter(
+            Recipe.id.in_(outside[start:start + CHUNK_SIZE])
+        ))
+    masks = combined_masks(own, uses, known)
+    if not masks:
+        return masks
+    recipes = Recipe.__table__
+    session.connection().execute(
+        update(recipes).where(recipes.c.id == bindparam('recipe_id')).values(allergen_mask=bindparam('mask')),
+        [{"recipe_id": recipe_id, "mask": mask} for recipe_id, mask in masks.items()]
+    )
+    for recipe_id in masks:
+        recipe = session.identity_map.get(session.identity_key(Recipe, recipe_id))
+        if recipe is not None:
+            session.expire(recipe, ['allergen_mask'])
+    return masks
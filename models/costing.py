@@ -0,0 +1,262 @@
+from datetime import date, datetime
+
+from sqlalchemy import and_, delete, event, func, insert, update
+from sqlalchemy.orm import Session, attributes, object_session
+
+from models.loaders import CHUNK_SIZE
+from models.models import Event, EventItem, Ingredient, IngredientCost, Recipe, RecipeCost
+from models.recipe_graph import YIELD_COLUMNS, ancestors, recipe_flattener, recipe_yield, recipes_using
+from utils.scaling import menu_batches, portions_per_batch
+from utils.units import units
+
+# Recipe and event costs at current prices, kept in recipe_costs and on
+# events. Commits record which prices, recipe lines and menus they touch;
+# before the commit completes only the affected recipes, and the open events
+# that serve them, are recomputed, in the same transaction. Bulk statements
+# fall back to a full rebuild.
+
+
+def _chunks(keys):
+    keys = list(keys)
+    for start in range(0, len(keys), CHUNK_SIZE):
+        yield keys[start:start + CHUNK_SIZE]
+
+
+def current_prices(session, master_ids, as_of=None, registry=units):
+    # {master id: (cost per base unit, dimension)} for the latest price in
+    # effect on as_of; a later entry wins over one with the same date
+    as_of = as_of or date.today()
+    prices = {}
+    for chunk in _chunks(master_ids):
+        latest = session.query(
+            IngredientCost.master_ingredient_id.label('master_ingredient_id'),
+            func.max(IngredientCost.effective_date).label('effective_date')
+        ).filter(
+            IngredientCost.master_ingredient_id.in_(chunk),
+            IngredientCost.effective_date <= as_of
+        ).group_by(IngredientCost.master_ingredient_id).subquery()
+        for master_id, unit_cost, uom in session.query(
+            IngredientCost.master_ingredient_id, IngredientCost.unit_cost, IngredientCost.uom
+        ).join(latest, and_(
+            IngredientCost.master_ingredient_id == latest.c.master_ingredient_id,
+            IngredientCost.effective_date == latest.c.effective_date
+        )).order_by(IngredientCost.id):
+            unit = registry.lookup(uom)
+            prices[master_id] = (unit_cost / unit.factor, unit.dimension)
+    return prices
+
+
+def recompute_recipe_costs(session, recipe_ids, as_of=None, registry=units):
+    # Rewrites the recipe_costs rows of the recipes from their flattened
+    # lines; rows of recipes that no longer exist are dropped. Returns
+    # {recipe id: (cost, unpriced lines)}.
+    recipe_ids = set(recipe_ids)
+    flat = recipe_flattener.get(session, recipe_ids)
+    costs = {recipe_id: [0.0, 0] for recipe_id in flat}
+    lines = [
+        (recipe_id, master_id, quantity, uom)
+        for recipe_id, recipe in flat.items() for master_id, _, quantity, uom in recipe.lines
+    ]
+    prices = current_prices(
+        session, {master_id for _, master_id, _, _ in lines if master_id is not None}, as_of, registry
+    )
+    converted = registry.to_base_batch([(quantity, uom) for _, _, quantity, uom in lines])
+    for (recipe_id, master_id, _, _), (base_quantity, unit) in zip(lines, converted):
+        price = prices.get(master_id)
+        if price is not None and price[1] == unit.dimension:
+            costs[recipe_id][0] += base_quantity * price[0]
+        else:
+            costs[recipe_id][1] += 1
+
+    updated_at = datetime.now().isoformat(timespec="seconds")
+    for chunk in _chunks(recipe_ids):
+        session.execute(delete(RecipeCost).where(RecipeCost.recipe_id.in_(chunk)))
+    if costs:
+        session.execute(insert(RecipeCost), [
+            {"recipe_id": recipe_id, "cost": cost, "unpriced_lines": unpriced, "updated_at": updated_at}
+            for recipe_id, (cost, unpriced) in costs.items()
+        ])
+    return {recipe_id: tuple(total) for recipe_id, total in costs.items()}
+
+
+def recompute_event_costs(session, event_ids):
+    # Event cost is the sum over its menu of batches x recipe cost, with
+    # batches from the menu quantity and recipe yield as in the BEO engine;
+    # items whose recipe is uncosted or only partly priced are counted as
+    # unpriced
+    event_ids = set(event_ids)
+    totals = {event_id: [0.0, 0] for event_id in event_ids}
+    for chunk in _chunks(event_ids):
+        for row in session.query(
+            EventItem.event_id, EventItem.quantity, RecipeCost.cost, RecipeCost.unpriced_lines,
+            *(getattr(Recipe, column) for column in YIELD_COLUMNS)
+        ).outerjoin(
+            RecipeCost, RecipeCost.recipe_id == EventItem.recipe_id
+        ).outerjoin(
+            Recipe, Recipe.id == EventItem.recipe_id
+        ).filter(EventItem.event_id.in_(chunk)):
+            total = totals[row.event_id]
+            if row.cost is None or row.unpriced_lines:
+                total[1] += 1
+            if row.cost is not None:
+                scaling = recipe_yield(row)
+                total[0] += menu_batches(row.quantity, portions_per_batch(scaling), scaling.increment) * row.cost
+    existing = set()
+    for chunk in _chunks(event_ids):
+        existing.update(event_id for (event_id,) in session.query(Event.id).filter(Event.id.in_(chunk)))
+    rows = [
+        {"id": event_id, "cost": cost, "unpriced_items": unpriced}
+        for event_id, (cost, unpriced) in totals.items() if event_id in existing
+    ]
+    if rows:
+        session.execute(update(Event), rows)
+    return {event_id: tuple(total) for event_id, total in totals.items()}
+
+
+def open_events_serving(session, recipe_ids, as_of=None):
+    # Events from as_of on that are not cancelled and have one of the recipes
+    as_of = as_of or date.today()
+    event_ids = set()
+    for chunk in _chunks(recipe_ids):
+        event_ids.update(
+            event_id for (event_id,) in session.query(EventItem.event_id).join(
+                Event, Event.id == EventItem.event_id
+            ).filter(
+                EventItem.recipe_id.in_(chunk),
+                Event.event_date >= as_of,
+                Event.status != "cancelled"
+            ).distinct()
+        )
+    return event_ids
+
+
+def update_costs(session, master_ids=(), recipe_ids=(), event_ids=(), as_of=None):
+    # Prices changed for master_ids, lines changed in recipe_ids and menus
+    # changed in event_ids: recompute what depends on them
+    recipe_ids = set(recipe_ids) | recipes_using(session, master_ids)
+    # Recipes using a changed one as a sub-recipe
+    recipe_ids |= ancestors(session, recipe_ids)
+    if recipe_ids:
+        recompute_recipe_costs(session, recipe_ids, as_of)
+    event_ids = set(event_ids) | open_events_serving(session, recipe_ids, as_of)
+    if event_ids:
+        recompute_event_costs(session, event_ids)
+    return recipe_ids, event_ids
+
+
+def rebuild_costs(session):
+    # Every recipe and every open event, e.g. after a bulk statement
+    update_costs(session, recipe_ids=[recipe_id for (recipe_id,) in session.query(Recipe.id)])
+
+
+def refresh_due_costs(session, as_of=None):
+    # Prices dated ahead take effect without a commit; recompute the recipes
+    # whose rollup predates a price that has since come into effect
+    as_of = as_of or date.today()
+    due = {
+        recipe_id for (recipe_id,) in session.query(RecipeCost.recipe_id).join(
+            Ingredient, Ingredient.recipe_id == RecipeCost.recipe_id
+        ).join(
+            IngredientCost, IngredientCost.master_ingredient_id == Ingredient.master_ingredient_id
+        ).filter(
+            IngredientCost.effective_date > func.date(RecipeCost.updated_at),
+            IngredientCost.effective_date <= as_of
+        ).distinct()
+    }
+    if due:
+        update_costs(session, recipe_ids=due, as_of=as_of)
+    return due
+
+
+def set_unit_cost(session, master_ingredient_id, unit_cost, uom, effective_date=None):
+    # Records a price; the rollups follow when the session commits
+    price = IngredientCost(
+        master_ingredient_id=master_ingredient_id,
+        unit_cost=unit_cost,
+        uom=uom,
+        effective_date=effective_date or date.today()
+    )
+    session.add(price)
+    return price
+
+
+def _mark(target, key, value):
+    if value is None:
+        return
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(key, set()).add(value)
+
+
+def _mark_history(target, key, attribute):
+    _mark(target, key, getattr(target, attribute))
+    for old_value in attributes.get_history(target, attribute).deleted:
+        _mark(target, key, old_value)
+
+
+def _price_changed(mapper, connection, target):
+    _mark_history(target, 'cost_masters', 'master_ingredient_id')
+
+
+def _line_changed(mapper, connection, target):
+    _mark_history(target, 'cost_recipes', 'recipe_id')
+
+
+def _recipe_deleted(mapper, connection, target):
+    _mark(target, 'cost_recipes', target.id)
+
+
+def _recipe_updated(mapper, connection, target):
+    # A new yield changes what the events serving it cost
+    if any(attributes.get_history(target, column).has_changes() for column in YIELD_COLUMNS):
+        _mark(target, 'cost_recipes', target.id)
+
+
+def _menu_changed(mapper, connection, target):
+    _mark_history(target, 'cost_events', 'event_id')
+
+
+def _event_changed(mapper, connection, target):
+    _mark(target, 'cost_events', target.id)
+
+
+for _mapped, _listener in ((IngredientCost, _price_changed), (Ingredient, _line_changed),
+                           (EventItem, _menu_changed)):
+    for _name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_mapped, _name, _listener)
+event.listen(Recipe, 'after_delete', _recipe_deleted)
+event.listen(Recipe, 'after_update', _recipe_updated)
+event.listen(Event, 'after_insert', _event_changed)
+event.listen(Event, 'after_update', _event_changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    # query.update()/delete() bypass the mapper events
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Ingredient, IngredientCost, EventItem, Recipe):
+        orm_execute_state.session.info['costs_stale'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _session_committing(session):
+    # Flush first so pending changes have been recorded
+    session.flush()
+    stale = session.info.pop('costs_stale', False)
+    master_ids = session.info.pop('cost_masters', set())
+    recipe_ids = session.info.pop('cost_recipes', set())
+    event_ids = session.info.pop('cost_events', set())
+    if stale:
+        rebuild_costs(session)
+        if event_ids:
+            recompute_event_costs(session, event_ids)
+    elif master_ids or recipe_ids or event_ids:
+        update_costs(session, master_ids, recipe_ids, event_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    for key in ('costs_stale', 'cost_masters', 'cost_recipes', 'cost_events'):
+        session.info.pop(key, None)
@@ -0,0 +1,139 @@
+import os
+from threading import Lock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import config
+import models.costing  # noqa: F401 -- registers the cost rollup listeners
+from models.migrations import run_migrations
+from models.models import Base
+
+
+# PRAGMAs applied, in order, to each new connection. Values are read back and
+# reported at startup, since SQLite silently ignores some (e.g. WAL on a
+# read-only or unsupported filesystem).
+SQLITE_PROFILES = {
+    # Stock SQLite behaviour, apart from waiting on locks instead of failing
+    "default": [
+        ("busy_timeout", 5000),
+    ],
+    # Local disk: readers and the writer don't block each other, commits
+    # only sync at checkpoints, and hot pages are served from memory
+    "desktop": [
+        ("busy_timeout", 5000),
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -65536),
+        ("mmap_size", 268435456),
+        ("temp_store", "MEMORY"),
+    ],
+    # Database on a network share: WAL and mmap both need shared memory that
+    # network filesystems don't provide, so keep a rollback journal but cut
+    # the fsyncs and round trips
+    "network": [
+        ("busy_timeout", 15000),
+        ("journal_mode", "TRUNCATE"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -65536),
+        ("mmap_size", 0),
+        ("temp_store", "MEMORY"),
+    ],
+}
+
+REPORTED_PRAGMAS = ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+
+
+def sqlite_profile(name):
+    if name not in SQLITE_PROFILES:
+        raise ValueError(
+            f"Unknown SQLite profile '{name}'; expected one of {', '.join(SQLITE_PROFILES)}"
+        )
+    return SQLITE_PROFILES[name]
+
+
+def apply_profile(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in pragmas:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    finally:
+        cursor.close()
+
+
+def database_path(path=None):
+    return os.path.abspath(path or config.DATABASE_PATH)
+
+
+class Database:
+    # Owns the engine for one database file. Nothing is opened until the first
+    # session is requested; at that point the schema is created and migrated.
+
+    def __init__(self, path=None, profile=None):
+        self.path = path
+        self.profile = profile
+        self._engine = None
+        self._session_factory = None
+        self._lock = Lock()
+        # Thread-local session, so the UI thread and any worker thread each
+        # get their own
+        self.session = scoped_session(self.new_session)
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._open()
+        return self._engine
+
+    def _open(self):
+        pragmas = sqlite_profile(self.profile_name)
+        engine = create_engine(f"sqlite:///{database_path(self.path)}")
+        event.listen(
+            engine, "connect",
+            lambda dbapi_connection, record: apply_profile(dbapi_connection, pragmas)
+        )
+        Base.metadata.create_all(engine)
+        run_migrations(engine)
+        self._session_factory = sessionmaker(bind=engine)
+        self._engine = engine
+
+    @property
+    def profile_name(self):
+        return self.profile or config.SQLITE_PROFILE
+
+    def configure(self, path=None, profile=None):
+        if self._engine is not None:
+            raise RuntimeError("Database is already open; configure it before first use")
+        self.path = path or self.path
+        self.profile = profile or self.profile
+
+    def active_settings(self):
+        # The values SQLite actually applied, as seen by a pooled connection
+        with self.engine.connect() as connection:
+            return {
+                pragma: connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+                for pragma in REPORTED_PRAGMAS
+            }
+
+    def describe(self):
+        settings = ", ".join(f"{pragma}={value}" for pragma, value in self.active_settings().items())
+        return f"{database_path(self.path)} [{self.profile_name}] {settings}"
+
+    def new_session(self):
+        # Independent session for workers, tools and scripts
+        self.engine
+        return self._session_factory()
+
+    def dispose(self):
+        with self._lock:
+            self.session.remove()
+            if self._engine is not None:
+                self._engine.dispose()
+            self._engine = None
+            self._session_factory = None
+
+
+db = Database()
+session = db.session
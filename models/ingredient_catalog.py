@@ -0,0 +1,134 @@
+from threading import RLock
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes, object_session
+
+from models.models import MasterIngredient
+from utils.search_index import TrigramIndex
+
+
+class IngredientCatalog:
+    # Master ingredient names and preferred UOMs held in memory for completion
+    # and name lookups. Loaded with one query and searched without touching
+    # the database. Commits that add, delete or rename ingredients, or change
+    # their preferred UOM, are applied to the loaded entries and index in
+    # place; bulk statements drop them.
+
+    def __init__(self):
+        self._by_name = None
+        self._names = None
+        self._index = None
+        self._lock = RLock()
+
+    @property
+    def loaded(self):
+        return self._by_name is not None
+
+    def load(self, session):
+        with self._lock:
+            if self._by_name is None:
+                rows = session.query(
+                    MasterIngredient.id,
+                    MasterIngredient.name,
+                    MasterIngredient.preferred_uom
+                ).all()
+                self._by_name = {name.lower(): (master_id, name, uom) for master_id, name, uom in rows}
+                self._names = {master_id: name for master_id, name, uom in rows}
+                self._index = TrigramIndex(self._names.items())
+            return self
+
+    def invalidate(self):
+        with self._lock:
+            self._by_name = None
+            self._names = None
+            self._index = None
+
+    def apply(self, changes):
+        # changes: {id: (name, preferred_uom), or None once deleted}
+        with self._lock:
+            if self._by_name is None:
+                return
+            for master_id, entry in changes.items():
+                old_name = self._names.pop(master_id, None)
+                if old_name is not None and self._by_name.get(old_name.lower(), (None,))[0] == master_id:
+                    del self._by_name[old_name.lower()]
+                if entry is None:
+                    self._index.remove(master_id)
+                    continue
+                name, uom = entry
+                self._by_name[name.lower()] = (master_id, name, uom)
+                self._names[master_id] = name
+                if name != old_name:
+                    self._index.add(master_id, name)
+
+    def lookup(self, name):
+        # (id, name, preferred_uom) for a case-insensitive exact name, or None
+        with self._lock:
+            if self._by_name is None:
+                return None
+            return self._by_name.get(name.strip().lower())
+
+    def search(self, text, limit=20):
+        # Ranked ids for what has been typed so far; empty until loaded
+        with self._lock:
+            if self._index is None:
+                return []
+            return self._index.search(text, limit)
+
+    def complete(self, text, limit=20):
+        with self._lock:
+            return [self._names[master_id] for master_id in self.search(text, limit)]
+
+
+ingredient_catalog = IngredientCatalog()
+
+
+def _record(target, entry):
+    # Kept until the commit, the last change to an ingredient winning
+    session = object_session(target)
+    if session is None:
+        ingredient_catalog.invalidate()
+    else:
+        session.info.setdefault('catalog_changes', {})[target.id] = entry
+
+
+@event.listens_for(MasterIngredient, 'after_insert')
+def _master_inserted(mapper, connection, target):
+    _record(target, (target.name, target.preferred_uom))
+
+
+@event.listens_for(MasterIngredient, 'after_delete')
+def _master_deleted(mapper, connection, target):
+    _record(target, None)
+
+
+@event.listens_for(MasterIngredient, 'after_update')
+def _master_updated(mapper, connection, target):
+    # Category and allergen edits leave the catalog as it is
+    if any(attributes.get_history(target, column).has_changes() for column in ('name', 'preferred_uom')):
+        _record(target, (target.name, target.preferred_uom))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    # query.update()/delete() bypass the mapper events
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is MasterIngredient:
+        orm_execute_state.session.info['catalog_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changes = session.info.pop('catalog_changes', None)
+    if session.info.pop('catalog_stale', False):
+        ingredient_catalog.invalidate()
+    elif changes:
+        ingredient_catalog.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('catalog_stale', None)
+    session.info.pop('catalog_changes', None)
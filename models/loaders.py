@@ -0,0 +1,58 @@
+from sqlalchemy.orm import selectinload
+
+from models.models import Recipe
+
+# Keep IN lists well under SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def _recipe_graphs(session, column, keys):
+    # Recipes matching the keys with their ingredients and allergens, in
+    # three queries (one per table) per chunk of keys, ordered by id
+    keys = list(dict.fromkeys(keys))
+    for start in range(0, len(keys), CHUNK_SIZE):
+        chunk = keys[start:start + CHUNK_SIZE]
+        yield from session.query(Recipe).options(
+            selectinload(Recipe.ingredients),
+            selectinload(Recipe.allergens)
+        ).filter(column.in_(chunk)).order_by(Recipe.id)
+
+
+def load_recipe_graph(session, names):
+    # Fetch the named recipes with their ingredients and allergens however
+    # many recipes are selected. Returns {name: Recipe}; like
+    # filter_by(name=...).first(), the lowest id wins when two recipes share
+    # a name.
+    recipes = {}
+    for recipe in _recipe_graphs(session, Recipe.name, names):
+        recipes.setdefault(recipe.name, recipe)
+    return recipes
+
+
+def load_recipes_by_id(session, recipe_ids):
+    # As load_recipe_graph, keyed by id: {id: Recipe}
+    return {recipe.id: recipe for recipe in _recipe_graphs(session, Recipe.id, recipe_ids)}
+
+
+def recipe_summaries(session, *criteria):
+    # (id, name, category, subcategory) for the matching recipes, ordered by
+    # name, without loading full Recipe objects
+    return [
+        tuple(row) for row in session.query(
+            Recipe.id, Recipe.name, Recipe.category, Recipe.subcategory
+        ).filter(*criteria).order_by(Recipe.name)
+    ]
+
+
+def recipe_ids_by_name(session, names):
+    # {name: id} for the named recipes; the lowest id wins when two recipes
+    # share a name, as in load_recipe_graph
+    names = list(dict.fromkeys(names))
+    ids = {}
+    for start in range(0, len(names), CHUNK_SIZE):
+        chunk = names[start:start + CHUNK_SIZE]
+        for recipe_id, name in session.query(Recipe.id, Recipe.name).filter(
+            Recipe.name.in_(chunk)
+        ).order_by(Recipe.id):
+            ids.setdefault(name, recipe_id)
+    return ids
@@ -0,0 +1,210 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models.allergens import allergen_mask, combined_masks
+from models.models import Base
+
+# Ordered list of (version, description, function). Every migration must be
+# safe to re-run against a database that already has its changes, because a
+# fresh database gets them from create_all before the runner sees it.
+MIGRATIONS = []
+
+# Lookups that run on every lazy relationship load, name search or tree load,
+# with the table each reads. Their plans are shown before and after the
+# migration that indexes that table; a database too old to have the table
+# yet has no plan for it.
+HOT_QUERIES = [
+    ("ingredients by recipe", "ingredients", "SELECT * FROM ingredients WHERE recipe_id = 1"),
+    ("ingredient usage", "ingredients", "SELECT count(*) FROM ingredients WHERE master_ingredient_id = 1"),
+    ("allergens by recipe", "allergens", "SELECT * FROM allergens WHERE recipe_id = 1"),
+    ("recipe by name", "recipes", "SELECT * FROM recipes WHERE name = 'x'"),
+    ("recipes in category", "recipes", "SELECT id, name FROM recipes WHERE category = 'x' AND subcategory = 'y'"),
+    ("events by date", "events",
+     "SELECT id, name FROM events WHERE event_date >= '2026-01-01' ORDER BY event_date"),
+    ("events by status", "events", "SELECT count(*) FROM events WHERE status = 'draft'"),
+    ("items by event", "event_items", "SELECT * FROM event_items WHERE event_id = 1"),
+]
+
+
+def migration(version, description):
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+
+def column_names(connection, table):
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def table_names(connection):
+    return {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def query_plans(connection, tables=None):
+    # {label: plan} for the hot queries on tables (default: all) that exist
+    existing = table_names(connection)
+    plans = {}
+    for label, table, sql in HOT_QUERIES:
+        if table not in existing or (tables is not None and table not in tables):
+            continue
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        plans[label] = "; ".join(row[-1] for row in rows)
+    return plans
+
+
+def report_plans(report, before, after):
+    for label, _, _ in HOT_QUERIES:
+        if label in after:
+            report(f"  {label}:")
+            report(f"    before: {before.get(label, '(no table)')}")
+            report(f"    after:  {after[label]}")
+
+
+@migration(1, "Add category and subcategory to recipes")
+def add_recipe_categories(connection, report):
+    existing = column_names(connection, "recipes")
+    for column in ("category", "subcategory"):
+        if column not in existing:
+            connection.exec_driver_sql(f"ALTER TABLE recipes ADD COLUMN {column} TEXT")
+
+
+@migration(2, "Index foreign keys, recipe names and recipe categories")
+def add_hot_path_indexes(connection, report):
+    tables = ("ingredients", "allergens", "recipes")
+    before = query_plans(connection, tables)
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ingredients_recipe_id ON ingredients (recipe_id)")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ingredients_master_ingredient_id "
+        "ON ingredients (master_ingredient_id)")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_allergens_recipe_id ON allergens (recipe_id)")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_recipes_name ON recipes (name)")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_recipes_category_subcategory "
+        "ON recipes (category, subcategory)")
+    connection.exec_driver_sql("ANALYZE")
+    report_plans(report, before, query_plans(connection, tables))
+
+
+@migration(3, "Add events and event items")
+def add_events(connection, report):
+    tables = ("events", "event_items")
+    before = query_plans(connection, tables)
+    # checkfirst, so tables and indexes already made by create_all are kept
+    Base.metadata.create_all(connection, tables=[Base.metadata.tables[table] for table in tables])
+    connection.exec_driver_sql("ANALYZE")
+    report_plans(report, before, query_plans(connection, tables))
+
+
+@migration(4, "Add ingredient costs, recipe cost rollups and event costs")
+def add_costs(connection, report):
+    Base.metadata.create_all(
+        connection,
+        tables=[Base.metadata.tables["ingredient_costs"], Base.metadata.tables["recipe_costs"]]
+    )
+    existing = column_names(connection, "events")
+    for column, sql_type in (("cost", "REAL"), ("unpriced_items", "INTEGER")):
+        if column not in existing:
+            connection.exec_driver_sql(f"ALTER TABLE events ADD COLUMN {column} {sql_type}")
+
+
+@migration(5, "Add sub-recipe lines and recipe versions")
+def add_sub_recipes(connection, report):
+    if "version" not in column_names(connection, "recipes"):
+        connection.exec_driver_sql("ALTER TABLE recipes ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    if "sub_recipe_id" not in column_names(connection, "ingredients"):
+        connection.exec_driver_sql("ALTER TABLE ingredients ADD COLUMN sub_recipe_id INTEGER REFERENCES recipes (id)")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ingredients_sub_recipe_id ON ingredients (sub_recipe_id)")
+
+
+@migration(6, "Add recipe yields and batch increments")
+def add_recipe_yields(connection, report):
+    existing = column_names(connection, "recipes")
+    for column, sql_type in (("yield_quantity", "REAL"), ("yield_uom", "TEXT"), ("portion_size", "REAL"),
+                             ("portion_uom", "TEXT"), ("batch_increment", "REAL")):
+        if column not in existing:
+            connection.exec_driver_sql(f"ALTER TABLE recipes ADD COLUMN {column} {sql_type}")
+
+
+@migration(7, "Add recipe allergen masks")
+def add_allergen_masks(connection, report):
+    if "allergen_mask" not in column_names(connection, "recipes"):
+        connection.exec_driver_sql("ALTER TABLE recipes ADD COLUMN allergen_mask INTEGER NOT NULL DEFAULT 0")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_recipes_allergen_mask ON recipes (allergen_mask)")
+    own = {recipe_id: 0 for (recipe_id,) in connection.exec_driver_sql("SELECT id FROM recipes")}
+    for recipe_id, allergen in connection.exec_driver_sql("SELECT recipe_id, allergen FROM allergens"):
+        if recipe_id in own:
+            own[recipe_id] |= allergen_mask([allergen])
+    uses = {}
+    for recipe_id, sub_recipe_id in connection.exec_driver_sql(
+        "SELECT recipe_id, sub_recipe_id FROM ingredients WHERE sub_recipe_id IS NOT NULL"
+    ):
+        uses.setdefault(recipe_id, []).append(sub_recipe_id)
+    masks = combined_masks(own, uses, {})
+    if masks:
+        connection.exec_driver_sql(
+            "UPDATE recipes SET allergen_mask = ? WHERE id = ?",
+            [(mask, recipe_id) for recipe_id, mask in masks.items()]
+        )
+    report(f"  {sum(1 for mask in masks.values() if mask)} of {len(masks)} recipes have allergens")
+
+
+@migration(8, "Add master ingredient allergen flags")
+def add_ingredient_allergens(connection, report):
+    # No ingredient is flagged yet, so the recipe masks stand as they are
+    if "allergen_mask" not in column_names(connection, "master_ingredients"):
+        connection.exec_driver_sql(
+            "ALTER TABLE master_ingredients ADD COLUMN allergen_mask INTEGER NOT NULL DEFAULT 0")
+
+
+def ensure_version_table(connection):
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description TEXT NOT NULL, "
+        "applied_at TEXT NOT NULL)"
+    )
+
+
+def current_version(connection):
+    ensure_version_table(connection)
+    return connection.exec_driver_sql(
+        "SELECT coalesce(max(version), 0) FROM schema_version"
+    ).scalar()
+
+
+def pending_migrations(connection):
+    version = current_version(connection)
+    return [entry for entry in MIGRATIONS if entry[0] > version]
+
+
+def run_migrations(engine, report=None):
+    # Each migration commits together with its schema_version row, so an
+    # interrupted run resumes at the first migration that did not finish.
+    report = report or (lambda message: None)
+    applied = []
+    with engine.connect() as connection:
+        pending = pending_migrations(connection)
+        connection.commit()
+    for version, description, func in pending:
+        with engine.begin() as connection:
+            report(f"Applying migration {version}: {description}")
+            func(connection, report)
+            connection.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {
+                    "version": version,
+                    "description": description,
+                    "applied_at": datetime.now().isoformat(timespec="seconds"),
+                }
+            )
+        applied.append(version)
+    return applied
+
@@ -1,5 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, Table
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Table, Index
+from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -11,6 +11,9 @@ class MasterIngredient(Base):
     category = Column(String)  # Optional categorization
     preferred_uom = Column(String)  # Preferred unit of measure
     last_used = Column(String)  # To track usage
+    # Bits of models.allergens.ALLERGENS the ingredient carries; recipes
+    # with a line linked to it take them into their own allergen_mask
+    allergen_mask = Column(Integer, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
         return f"<MasterIngredient(name='{self.name}')>"
@@ -19,38 +22,105 @@ class MasterIngredient(Base):
 class Recipe(Base):
     __tablename__ = 'recipes'
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     menu_description = Column(String)
     category = Column(String)
     subcategory = Column(String)
+    # Bumped whenever the lines or allergens of this recipe, or of any recipe
+    # it uses, change; maintained by models.recipe_graph
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    # What one batch (the lines as written) makes, see utils.scaling
+    yield_quantity = Column(Float)
+    yield_uom = Column(String)
+    portion_size = Column(Float)
+    portion_uom = Column(String)
+    batch_increment = Column(Float)
+    # Bits of models.allergens.ALLERGENS in this recipe and what it uses,
+    # kept in step with the allergen rows and linked master ingredients
+    allergen_mask = Column(Integer, nullable=False, default=0, server_default='0', index=True)
+
+    __table_args__ = (
+        Index('ix_recipes_category_subcategory', 'category', 'subcategory'),
+    )
 
-    ingredients = relationship("Ingredient", back_populates="recipe", cascade="all, delete, delete-orphan")
+    ingredients = relationship("Ingredient", back_populates="recipe", cascade="all, delete, delete-orphan",
+                               foreign_keys="Ingredient.recipe_id")
     allergens = relationship("Allergen", back_populates="recipe", cascade="all, delete, delete-orphan")
 
 class Ingredient(Base):
     __tablename__ = 'ingredients'
     id = Column(Integer, primary_key=True)
-    recipe_id = Column(Integer, ForeignKey('recipes.id'))
+    recipe_id = Column(Integer, ForeignKey('recipes.id'), index=True)
     ingredient = Column(String, nullable=False)
     quantity = Column(Float, nullable=False)
     uom = Column(String, nullable=False)
-    master_ingredient_id = Column(Integer, ForeignKey('master_ingredients.id'))  # New reference
+    master_ingredient_id = Column(Integer, ForeignKey('master_ingredients.id'), index=True)  # New reference
+    # Set when the line is another recipe; quantity and uom are then an
+    # amount of that recipe, see utils.scaling.batches_for
+    sub_recipe_id = Column(Integer, ForeignKey('recipes.id'), index=True)
 
-    recipe = relationship("Recipe", back_populates="ingredients")
+    recipe = relationship("Recipe", back_populates="ingredients", foreign_keys=[recipe_id])
     master_ingredient = relationship("MasterIngredient")  # New relationship
+    sub_recipe = relationship("Recipe", foreign_keys=[sub_recipe_id])
 
 class Allergen(Base):
     __tablename__ = 'allergens'
     id = Column(Integer, primary_key=True)
-    recipe_id = Column(Integer, ForeignKey('recipes.id'))
+    recipe_id = Column(Integer, ForeignKey('recipes.id'), index=True)
     allergen = Column(String, nullable=False)
 
     recipe = relationship("Recipe", back_populates="allergens")
 
-# Database setup
-engine = create_engine('sqlite:///banquet_planning.db')
-Session = sessionmaker(bind=engine)
-session = Session()
 
-# Create the new table
-Base.metadata.create_all(engine)
\ No newline at end of file
+class Event(Base):
+    __tablename__ = 'events'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    event_date = Column(Date, nullable=False, index=True)
+    guest_count = Column(Integer, nullable=False)
+    special_requirements = Column(String)
+    status = Column(String, nullable=False, default='draft', index=True)
+    updated_at = Column(String)
+    cost = Column(Float)  # Rolled up from recipe_costs; maintained by models.costing
+    unpriced_items = Column(Integer)
+
+    items = relationship("EventItem", back_populates="event", cascade="all, delete, delete-orphan",
+                         order_by="EventItem.position")
+
+class EventItem(Base):
+    __tablename__ = 'event_items'
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey('events.id'), nullable=False, index=True)
+    recipe_id = Column(Integer, ForeignKey('recipes.id'), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)
+
+    event = relationship("Event", back_populates="items")
+    recipe = relationship("Recipe")
+
+
+class IngredientCost(Base):
+    # Price of a master ingredient per uom from effective_date on; the latest
+    # one in effect applies
+    __tablename__ = 'ingredient_costs'
+    id = Column(Integer, primary_key=True)
+    master_ingredient_id = Column(Integer, ForeignKey('master_ingredients.id'), nullable=False)
+    unit_cost = Column(Float, nullable=False)
+    uom = Column(String, nullable=False)
+    effective_date = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index('ix_ingredient_costs_master_effective', 'master_ingredient_id', 'effective_date'),
+    )
+
+    master_ingredient = relationship("MasterIngredient")
+
+
+class RecipeCost(Base):
+    # Cost of one batch of a recipe at current prices, maintained by
+    # models.costing. unpriced_lines counts ingredients with no usable price.
+    __tablename__ = 'recipe_costs'
+    recipe_id = Column(Integer, ForeignKey('recipes.id'), primary_key=True)
+    cost = Column(Float, nullable=False)
+    unpriced_lines = Column(Integer, nullable=False)
+    updated_at = Column(String, nullable=False)
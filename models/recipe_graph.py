@@ -0,0 +1,377 @@
+from collections import ChainMap, namedtuple
+from threading import RLock
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session, attributes, object_session
+
+from models.allergens import update_allergen_masks
+from models.loaders import CHUNK_SIZE
+from models.models import Allergen, Ingredient, MasterIngredient, Recipe
+from utils.scaling import RecipeYield, batches_for
+
+# Recipes used as ingredients of other recipes: a line with a sub_recipe_id
+# stands for an amount of that recipe, converted to its batches through its
+# yield (utils.scaling.batches_for). Flattening expands such lines,
+# to any depth, into raw ingredient totals per unit of the recipe, and is
+# kept per recipe version. Commits bump the version, and recompute the
+# allergen mask, of every recipe whose lines, allergens or yield changed and
+# of every recipe that uses one, and refuse lines that would make a recipe
+# contain itself. New allergen flags on a master ingredient recompute only
+# the masks of the recipes linked to it and of the recipes using those.
+
+
+# Nesting limit for walks done in SQL, where a cycle that got into the data
+# some other way would otherwise never end
+MAX_DEPTH = 32
+
+
+class RecipeCycleError(ValueError):
+    pass
+
+
+# lines: ((master_ingredient_id, name, quantity, uom), ...) per batch of the
+# recipe, with sub-recipes expanded; allergens include the sub-recipes'
+FlatRecipe = namedtuple('FlatRecipe', ['version', 'lines', 'allergens', 'recipe_yield'])
+
+# A recipe as stored: lines are (master_ingredient_id, name, quantity, uom,
+# sub_recipe_id)
+RecipeNode = namedtuple('RecipeNode', ['name', 'version', 'lines', 'allergens', 'recipe_yield'])
+
+YIELD_COLUMNS = ('yield_quantity', 'yield_uom', 'portion_size', 'portion_uom', 'batch_increment')
+
+
+def recipe_yield(recipe):
+    # RecipeYield of a Recipe, or of a row with the YIELD_COLUMNS
+    return RecipeYield(*(getattr(recipe, column) for column in YIELD_COLUMNS))
+
+
+def _chunks(keys):
+    keys = list(keys)
+    for start in range(0, len(keys), CHUNK_SIZE):
+        yield keys[start:start + CHUNK_SIZE]
+
+
+def _walk(session, recipe_ids, downward):
+    # {(origin, reached)} for every recipe reached from the origins through
+    # sub-recipe lines, down to what they use or up to what uses them. UNION
+    # drops repeated pairs, so the walk ends even on a cycle.
+    source, target = (
+        (Ingredient.recipe_id, Ingredient.sub_recipe_id) if downward
+        else (Ingredient.sub_recipe_id, Ingredient.recipe_id)
+    )
+    pairs = set()
+    for chunk in _chunks(recipe_ids):
+        walk = select(source.label('origin'), target.label('id')).where(
+            source.in_(chunk), Ingredient.sub_recipe_id.isnot(None)
+        ).cte('walk', recursive=True)
+        walk = walk.union(
+            select(walk.c.origin, target).join(walk, source == walk.c.id).where(
+                Ingredient.sub_recipe_id.isnot(None)
+            )
+        )
+        pairs.update(tuple(row) for row in session.execute(select(walk.c.origin, walk.c.id)))
+    return pairs
+
+
+def descendants(session, recipe_ids):
+    # Every recipe used, at any depth, by the recipes
+    return {recipe_id for _, recipe_id in _walk(session, recipe_ids, True)}
+
+
+def ancestors(session, recipe_ids):
+    # Every recipe that uses one of the recipes, at any depth
+    return {recipe_id for _, recipe_id in _walk(session, recipe_ids, False)}
+
+
+def recipes_using(session, master_ids):
+    # Recipes with a line linked to one of the master ingredients
+    recipe_ids = set()
+    for chunk in _chunks(master_ids):
+        recipe_ids.update(
+            recipe_id for (recipe_id,) in session.query(Ingredient.recipe_id).filter(
+                Ingredient.master_ingredient_id.in_(chunk)
+            ).distinct()
+        )
+    return recipe_ids
+
+
+def recipe_versions(session, recipe_ids):
+    versions = {}
+    for chunk in _chunks(recipe_ids):
+        versions.update(session.query(Recipe.id, Recipe.version).filter(Recipe.id.in_(chunk)))
+    return versions
+
+
+def load_nodes(session, recipe_ids):
+    # {id: RecipeNode} for the recipes, one query per table per chunk
+    nodes = {}
+    lines = {}
+    allergens = {}
+    for chunk in _chunks(recipe_ids):
+        for recipe_id, master_id, name, quantity, uom, sub_recipe_id in session.query(
+            Ingredient.recipe_id, Ingredient.master_ingredient_id, Ingredient.ingredient,
+            Ingredient.quantity, Ingredient.uom, Ingredient.sub_recipe_id
+        ).filter(Ingredient.recipe_id.in_(chunk)).order_by(Ingredient.id):
+            lines.setdefault(recipe_id, []).append((master_id, name, float(quantity), uom, sub_recipe_id))
+        for recipe_id, allergen in session.query(Allergen.recipe_id, Allergen.allergen).filter(
+            Allergen.recipe_id.in_(chunk)
+        ):
+            allergens.setdefault(recipe_id, set()).add(allergen)
+        for row in session.query(
+            Recipe.id, Recipe.name, Recipe.version, *(getattr(Recipe, column) for column in YIELD_COLUMNS)
+        ).filter(Recipe.id.in_(chunk)):
+            nodes[row.id] = RecipeNode(
+                row.name, row.version, tuple(lines.get(row.id, ())), frozenset(allergens.get(row.id, ())),
+                recipe_yield(row)
+            )
+    return nodes
+
+
+class RecipeFlattener:
+    # FlatRecipe per recipe, kept until the recipe's version moves on. A
+    # sub-recipe shared by many recipes on a menu is expanded once, and only
+    # recipes whose version changed are loaded again. A transaction that has
+    # changed recipes keeps what it flattens in session.info until it
+    # commits: a rollback hands its version numbers out again, and they
+    # must not find the rolled back lines.
+
+    def __init__(self):
+        self._flat = {}
+        self._lock = RLock()
+
+    def get(self, session, recipe_ids):
+        # {id: FlatRecipe} for the recipes that exist
+        with self._lock:
+            # Autoflushes, so the changes of the transaction are recorded
+            versions = recipe_versions(session, recipe_ids)
+            flat = self._cache(session)
+            missing = [recipe_id for recipe_id, version in versions.items() if not _current(flat, recipe_id, version)]
+            if missing:
+                closure = set(missing) | descendants(session, missing)
+                closure_versions = recipe_versions(session, closure)
+                nodes = load_nodes(session, [
+                    recipe_id for recipe_id, version in closure_versions.items()
+                    if not _current(flat, recipe_id, version)
+                ])
+                for recipe_id in missing:
+                    self._flatten(flat, recipe_id, closure_versions, nodes, [])
+            return {recipe_id: flat[recipe_id] for recipe_id in versions}
+
+    def _cache(self, session):
+        # Shared entries, or the transaction's own over those it hasn't
+        # changed; after a bulk statement, none of the shared ones hold
+        changed = session.info.get('flattened_changes')
+        if changed is None:
+            return self._flat
+        return ChainMap(session.info.setdefault('flattened_recipes', {}), {} if changed is True else self._flat)
+
+    def _flatten(self, flat, recipe_id, versions, nodes, path):
+        if recipe_id not in versions:
+            # Deleted
+            return None
+        if _current(flat, recipe_id, versions[recipe_id]):
+            return flat[recipe_id]
+        node = nodes[recipe_id]
+        if recipe_id in path:
+            cycle = path[path.index(recipe_id):] + [recipe_id]
+            raise RecipeCycleError(
+                "Recipe uses itself: " + " -> ".join(nodes[step].name for step in cycle)
+            )
+        path.append(recipe_id)
+        totals = {}
+        allergens = set(node.allergens)
+        for master_id, name, quantity, uom, sub_recipe_id in node.lines:
+            sub = self._flatten(flat, sub_recipe_id, versions, nodes, path) if sub_recipe_id is not None else None
+            if sub is None:
+                # A raw ingredient, or a sub-recipe that no longer exists
+                # and stays on the list under its own name
+                sub_lines = ((master_id, name, 1.0, uom),)
+                batches = quantity
+            else:
+                sub_lines = sub.lines
+                batches = batches_for(quantity, uom, sub.recipe_yield)
+                allergens.update(sub.allergens)
+            for sub_master_id, sub_name, sub_quantity, sub_uom in sub_lines:
+                key = (sub_master_id, sub_name, sub_uom)
+                totals[key] = totals.get(key, 0.0) + batches * sub_quantity
+        path.pop()
+        recipe = flat[recipe_id] = FlatRecipe(
+            node.version,
+            tuple((master_id, name, quantity, uom) for (master_id, name, uom), quantity in totals.items()),
+            frozenset(allergens),
+            node.recipe_yield
+        )
+        return recipe
+
+    def committed(self, changed, flattened):
+        # changed: ids whose entries are out of date, or True for all;
+        # flattened: what the transaction flattened, now safe to share.
+        # Dropping the changed ones also keeps a reused id of a deleted
+        # recipe from finding its entry.
+        with self._lock:
+            if changed is True:
+                self._flat.clear()
+            else:
+                for recipe_id in changed:
+                    self._flat.pop(recipe_id, None)
+            self._flat.update(flattened)
+
+    def invalidate(self):
+        with self._lock:
+            self._flat.clear()
+
+
+def _current(flat, recipe_id, version):
+    recipe = flat.get(recipe_id)
+    return recipe is not None and recipe.version == version
+
+
+recipe_flattener = RecipeFlattener()
+
+
+def _mark(target, recipe_id):
+    session = object_session(target)
+    if session is not None and recipe_id is not None:
+        session.info.setdefault('changed_recipe_lines', set()).add(recipe_id)
+
+
+def _line_changed(mapper, connection, target):
+    # A line moved to another recipe changes both
+    _mark(target, target.recipe_id)
+    for old_id in attributes.get_history(target, 'recipe_id').deleted:
+        _mark(target, old_id)
+
+
+def _recipe_deleted(mapper, connection, target):
+    # Recipes using a deleted one are bumped through its id
+    _mark(target, target.id)
+
+
+def _recipe_updated(mapper, connection, target):
+    # A new yield changes how much of it the recipes using it take
+    if any(attributes.get_history(target, column).has_changes() for column in YIELD_COLUMNS):
+        _mark(target, target.id)
+
+
+def _mark_flags(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_allergen_masters', set()).add(target.id)
+
+
+def _flags_changed(mapper, connection, target):
+    if attributes.get_history(target, 'allergen_mask').has_changes():
+        _mark_flags(target)
+
+
+def _master_deleted(mapper, connection, target):
+    # Lines keep the id of a deleted ingredient, and lose its flags
+    if target.allergen_mask:
+        _mark_flags(target)
+
+
+for _mapped in (Ingredient, Allergen):
+    for _name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_mapped, _name, _line_changed)
+event.listen(Recipe, 'after_delete', _recipe_deleted)
+event.listen(Recipe, 'after_update', _recipe_updated)
+event.listen(MasterIngredient, 'after_update', _flags_changed)
+event.listen(MasterIngredient, 'after_delete', _master_deleted)
+
+
+def _changed(session, recipe_ids):
+    # Recipes the transaction changed, or all of them (None), for the
+    # flattener to keep apart until the commit
+    changed = session.info.get('flattened_changes')
+    if recipe_ids is None:
+        session.info['flattened_changes'] = True
+    elif changed is not True:
+        session.info.setdefault('flattened_changes', set()).update(recipe_ids)
+
+
+def _bump(session, recipe_ids):
+    connection = session.connection()
+    for chunk in _chunks(recipe_ids):
+        connection.execute(
+            update(Recipe.__table__).where(Recipe.__table__.c.id.in_(chunk)).values(
+                version=Recipe.__table__.c.version + 1
+            )
+        )
+    # Loaded recipes would otherwise keep the old number
+    for recipe_id in recipe_ids:
+        recipe = session.identity_map.get(session.identity_key(Recipe, recipe_id))
+        if recipe is not None:
+            session.expire(recipe, ['version'])
+
+
+@event.listens_for(Session, 'after_flush')
+def _session_flushed(session, flush_context):
+    _flags_flushed(session)
+    changed = session.info.pop('changed_recipe_lines', None)
+    if not changed:
+        return
+    for origin, recipe_id in _walk(session, changed, True):
+        if origin == recipe_id:
+            node = session.get(Recipe, origin)
+            raise RecipeCycleError(f"Recipe '{node.name if node else origin}' would use itself")
+    users = ancestors(session, changed)
+    _changed(session, changed | users)
+    _bump(session, changed | users)
+    update_allergen_masks(session, changed | users)
+    # Snapshots of the recipes using a changed one are stale too
+    session.info.setdefault('stale_recipes', set()).update(users)
+
+
+def _flags_flushed(session):
+    # Flags are not part of the flattened lines, so versions stay put; the
+    # masks and snapshots of the linked recipes, and their users, move on
+    masters = session.info.pop('changed_allergen_masters', None)
+    if not masters:
+        return
+    linked = recipes_using(session, masters)
+    if not linked:
+        return
+    linked |= ancestors(session, linked)
+    update_allergen_masks(session, linked)
+    session.info.setdefault('stale_recipes', set()).update(linked)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Ingredient, Allergen):
+        orm_execute_state.session.info['recipe_versions_stale'] = True
+        _changed(orm_execute_state.session, None)
+    elif mapper is not None and mapper.class_ is MasterIngredient:
+        orm_execute_state.session.info['allergen_masks_stale'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _session_committing(session):
+    # Bulk statements change lines the listeners never see: bump everything
+    session.flush()
+    masks_stale = session.info.pop('allergen_masks_stale', False)
+    if session.info.pop('recipe_versions_stale', False):
+        session.connection().execute(
+            update(Recipe.__table__).values(version=Recipe.__table__.c.version + 1)
+        )
+        masks_stale = True
+    if masks_stale:
+        update_allergen_masks(session, [recipe_id for (recipe_id,) in session.query(Recipe.id)])
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changed = session.info.pop('flattened_changes', None)
+    flattened = session.info.pop('flattened_recipes', {})
+    if changed is not None:
+        recipe_flattener.committed(changed, flattened)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    for key in ('changed_recipe_lines', 'recipe_versions_stale', 'changed_allergen_masters',
+                'allergen_masks_stale', 'flattened_changes', 'flattened_recipes'):
+        session.info.pop(key, None)
@@ -0,0 +1,107 @@
+from threading import RLock
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, attributes, object_session
+
+from models.models import Ingredient
+
+
+class IngredientUsageStats:
+    # "Times Used" per master ingredient, loaded with one grouped aggregate and
+    # then kept current from the flushes of every session. Deltas are held on
+    # the session until it commits so a rollback never leaks into the counts.
+
+    def __init__(self):
+        self._counts = None
+        self._lock = RLock()
+
+    def counts(self, session):
+        with self._lock:
+            if self._counts is None:
+                rows = session.query(
+                    Ingredient.master_ingredient_id,
+                    func.count(Ingredient.id)
+                ).filter(
+                    Ingredient.master_ingredient_id.isnot(None)
+                ).group_by(Ingredient.master_ingredient_id).all()
+                self._counts = {master_id: count for master_id, count in rows}
+            return self._counts
+
+    def count_for(self, session, master_ingredient_id):
+        return self.counts(session).get(master_ingredient_id, 0)
+
+    def invalidate(self):
+        with self._lock:
+            self._counts = None
+
+    def apply(self, deltas):
+        with self._lock:
+            if self._counts is None:
+                return
+            for master_id, delta in deltas.items():
+                count = self._counts.get(master_id, 0) + delta
+                if count > 0:
+                    self._counts[master_id] = count
+                else:
+                    self._counts.pop(master_id, None)
+
+
+usage_stats = IngredientUsageStats()
+
+
+def _record(target, master_id, delta):
+    if master_id is None:
+        return
+    session = object_session(target)
+    if session is None:
+        usage_stats.invalidate()
+        return
+    deltas = session.info.setdefault('usage_deltas', {})
+    deltas[master_id] = deltas.get(master_id, 0) + delta
+
+
+@event.listens_for(Ingredient, 'after_insert')
+def _ingredient_inserted(mapper, connection, target):
+    _record(target, target.master_ingredient_id, 1)
+
+
+@event.listens_for(Ingredient, 'after_delete')
+def _ingredient_deleted(mapper, connection, target):
+    _record(target, target.master_ingredient_id, -1)
+
+
+@event.listens_for(Ingredient, 'after_update')
+def _ingredient_updated(mapper, connection, target):
+    history = attributes.get_history(target, 'master_ingredient_id')
+    if not history.has_changes():
+        return
+    for old_id in history.deleted:
+        _record(target, old_id, -1)
+    for new_id in history.added:
+        _record(target, new_id, 1)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    # query.update()/delete() bypass the mapper events (merging ingredients
+    # uses one), so fall back to reloading the aggregate after commit.
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is Ingredient:
+        orm_execute_state.session.info['usage_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    deltas = session.info.pop('usage_deltas', None)
+    if session.info.pop('usage_stale', False):
+        usage_stats.invalidate()
+    elif deltas:
+        usage_stats.apply(deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('usage_deltas', None)
+    session.info.pop('usage_stale', None)
@@ -0,0 +1,81 @@
+# procurement_report.py
+import argparse
+import csv
+import datetime
+import sys
+import time
+
+from controllers.procurement import procurement_report
+from models.database import Database
+
+# Totals to order for every non-cancelled event in a date range, e.g.
+#   python procurement_report.py 2026-10-19 2026-10-25 --csv week43.csv
+# The CSV has one row per line of the range total and, with --breakdown, per
+# day and per event:
+#   scope,day,event_id,event,ingredient,quantity,uom,master_ingredient_id
+CSV_COLUMNS = ["scope", "day", "event_id", "event", "ingredient", "quantity", "uom", "master_ingredient_id"]
+
+
+def parse_date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{text}' (expected YYYY-MM-DD)")
+
+
+def csv_rows(report):
+    events = {event.id: event for event in report.events}
+    for line in report.totals:
+        yield ["total", "", "", "", line.name, round(line.quantity, 4), line.uom, line.master_ingredient_id]
+    for day, lines in report.by_day.items():
+        for line in lines:
+            yield ["day", day.isoformat(), "", "", line.name, round(line.quantity, 4), line.uom,
+                   line.master_ingredient_id]
+    for event in report.events:
+        for line in report.by_event.get(event.id, []):
+            yield ["event", event.date.isoformat(), event.id, events[event.id].name, line.name,
+                   round(line.quantity, 4), line.uom, line.master_ingredient_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Total the ingredients to order for events in a date range")
+    parser.add_argument("start", type=parse_date, help="first event date, YYYY-MM-DD")
+    parser.add_argument("end", type=parse_date, help="last event date, YYYY-MM-DD")
+    parser.add_argument("--db", help="path to the SQLite database (defaults to the configured one)")
+    parser.add_argument("--csv", help="write the report to this CSV file instead of printing it")
+    parser.add_argument("--breakdown", action="store_true", help="include per-day and per-event totals")
+    args = parser.parse_args()
+    if args.end < args.start:
+        parser.error("end date is before start date")
+
+    database = Database(args.db)
+    session = database.new_session()
+    started = time.perf_counter()
+    try:
+        report = procurement_report(session, args.start, args.end,
+                                    by_day=args.breakdown, by_event=args.breakdown)
+    finally:
+        session.close()
+        database.dispose()
+    elapsed = time.perf_counter() - started
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(["" if value is None else value for value in row] for row in csv_rows(report))
+    else:
+        for line in report.totals:
+            print(f"{line.name:<40} {line.quantity:>12.2f} {line.uom}")
+        if args.breakdown:
+            for day, lines in report.by_day.items():
+                print(f"\n{day:%A, %B} {day.day}, {day.year}")
+                for line in lines:
+                    print(f"  {line.name:<38} {line.quantity:>12.2f} {line.uom}")
+    print(f"{len(report.events)} events, {len(report.totals)} ingredients, "
+          f"{args.start} to {args.end} in {elapsed:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import controllers.recipe_snapshots  # noqa: E402,F401 -- registers the snapshot listeners
+import models.costing  # noqa: E402,F401 -- registers the cost rollup listeners
+from controllers.recipe_snapshots import recipe_snapshots  # noqa: E402
+from models.ingredient_catalog import ingredient_catalog  # noqa: E402
+from models.migrations import run_migrations  # noqa: E402
+from models.models import Base  # noqa: E402
+from models.recipe_graph import recipe_flattener  # noqa: E402
+
+
+@pytest.fixture
+def session():
+    # A migrated in-memory database; the caches are process-wide and ids
+    # start over in every database, so they are emptied around each test
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    recipe_flattener.invalidate()
+    recipe_snapshots.invalidate()
+    ingredient_catalog.invalidate()
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+    recipe_flattener.invalidate()
+    recipe_snapshots.invalidate()
+    ingredient_catalog.invalidate()
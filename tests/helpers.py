@@ -0,0 +1,17 @@
+from models.models import Ingredient, MasterIngredient, Recipe
+
+
+def add_recipe(session, name, lines=(), **columns):
+    # lines: (name, quantity, uom) for a raw ingredient, linked to the
+    # master ingredient of that name if there is one, or a Recipe for a
+    # sub-recipe line
+    recipe = Recipe(name=name, **columns)
+    for line, quantity, uom in lines:
+        if isinstance(line, Recipe):
+            recipe.ingredients.append(Ingredient(ingredient=line.name, quantity=quantity, uom=uom, sub_recipe=line))
+        else:
+            master = session.query(MasterIngredient).filter_by(name=line).first()
+            recipe.ingredients.append(Ingredient(ingredient=line, quantity=quantity, uom=uom, master_ingredient=master))
+    session.add(recipe)
+    session.commit()
+    return recipe
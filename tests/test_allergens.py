@@ -0,0 +1,65 @@
+import pytest
+
+from helpers import add_recipe
+from models.allergens import allergen_free, allergen_mask, allergen_names, recipes_free_of
+from models.models import Allergen, Recipe
+
+
+def names_free_of(session, allergens, *criteria):
+    return [name for _, name, _, _ in recipes_free_of(session, allergens, *criteria)]
+
+
+@pytest.fixture
+def menu(session):
+    # Pesto (tree nuts, dairy) is used by the pasta, which is used by the
+    # platter; the salad has no allergens
+    pesto = add_recipe(session, "Pesto", [("Basil", 1, "cup")])
+    pesto.allergens.extend([Allergen(allergen="Tree Nuts"), Allergen(allergen="dairy")])
+    session.commit()
+    pasta = add_recipe(session, "Pasta", [(pesto, 1, "batch"), ("Penne", 1, "lb")], category="Entrees")
+    pasta.allergens.append(Allergen(allergen="Wheat"))
+    session.commit()
+    platter = add_recipe(session, "Platter", [(pasta, 2, "batch")], category="Buffet")
+    salad = add_recipe(session, "Salad", [("Lettuce", 1, "ea")], category="Buffet")
+    return pesto, pasta, platter, salad
+
+
+def test_masks_cover_sub_recipes(session, menu):
+    pesto, pasta, platter, salad = menu
+    assert allergen_names(pesto.allergen_mask) == ["Dairy", "Tree Nuts"]
+    assert allergen_names(pasta.allergen_mask) == ["Dairy", "Tree Nuts", "Wheat"]
+    assert platter.allergen_mask == pasta.allergen_mask
+    assert salad.allergen_mask == 0
+
+    # Dropping an allergen reaches every recipe above it
+    pesto.allergens = [allergen for allergen in pesto.allergens if allergen.allergen != "dairy"]
+    session.commit()
+    assert allergen_names(platter.allergen_mask) == ["Tree Nuts", "Wheat"]
+
+    session.delete(pesto)
+    session.commit()
+    assert allergen_names(platter.allergen_mask) == ["Wheat"]
+
+
+def test_allergen_free(session, menu):
+    assert names_free_of(session, ["Tree Nuts"]) == ["Salad"]
+    assert names_free_of(session, ["Wheat"]) == ["Pesto", "Salad"]
+    assert names_free_of(session, []) == ["Pasta", "Pesto", "Platter", "Salad"]
+    assert names_free_of(session, ["Fish"], Recipe.category == "Buffet") == ["Platter", "Salad"]
+    with pytest.raises(ValueError, match="Unknown allergens"):
+        allergen_free(["Gluten"])
+
+
+def test_allergen_free_seeks_the_mask_index(session, menu):
+    plan = session.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + str(
+            session.query(Recipe.id).filter(allergen_free(["Peanuts"])).statement.compile(
+                compile_kwargs={"literal_binds": True}
+            )
+        )
+    ).fetchall()
+    assert "ix_recipes_allergen_mask" in " ".join(row[-1] for row in plan)
+
+
+def test_mask_names_round_trip():
+    assert allergen_names(allergen_mask(["wheat ", "EGGS", "Gluten"])) == ["Eggs", "Wheat"]
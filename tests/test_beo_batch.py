@@ -0,0 +1,42 @@
+import json
+import os
+
+import pytest
+
+from beo_batch import output_paths, read_json, resolve
+
+
+def test_entries_that_are_not_events_fail_alone(tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps([
+        "Smith Wedding",
+        42,
+        {"name": "Gala", "date": "2026-10-24", "guest_count": 80, "items": [{"recipe_id": 1, "quantity": 80}]},
+    ]))
+    specs = read_json(str(path))
+    assert [spec.name for spec in specs] == ["Event 1", "Event 2", "Gala"]
+    for spec in specs[:2]:
+        with pytest.raises(ValueError, match="Not an event object"):
+            resolve(spec, {})
+    event, selections = resolve(specs[2], {})
+    assert event.name == "Gala" and selections == [(1, 80)]
+
+
+def test_event_names_stay_inside_the_output_directory(tmp_path):
+    specs = read_json_specs(tmp_path, ["A/B", "../../etc/passwd", "C:\\Temp\\x", "..", "A B"])
+    out_dir = str(tmp_path / "out")
+    for fmt in ("pdf", "csv"):
+        paths = output_paths(specs, out_dir, fmt)
+        assert len(set(paths)) == len(paths)
+        for path in paths:
+            assert os.path.dirname(path) == out_dir
+            assert ".." not in os.path.basename(path)
+    # "A/B" and "A B" come out alike, and are numbered apart
+    names = [os.path.basename(path) for path in output_paths(specs, out_dir)]
+    assert names[0] == "BEO_Report_A_B.pdf" and names[-1] == "BEO_Report_A_B_2.pdf"
+
+
+def read_json_specs(tmp_path, names):
+    path = tmp_path / "names.json"
+    path.write_text(json.dumps({"events": [{"name": name} for name in names]}))
+    return read_json(str(path))
@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+import pytest
+
+from helpers import add_recipe
+from models.costing import refresh_due_costs, set_unit_cost
+from models.models import Event, EventItem, MasterIngredient, RecipeCost
+
+
+def recipe_cost(session, recipe):
+    row = session.get(RecipeCost, recipe.id)
+    session.refresh(row)
+    return row.cost, row.unpriced_lines
+
+
+@pytest.fixture
+def priced(session):
+    # Butter at $4/lb, flour unpriced; a dough using both and a pastry
+    # using two batches of the dough
+    butter = MasterIngredient(name="Butter")
+    flour = MasterIngredient(name="Flour")
+    session.add_all([butter, flour])
+    session.commit()
+    set_unit_cost(session, butter.id, 4.0, "lb", date.today() - timedelta(days=1))
+    session.commit()
+    dough = add_recipe(session, "Dough", [("Butter", 8, "oz"), ("Flour", 2, "lb")])
+    pastry = add_recipe(session, "Pastry", [(dough, 2, "batch")])
+    return butter, dough, pastry
+
+
+def test_recipe_costs_follow_prices_and_lines(session, priced):
+    butter, dough, pastry = priced
+    assert recipe_cost(session, dough) == (pytest.approx(2.0), 1)
+    assert recipe_cost(session, pastry) == (pytest.approx(4.0), 1)
+
+    # A new price reaches the recipe and the recipe using it as a sub-recipe
+    set_unit_cost(session, butter.id, 6.0, "lb")
+    session.commit()
+    assert recipe_cost(session, dough) == (pytest.approx(3.0), 1)
+    assert recipe_cost(session, pastry) == (pytest.approx(6.0), 1)
+
+    dough.ingredients[0].quantity = 16
+    session.commit()
+    assert recipe_cost(session, pastry) == (pytest.approx(12.0), 1)
+
+
+def test_future_prices_apply_once_due(session, priced):
+    butter, dough, pastry = priced
+    set_unit_cost(session, butter.id, 8.0, "lb", date.today() + timedelta(days=7))
+    session.commit()
+    assert recipe_cost(session, dough) == (pytest.approx(2.0), 1)
+
+    # Due for the recipe using the ingredient; the pastry follows it
+    assert refresh_due_costs(session, date.today() + timedelta(days=7)) == {dough.id}
+    session.commit()
+    assert recipe_cost(session, dough) == (pytest.approx(4.0), 1)
+    assert recipe_cost(session, pastry) == (pytest.approx(8.0), 1)
+
+
+def test_open_event_costs_follow_prices(session, priced):
+    butter, dough, _ = priced
+    event = Event(name="Gala", event_date=date.today() + timedelta(days=3), guest_count=50)
+    event.items.append(EventItem(recipe_id=dough.id, quantity=3, position=0))
+    session.add(event)
+    session.commit()
+    session.refresh(event)
+    assert (event.cost, event.unpriced_items) == (pytest.approx(6.0), 1)
+
+    set_unit_cost(session, butter.id, 6.0, "lb")
+    session.commit()
+    session.refresh(event)
+    assert event.cost == pytest.approx(9.0)
@@ -0,0 +1,86 @@
+import pytest
+
+import models.recipe_graph
+from controllers.recipe_snapshots import recipe_snapshots
+from helpers import add_recipe
+from models.allergens import ALLERGEN_BITS, allergen_names, update_allergen_masks
+from models.models import Allergen, MasterIngredient
+
+
+@pytest.fixture
+def kitchen(session):
+    # Butter is linked from the roux, which the gratin uses; the salad has
+    # only a hand-ticked allergen and no flagged ingredient
+    butter = MasterIngredient(name="Butter")
+    session.add_all([butter, MasterIngredient(name="Lettuce")])
+    session.commit()
+    roux = add_recipe(session, "Roux", [("Butter", 100, "g"), ("Flour", 100, "g")])
+    gratin = add_recipe(session, "Gratin", [(roux, 1, "batch"), ("Potato", 2, "kg")])
+    salad = add_recipe(session, "Salad", [("Lettuce", 1, "ea")])
+    salad.allergens.append(Allergen(allergen="Eggs"))
+    session.commit()
+    return butter, roux, gratin, salad
+
+
+def test_flag_changes_recompute_only_linked_recipes(session, kitchen, monkeypatch):
+    butter, roux, gratin, salad = kitchen
+    recomputed = []
+
+    def spy(session, recipe_ids):
+        recomputed.append(set(recipe_ids))
+        return update_allergen_masks(session, recipe_ids)
+
+    monkeypatch.setattr(models.recipe_graph, "update_allergen_masks", spy)
+    versions = (roux.version, gratin.version)
+    recipe_snapshots.get(session, [roux.id])
+
+    butter.allergen_mask = ALLERGEN_BITS["dairy"]
+    session.commit()
+    assert recomputed == [{roux.id, gratin.id}]
+    assert allergen_names(roux.allergen_mask) == ["Dairy"]
+    assert allergen_names(gratin.allergen_mask) == ["Dairy"]
+    assert allergen_names(salad.allergen_mask) == ["Eggs"]
+    # Lines are unchanged, so versions stay; the snapshot is dropped
+    assert (roux.version, gratin.version) == versions
+    assert recipe_snapshots.get(session, [roux.id])[roux.id].allergen_mask == ALLERGEN_BITS["dairy"]
+
+    # Edits that leave the flags alone recompute nothing
+    recomputed.clear()
+    butter.category = "Dairy"
+    session.commit()
+    assert recomputed == []
+
+
+def test_deleting_a_flagged_ingredient_drops_its_allergens(session, kitchen):
+    butter, roux, gratin, _ = kitchen
+    butter.allergen_mask = ALLERGEN_BITS["dairy"]
+    roux.allergens.append(Allergen(allergen="Wheat"))
+    session.commit()
+    assert allergen_names(gratin.allergen_mask) == ["Dairy", "Wheat"]
+
+    session.delete(butter)
+    session.commit()
+    # The hand-ticked allergen stays
+    assert allergen_names(roux.allergen_mask) == ["Wheat"]
+    assert allergen_names(gratin.allergen_mask) == ["Wheat"]
+
+
+def test_linking_a_line_picks_up_the_flags(session, kitchen):
+    butter, _, _, salad = kitchen
+    butter.allergen_mask = ALLERGEN_BITS["dairy"]
+    session.commit()
+    salad.ingredients[0].master_ingredient = butter
+    session.commit()
+    assert allergen_names(salad.allergen_mask) == ["Dairy", "Eggs"]
+
+
+def test_rolled_back_flags_leave_masks_alone(session, kitchen):
+    butter, roux, _, _ = kitchen
+    butter.allergen_mask = ALLERGEN_BITS["fish"]
+    session.flush()
+    session.rollback()
+    assert roux.allergen_mask == 0
+
+    butter.name = "Cultured Butter"
+    session.commit()
+    assert roux.allergen_mask == 0
@@ -0,0 +1,43 @@
+from models.ingredient_catalog import ingredient_catalog
+from models.models import MasterIngredient
+
+
+def test_commits_update_the_loaded_catalog_in_place(session):
+    butter = MasterIngredient(name="Butter", preferred_uom="lb")
+    flour = MasterIngredient(name="Flour")
+    session.add_all([butter, flour])
+    session.commit()
+    ingredient_catalog.invalidate()
+    ingredient_catalog.load(session)
+    index = ingredient_catalog._index
+
+    # Not part of the catalog: nothing changes
+    butter.category = "Dairy"
+    butter.allergen_mask = 1
+    session.commit()
+    assert ingredient_catalog._index is index
+
+    butter.name = "Unsalted Butter"
+    butter.preferred_uom = "oz"
+    session.add(MasterIngredient(name="Sugar"))
+    session.delete(flour)
+    session.commit()
+    assert ingredient_catalog._index is index
+    assert ingredient_catalog.lookup("butter") is None
+    assert ingredient_catalog.lookup("unsalted butter") == (butter.id, "Unsalted Butter", "oz")
+    assert ingredient_catalog.complete("butt") == ["Unsalted Butter"]
+    assert ingredient_catalog.complete("sug") == ["Sugar"]
+    assert ingredient_catalog.search("flour") == []
+
+
+def test_rolled_back_changes_are_not_applied(session):
+    session.add(MasterIngredient(name="Butter"))
+    session.commit()
+    ingredient_catalog.invalidate()
+    ingredient_catalog.load(session)
+
+    session.add(MasterIngredient(name="Sugar"))
+    session.flush()
+    session.rollback()
+    assert ingredient_catalog.lookup("sugar") is None
+    assert ingredient_catalog.loaded
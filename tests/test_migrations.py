@@ -0,0 +1,59 @@
+import os
+import shutil
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from models.migrations import MIGRATIONS, column_names, current_version, run_migrations, table_names
+from models.models import Base
+
+SHIPPED_DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "banquet_planning.db")
+
+# The schema before any migration, as the first release created it
+BASELINE_SCHEMA = [
+    "CREATE TABLE recipes (id INTEGER NOT NULL, name VARCHAR NOT NULL, menu_description VARCHAR, "
+    "PRIMARY KEY (id))",
+    "CREATE TABLE master_ingredients (id INTEGER NOT NULL, name VARCHAR NOT NULL, category VARCHAR, "
+    "preferred_uom VARCHAR, last_used VARCHAR, PRIMARY KEY (id), UNIQUE (name))",
+    "CREATE TABLE ingredients (id INTEGER NOT NULL, recipe_id INTEGER, ingredient VARCHAR NOT NULL, "
+    "quantity FLOAT NOT NULL, uom VARCHAR NOT NULL, master_ingredient_id INTEGER "
+    "REFERENCES master_ingredients(id), PRIMARY KEY (id), FOREIGN KEY(recipe_id) REFERENCES recipes (id))",
+    "CREATE TABLE allergens (id INTEGER NOT NULL, recipe_id INTEGER, allergen VARCHAR NOT NULL, "
+    "PRIMARY KEY (id), FOREIGN KEY(recipe_id) REFERENCES recipes (id))",
+]
+
+
+def assert_current_schema(engine):
+    with engine.connect() as connection:
+        assert current_version(connection) == MIGRATIONS[-1][0]
+        assert set(Base.metadata.tables) <= table_names(connection)
+        for name, table in Base.metadata.tables.items():
+            assert {column.name for column in table.columns} <= column_names(connection, name), name
+
+
+def test_migrations_upgrade_the_baseline_schema_without_create_all():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO recipes (id, name) VALUES (1, 'Soup')")
+        connection.exec_driver_sql("INSERT INTO allergens (recipe_id, allergen) VALUES (1, 'Dairy')")
+    reports = []
+    assert run_migrations(engine, reports.append) == [version for version, _, _ in MIGRATIONS]
+    assert_current_schema(engine)
+    assert any("events by date" in line for line in reports)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT allergen_mask FROM recipes").scalar() == 1
+    # Nothing left to do on a second run
+    assert run_migrations(engine) == []
+
+
+@pytest.mark.skipif(not os.path.exists(SHIPPED_DATABASE), reason="no shipped database")
+def test_migrations_upgrade_the_shipped_database(tmp_path):
+    path = tmp_path / "banquet_planning.db"
+    shutil.copy(SHIPPED_DATABASE, path)
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    assert_current_schema(engine)
+    engine.dispose()
@@ -0,0 +1,54 @@
+import pytest
+
+from helpers import add_recipe
+from models.models import Ingredient
+from models.recipe_graph import RecipeCycleError, recipe_flattener
+
+
+def line_names(session, recipe):
+    return [name for _, name, _, _ in recipe_flattener.get(session, [recipe.id])[recipe.id].lines]
+
+
+def test_rolled_back_lines_are_not_cached(session):
+    recipe = add_recipe(session, "Danish", [("Dough", 1.0, "ea")])
+    assert line_names(session, recipe) == ["Dough"]
+
+    # Flattened inside the transaction, under the version the rollback frees
+    recipe.ingredients[0].ingredient = "WRONG"
+    session.flush()
+    assert line_names(session, recipe) == ["WRONG"]
+    session.rollback()
+
+    recipe.ingredients[0].ingredient = "RIGHT"
+    session.commit()
+    assert line_names(session, recipe) == ["RIGHT"]
+
+
+def test_changes_bump_the_recipe_and_its_users(session):
+    sauce = add_recipe(session, "Sauce", [("Tomato", 2, "lb")])
+    pasta = add_recipe(session, "Pasta", [(sauce, 1, "batch"), ("Penne", 1, "lb")])
+    salad = add_recipe(session, "Salad", [("Lettuce", 1, "ea")])
+    versions = {recipe.id: recipe.version for recipe in (sauce, pasta, salad)}
+
+    sauce.ingredients[0].quantity = 3
+    session.commit()
+    assert sauce.version == versions[sauce.id] + 1
+    assert pasta.version == versions[pasta.id] + 1
+    assert salad.version == versions[salad.id]
+    lines = recipe_flattener.get(session, [pasta.id])[pasta.id].lines
+    assert sorted((name, quantity) for _, name, quantity, _ in lines) == [("Penne", 1.0), ("Tomato", 3.0)]
+
+
+def test_a_cycle_is_refused_and_rolled_back(session):
+    sauce = add_recipe(session, "Sauce", [("Tomato", 2, "lb")])
+    pasta = add_recipe(session, "Pasta", [(sauce, 1, "batch")])
+    version = sauce.version
+
+    sauce.ingredients.append(Ingredient(ingredient="Pasta", quantity=1, uom="batch", sub_recipe=pasta))
+    with pytest.raises(RecipeCycleError):
+        session.commit()
+    session.rollback()
+
+    assert sauce.version == version
+    assert [line.ingredient for line in sauce.ingredients] == ["Tomato"]
+    assert [name for _, name, _, _ in recipe_flattener.get(session, [pasta.id])[pasta.id].lines] == ["Tomato"]
@@ -0,0 +1,59 @@
+from datetime import date
+
+import pytest
+
+from controllers.beo_engine import Event as BEOEvent, build_beo
+from controllers.procurement import procurement_report
+from helpers import add_recipe
+from models.models import Event, EventItem, MasterIngredient
+from utils.scaling import RecipeYield, batches_for, menu_batches, portions_per_batch
+
+DAY = date(2026, 10, 24)
+
+
+def test_portions_and_batches():
+    stew = RecipeYield(3, "kg", 150, "g", 0.5)
+    assert portions_per_batch(stew) == pytest.approx(20)
+    assert menu_batches(25, portions_per_batch(stew), stew.increment) == pytest.approx(1.5)
+    # Quantities a hair over a whole number of increments are not rounded up
+    assert menu_batches(20.000000000001, 20, 1) == 1
+    # No usable yield: menu quantities are batches
+    assert menu_batches(3, portions_per_batch(RecipeYield(None, None, None, None, 1)), 1) == 3
+    assert batches_for(2, "qt", RecipeYield(4, "l", None, None, None)) == pytest.approx(0.4731765, rel=1e-6)
+
+
+@pytest.fixture
+def event_menu(session):
+    session.add_all([MasterIngredient(name=name) for name in ("Butter", "Flour", "Beef")])
+    session.commit()
+    sauce = add_recipe(session, "Sauce", [("Butter", 500, "g")], yield_quantity=4, yield_uom="l")
+    tart = add_recipe(session, "Tart", [("Flour", 2, "lb"), (sauce, 1, "qt"), ("Salt", 5, "g")],
+                      yield_quantity=24, yield_uom="portion", batch_increment=1)
+    stew = add_recipe(session, "Stew", [("Beef", 2, "kg"), ("Butter", 100, "g")],
+                      yield_quantity=3, yield_uom="kg", portion_size=150, portion_uom="g", batch_increment=0.5)
+    selections = [(tart.id, 30), (stew.id, 25)]
+    event = Event(name="Gala", event_date=DAY, guest_count=55)
+    for position, (recipe_id, quantity) in enumerate(selections):
+        event.items.append(EventItem(recipe_id=recipe_id, quantity=quantity, position=position))
+    session.add(event)
+    session.commit()
+    return selections
+
+
+def test_beo_scales_by_yield_and_rounds_batches(session, event_menu):
+    result = build_beo(session, BEOEvent("Gala", DAY, 55, ""), event_menu)
+    batches = {item.name: item.batches for items in result.menu.values() for item in items}
+    # 30 of 24 portions rounds up to 2 batches; 25 of 20 to 1.5
+    assert batches == {"Tart": pytest.approx(2), "Stew": pytest.approx(1.5)}
+    flour = next(item for item in result.shopping_list if item.name == "Flour")
+    assert (flour.quantity, flour.uom) == (pytest.approx(4), "lbs")
+
+
+def test_procurement_totals_match_the_beo_shopping_list(session, event_menu):
+    shopping = build_beo(session, BEOEvent("Gala", DAY, 55, ""), event_menu).shopping_list
+    totals = procurement_report(session, DAY, DAY, by_day=False, by_event=False).totals
+    assert len(totals) == len(shopping) == 4
+    expected = {(item.name, item.uom): item.quantity for item in shopping}
+    assert {(line.name, line.uom): line.quantity for line in totals} == {
+        key: pytest.approx(quantity) for key, quantity in expected.items()
+    }
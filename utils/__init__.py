@@ -1 +1,6 @@
-from .unit_converter import convert_units
\ No newline at end of file
+from .unit_converter import convert_units
+from .search_index import TrigramIndex
+from .units import UnitRegistry, units
+from .shopping_list import ShoppingItem, consolidate, consolidate_base
+from .scaling import RecipeYield, batches_for, menu_batches, portions_per_batch, round_batches
+from .filenames import filename_part
@@ -0,0 +1,12 @@
+import re
+
+# Anything but letters, digits, "-", "_" and "." becomes "_", which takes
+# out path separators and the characters Windows refuses in file names
+UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def filename_part(text, default="Event"):
+    # text, e.g. an event name typed by a user, made safe to put in a file
+    # name: one path component, with no ".." and no leading dot
+    part = re.sub(r"\.{2,}", ".", UNSAFE.sub("_", text)).strip("._")
+    return part or default
@@ -0,0 +1,61 @@
+import math
+from collections import namedtuple
+
+from .units import BATCH, PORTION, units
+
+# A recipe's lines, as written, make one batch. The yield says what a batch
+# makes: a number of portions ("24 portions"), or a weight or volume ("4 kg")
+# together with the portion served ("150 g"). increment rounds the batches
+# an event needs up to whole (1), half (0.5), ... batches; None scales
+# exactly. Recipes with no usable yield keep the old meaning, where a menu
+# quantity is a number of batches.
+RecipeYield = namedtuple('RecipeYield', ['quantity', 'uom', 'portion_size', 'portion_uom', 'increment'])
+
+# Slack for quantities that come out a hair over a whole number of batches
+EPSILON = 1e-9
+
+
+def portions_per_batch(recipe_yield, registry=units):
+    # Portions one batch serves, or None when the yield can't say
+    if recipe_yield is None or not recipe_yield.quantity or not recipe_yield.uom:
+        return None
+    unit = registry.lookup(recipe_yield.uom)
+    if unit.dimension == PORTION:
+        return recipe_yield.quantity * unit.factor
+    if not recipe_yield.portion_size or not recipe_yield.portion_uom:
+        return None
+    portion = registry.lookup(recipe_yield.portion_uom)
+    if portion.dimension != unit.dimension:
+        return None
+    return recipe_yield.quantity * unit.factor / (recipe_yield.portion_size * portion.factor)
+
+
+def round_batches(batches, increment):
+    if not increment:
+        return batches
+    return math.ceil(batches / increment - EPSILON) * increment
+
+
+def menu_batches(quantity, per_batch, increment):
+    # Batches made for a menu quantity: portions when per_batch (from
+    # portions_per_batch) is known, batches already otherwise; rounded up
+    return round_batches(quantity / per_batch if per_batch else quantity, increment)
+
+
+def batches_for(quantity, uom, recipe_yield, registry=units):
+    # Batches of a recipe that an amount of it, in any unit, stands for: a
+    # sub-recipe line such as "2 qt" of a sauce yielding 4 l. Quantities in
+    # batches, or in units the yield can't be converted from, count as
+    # batches.
+    unit = registry.lookup(uom)
+    if unit.dimension == BATCH:
+        return quantity * unit.factor
+    if recipe_yield is None or not recipe_yield.quantity or not recipe_yield.uom:
+        return quantity
+    if unit.dimension == PORTION:
+        per_batch = portions_per_batch(recipe_yield, registry)
+        return quantity * unit.factor / per_batch if per_batch else quantity
+    yield_unit = registry.lookup(recipe_yield.uom)
+    if unit.dimension != yield_unit.dimension:
+        return quantity
+    return quantity * unit.factor / (recipe_yield.quantity * yield_unit.factor)
@@ -0,0 +1,166 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from heapq import nsmallest
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def trigrams(word):
+    # Padded so the start of a word weighs more, as pg_trgm does
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    # In-memory name search. Exact, prefix and substring matches come from the
+    # sorted names; typo-tolerant matches compare each query word against the
+    # (much smaller) vocabulary of words by trigram similarity, then rank the
+    # names containing the similar words. Keys are opaque (ingredient ids);
+    # add/remove keep the index current.
+
+    # Minimum trigram similarity for a word to count as a misspelling
+    MIN_SIMILARITY = 0.4
+    # How far below the closest word other candidate words may be
+    SIMILARITY_SPREAD = 0.05
+
+    def __init__(self, entries=()):
+        self.texts = {}
+        self.lengths = {}
+        self.sorted_texts = []
+        # Word -> keys of the names containing it
+        self.word_keys = defaultdict(set)
+        # Trigram -> vocabulary words containing it
+        self.gram_words = defaultdict(set)
+        # All names joined in sorted order, so substring search is a C-level
+        # str.find; rebuilt lazily after edits
+        self.blob = None
+        self.offsets = []
+        for key, text in entries:
+            self._add(key, text)
+        self.sorted_texts.sort()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __contains__(self, key):
+        return key in self.texts
+
+    def _add(self, key, text):
+        normalized = normalize(text)
+        self.texts[key] = normalized
+        self.lengths[key] = len(normalized)
+        for word in set(normalized.split()):
+            if word not in self.word_keys:
+                for gram in trigrams(word):
+                    self.gram_words[gram].add(word)
+            self.word_keys[word].add(key)
+        self.sorted_texts.append((normalized, key))
+        self.blob = None
+
+    def add(self, key, text):
+        if key in self.texts:
+            self.remove(key)
+        self._add(key, text)
+        # Keep the list sorted without a full re-sort
+        entry = self.sorted_texts.pop()
+        self.sorted_texts.insert(bisect_left(self.sorted_texts, entry), entry)
+
+    def remove(self, key):
+        normalized = self.texts.pop(key, None)
+        if normalized is None:
+            return
+        del self.lengths[key]
+        for word in set(normalized.split()):
+            keys = self.word_keys[word]
+            keys.discard(key)
+            if not keys:
+                del self.word_keys[word]
+                for gram in trigrams(word):
+                    words = self.gram_words[gram]
+                    words.discard(word)
+                    if not words:
+                        del self.gram_words[gram]
+        position = bisect_left(self.sorted_texts, (normalized, key))
+        if position < len(self.sorted_texts) and self.sorted_texts[position] == (normalized, key):
+            del self.sorted_texts[position]
+        self.blob = None
+
+    def prefix_matches(self, prefix, limit):
+        matches = []
+        position = bisect_left(self.sorted_texts, (prefix,))
+        while position < len(self.sorted_texts) and len(matches) < limit:
+            text, key = self.sorted_texts[position]
+            if not text.startswith(prefix):
+                break
+            matches.append(key)
+            position += 1
+        return matches
+
+    def substring_matches(self, query, limit, skip):
+        if self.blob is None:
+            self.offsets = []
+            offset = 0
+            for text, _ in self.sorted_texts:
+                self.offsets.append(offset)
+                offset += len(text) + 1
+            self.blob = "\n".join(text for text, _ in self.sorted_texts)
+        matches = []
+        position = self.blob.find(query)
+        while position >= 0 and len(matches) < limit:
+            entry = bisect_right(self.offsets, position) - 1
+            text, key = self.sorted_texts[entry]
+            if key not in skip:
+                matches.append(key)
+            # Continue after the end of this name
+            position = self.blob.find(query, self.offsets[entry] + len(text))
+        return matches
+
+    def similar_words(self, word):
+        # Vocabulary words within reach of the best match for a misspelt word
+        grams = trigrams(word)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self.gram_words.get(gram, ()):
+                shared[candidate] += 1
+        similarity = {
+            candidate: 2.0 * count / (len(grams) + len(candidate) + 2)
+            for candidate, count in shared.items()
+        }
+        if not similarity:
+            return []
+        cutoff = max(self.MIN_SIMILARITY, max(similarity.values()) - self.SIMILARITY_SPREAD)
+        return [candidate for candidate, value in similarity.items() if value >= cutoff]
+
+    def fuzzy_matches(self, query, limit, skip):
+        # Names containing a close match for every query word that has one,
+        # shortest first; all set work, so common words stay cheap
+        matched = []
+        for word in query.split():
+            similar = self.similar_words(word)
+            if similar:
+                matched.append(set().union(*(self.word_keys[candidate] for candidate in similar)))
+        if not matched:
+            return []
+        candidates = set.intersection(*matched) - skip
+        return nsmallest(limit, candidates, key=self.lengths.__getitem__)
+
+    def search(self, query, limit=50):
+        # Ranked keys: exact match, then prefix matches, then substring
+        # matches (shortest names first within each), then misspellings.
+        # Later tiers are only searched while results are short.
+        query = normalize(query)
+        if not query:
+            return []
+        matches = self.prefix_matches(query, limit)
+        if len(matches) < limit:
+            matches += self.substring_matches(query, limit - len(matches), set(matches))
+        matches.sort(key=lambda key: (
+            self.texts[key] != query,
+            not self.texts[key].startswith(query),
+            self.lengths[key]
+        ))
+        if len(matches) < limit:
+            matches += self.fuzzy_matches(query, limit - len(matches), set(matches))
+        return matches
@@ -0,0 +1,40 @@
+from collections import namedtuple
+
+from .units import units
+
+ShoppingItem = namedtuple('ShoppingItem', ['name', 'quantity', 'uom', 'master_ingredient_id'])
+
+
+def consolidate(lines, registry=units):
+    # lines: [(master_ingredient_id, name, quantity, uom), ...] already scaled
+    # to the event. Lines are summed in base units per master ingredient (per
+    # name for unlinked lines) and dimension, so 3 gallons and 12 cups make
+    # 3.75 gallons, while 2 lb and 3 each of one ingredient stay separate.
+    # Only the totals are turned back into readable units.
+    converted = registry.to_base_batch([(quantity, uom) for _, _, quantity, uom in lines])
+    return consolidate_base(
+        [(master_id, name, base_quantity, unit)
+         for (master_id, name, _, _), (base_quantity, unit) in zip(lines, converted)],
+        registry
+    )
+
+
+def consolidate_base(lines, registry=units):
+    # As consolidate, for lines already in base units:
+    # [(master_ingredient_id, name, base quantity, Unit), ...]
+    totals = {}
+    for master_id, name, base_quantity, unit in lines:
+        key = (master_id if master_id is not None else name.strip().lower(), unit.dimension)
+        total = totals.get(key)
+        if total is None:
+            # The first line names the item and picks US or metric display
+            totals[key] = [name.strip(), base_quantity, unit, master_id]
+        else:
+            total[1] += base_quantity
+
+    items = []
+    for name, base_quantity, unit, master_id in totals.values():
+        quantity, uom = registry.display(base_quantity, unit)
+        items.append(ShoppingItem(name, quantity, uom, master_id))
+    items.sort(key=lambda item: (item.name.lower(), item.uom))
+    return items
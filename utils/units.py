@@ -0,0 +1,129 @@
+from collections import namedtuple
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+PORTION = 'portion'
+BATCH = 'batch'
+
+# Base unit of each dimension; factors below are exact multiples of these
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'each'}
+
+# Exact by definition: the avoirdupois ounce and pound, the US fluid ounce
+GRAMS_PER_OZ = 28.349523125
+GRAMS_PER_LB = 453.59237
+ML_PER_FL_OZ = 29.5735295625
+
+Unit = namedtuple('Unit', ['name', 'dimension', 'factor', 'plural', 'system'])
+
+
+def _key(text):
+    return ' '.join(text.lower().replace('.', ' ').split())
+
+
+class UnitRegistry:
+    # Every spelling a recipe uses for a unit, resolved once to its dimension
+    # and its factor to the dimension's base unit. Units the registry does
+    # not know (a "tray", a "flat") are kept as a dimension of their own,
+    # so they add up with themselves but never with anything else.
+
+    def __init__(self):
+        self.units = {}
+        self.aliases = {}
+        # Display units per (dimension, system), smallest first
+        self.ladders = {}
+
+    def define(self, name, dimension, factor, plural=None, aliases=(), system=None, ladder=True):
+        unit = Unit(name, dimension, factor, plural or f"{name}s", system)
+        self.units[name] = unit
+        for alias in (name, unit.plural, *aliases):
+            self.aliases[_key(alias)] = unit
+        if ladder:
+            self.ladders.setdefault((dimension, system), []).append(unit)
+            self.ladders[(dimension, system)].sort(key=lambda unit: unit.factor)
+        return unit
+
+    def lookup(self, text):
+        key = _key(text or '')
+        unit = self.aliases.get(key)
+        if unit is None:
+            # An ad hoc packaging unit, cached like any other alias
+            unit = Unit(key, key, 1.0, key, None)
+            self.aliases[key] = unit
+        return unit
+
+    def to_base(self, quantity, text):
+        unit = self.lookup(text)
+        return quantity * unit.factor, unit
+
+    def to_base_batch(self, pairs):
+        # [(quantity, unit text), ...] -> [(base quantity, Unit), ...]. Each
+        # distinct spelling is resolved once, then the whole column is scaled
+        # in a single pass.
+        resolved = {text: self.lookup(text) for text in {text for _, text in pairs}}
+        return [(quantity * resolved[text].factor, resolved[text]) for quantity, text in pairs]
+
+    def convert(self, quantity, from_text, to_text):
+        source = self.lookup(from_text)
+        target = self.lookup(to_text)
+        if source.dimension != target.dimension:
+            raise ValueError(f"Cannot convert {source.name} ({source.dimension}) to {target.name} ({target.dimension})")
+        return quantity * source.factor / target.factor
+
+    def display(self, base_quantity, unit):
+        # The largest unit of the same dimension and system that keeps the
+        # quantity at one or more, e.g. 48 tsp -> 1 cup
+        ladder = self.ladders.get((unit.dimension, unit.system))
+        if not ladder:
+            best = unit
+        else:
+            best = ladder[0]
+            for candidate in ladder:
+                if base_quantity >= candidate.factor * (1 - 1e-9):
+                    best = candidate
+        quantity = base_quantity / best.factor
+        return quantity, best.plural if quantity > 1 else best.name
+
+
+def _default_registry():
+    registry = UnitRegistry()
+
+    registry.define('g', MASS, 1.0, 'g', ('gram', 'grams', 'gr', 'gm'), 'metric')
+    registry.define('kg', MASS, 1000.0, 'kg', ('kilogram', 'kilograms', 'kilo', 'kilos'), 'metric')
+    registry.define('oz', MASS, GRAMS_PER_OZ, 'oz', ('ounce', 'ounces', 'wt oz'), 'us')
+    registry.define('lb', MASS, GRAMS_PER_LB, 'lbs', ('pound', 'pounds', '#'), 'us')
+
+    registry.define('ml', VOLUME, 1.0, 'ml', ('milliliter', 'milliliters', 'millilitre', 'millilitres'), 'metric')
+    registry.define('cl', VOLUME, 10.0, 'cl', ('centiliter', 'centiliters'), 'metric', ladder=False)
+    registry.define('l', VOLUME, 1000.0, 'l', ('liter', 'liters', 'litre', 'litres', 'lt'), 'metric')
+    registry.define('tsp', VOLUME, ML_PER_FL_OZ / 6, 'tsp', ('teaspoon', 'teaspoons'), 'us')
+    registry.define('tbsp', VOLUME, ML_PER_FL_OZ / 2, 'tbsp', ('tablespoon', 'tablespoons', 'tbs', 'tbl'), 'us')
+    registry.define('fl oz', VOLUME, ML_PER_FL_OZ, 'fl oz', ('fluid ounce', 'fluid ounces', 'floz'), 'us',
+                    ladder=False)
+    registry.define('cup', VOLUME, ML_PER_FL_OZ * 8, 'cups', (), 'us')
+    registry.define('pint', VOLUME, ML_PER_FL_OZ * 16, 'pints', ('pt', 'pts'), 'us', ladder=False)
+    registry.define('quart', VOLUME, ML_PER_FL_OZ * 32, 'quarts', ('qt', 'qts'), 'us')
+    registry.define('gallon', VOLUME, ML_PER_FL_OZ * 128, 'gallons', ('gal', 'gals'), 'us')
+    # Kitchen measures, by their usual definitions
+    registry.define('dash', VOLUME, ML_PER_FL_OZ / 48, 'dashes', system='us', ladder=False)
+    registry.define('pinch', VOLUME, ML_PER_FL_OZ / 96, 'pinches', system='us', ladder=False)
+    registry.define('stick', VOLUME, ML_PER_FL_OZ * 4, 'sticks', system='us', ladder=False)
+
+    registry.define('each', COUNT, 1.0, 'each', ('ea', 'pc', 'pcs', 'piece', 'pieces', 'unit', 'units'))
+    registry.define('dozen', COUNT, 12.0, 'dozen', ('dz', 'doz'), ladder=False)
+
+    # How recipes are scaled: portions served and batches of a recipe
+    registry.define(PORTION, PORTION, 1.0, 'portions', ('serving', 'servings', 'cover', 'covers', 'pp'),
+                    ladder=False)
+    registry.define(BATCH, BATCH, 1.0, 'batches', ('recipe', 'recipes'), ladder=False)
+
+    # Packaging units that recipes use often; each is its own dimension
+    for name, plural in (('slice', 'slices'), ('sheet', 'sheets'), ('leaf', 'leaves'),
+                         ('head', 'heads'), ('can', 'cans'), ('box', 'boxes'),
+                         ('pkg', 'pkgs'), ('bunch', 'bunches'), ('case', 'cases')):
+        registry.define(name, name, 1.0, plural, ladder=False)
+
+    return registry
+
+
+units = _default_registry()
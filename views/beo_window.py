@@ -1,26 +1,24 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                            QLabel, QLineEdit, QTextEdit, QComboBox, QFrame,
                            QGridLayout, QScrollArea, QMessageBox, QDateEdit,
-                           QTreeWidget, QTreeWidgetItem)
-from PyQt6.QtCore import Qt, QDate
-from PyQt6.QtGui import QFont
+                           QTreeView, QProgressBar, QFileDialog)
+from PyQt6.QtCore import Qt, QDate, QSortFilterProxyModel, QUrl
+from PyQt6.QtGui import QFont, QDesktopServices
 # from reportlab.lib.pagesizes import A4
 # from reportlab.lib.styles import getSampleStyleSheet
 # from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 # from reportlab.lib import colors
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT
-from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table, 
-                              TableStyle, PageBreak)
-from reportlab.lib import colors
-
-from models.models import session, Recipe, Ingredient, Allergen
-from menu_categories import MENU_CATEGORIES
+from controllers.beo_engine import Event, compute_beo
+from controllers.beo_export import FORMATS, export_beo, export_filename
+from controllers.beo_report import report_filename
+from controllers.data_service import data_service
+from controllers.event_store import EVENT_STATUSES, event_summaries, load_event, save_event
+from controllers.recipe_snapshots import recipe_snapshots
+from controllers.report_job import ReportJob, start_report
+from .recipe_tree_model import recipe_tree_model
 from datetime import datetime
-from utils.unit_converter import convert_units
+import os
 
 class BEOManagementWindow(QWidget):
     def __init__(self, main_window):
@@ -29,9 +27,13 @@ class BEOManagementWindow(QWidget):
         self.setWindowTitle("FEAST MASTER - BEO Management")
         self.setMinimumSize(1200, 800)
         self.menu_item_selections = []
+        self.event_id = None
+        self.report_job = None
+        self.report_cancel_requested = False
         
         self.setup_ui()
         self.apply_styles()
+        self.load_saved_events()
 
     def setup_ui(self):
         main_layout = QHBoxLayout(self)
@@ -80,8 +82,41 @@ class BEOManagementWindow(QWidget):
         self.special_requirements_input.setMaximumHeight(100)
         details_layout.addWidget(self.special_requirements_input, 3, 1)
 
+        # Status
+        self.status_input = QComboBox()
+        self.status_input.addItems([status.capitalize() for status in EVENT_STATUSES])
+        self.status_input.setObjectName("detail-input")
+        details_layout.addWidget(QLabel("Status:"), 4, 0)
+        details_layout.addWidget(self.status_input, 4, 1)
+
         left_layout.addWidget(event_details)
 
+        # Saved Events Section
+        saved_events = QFrame()
+        saved_events.setObjectName("details-section")
+        saved_layout = QGridLayout(saved_events)
+        saved_layout.setSpacing(10)
+        self.saved_events_input = QComboBox()
+        self.saved_events_input.setObjectName("detail-input")
+        saved_layout.addWidget(QLabel("Saved Events:"), 0, 0)
+        saved_layout.addWidget(self.saved_events_input, 0, 1, 1, 3)
+        load_event_btn = QPushButton("Load")
+        load_event_btn.setObjectName("button-secondary")
+        load_event_btn.clicked.connect(self.load_selected_event)
+        new_event_btn = QPushButton("New Event")
+        new_event_btn.setObjectName("button-secondary")
+        new_event_btn.clicked.connect(self.new_event)
+        save_event_btn = QPushButton("💾 Save Event")
+        save_event_btn.setObjectName("button-success")
+        save_event_btn.clicked.connect(self.save_current_event)
+        for btn in [load_event_btn, new_event_btn, save_event_btn]:
+            btn.setFixedHeight(36)
+        saved_layout.addWidget(load_event_btn, 1, 1)
+        saved_layout.addWidget(new_event_btn, 1, 2)
+        saved_layout.addWidget(save_event_btn, 1, 3)
+        left_layout.addWidget(saved_events)
+        left_layout.addStretch()
+
         # Right Panel - Menu Items (60% width)
         right_panel = QFrame()
         right_panel.setObjectName("right-panel")
@@ -94,9 +129,16 @@ class BEOManagementWindow(QWidget):
         search_box.setObjectName("search-box")
         right_layout.addWidget(search_box)
 
-        # Menu Items Tree
-        self.menu_tree = QTreeWidget()
-        self.menu_tree.setHeaderLabels(["Menu Items"])
+        # Menu Items Tree, backed by the model shared with the recipe window
+        self.menu_tree_model = recipe_tree_model()
+        self.menu_tree_model.error.connect(self.tree_error)
+        self.menu_proxy = QSortFilterProxyModel(self)
+        self.menu_proxy.setSourceModel(self.menu_tree_model)
+        self.menu_proxy.setRecursiveFilteringEnabled(True)
+        self.menu_proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.menu_proxy.rowsInserted.connect(self.expand_matches)
+        self.menu_tree = QTreeView()
+        self.menu_tree.setModel(self.menu_proxy)
         self.menu_tree.setObjectName("menu-tree")
         self.menu_tree.setMinimumHeight(300)
         right_layout.addWidget(self.menu_tree)
@@ -133,8 +175,11 @@ class BEOManagementWindow(QWidget):
         back_btn.setObjectName("button-secondary")
         generate_btn = QPushButton("📄 Generate Report")
         generate_btn.setObjectName("button-primary")
+        export_btn = QPushButton("⬇ Export Data")
+        export_btn.setObjectName("button-secondary")
+        export_btn.clicked.connect(self.export_data)
         
-        for btn in [back_btn, generate_btn]:
+        for btn in [back_btn, export_btn, generate_btn]:
             btn.setFixedHeight(42)
 
         # Add panels to main layout
@@ -145,11 +190,26 @@ class BEOManagementWindow(QWidget):
         button_layout = QHBoxLayout()
         button_layout.addStretch()
         button_layout.addWidget(back_btn)
+        button_layout.addWidget(export_btn)
         button_layout.addWidget(generate_btn)
         left_layout.addLayout(button_layout)
 
-        # Load menu items into tree
-        self.load_menu_items()
+        # Report progress, shown while a report renders in the background
+        self.report_progress_frame = QFrame()
+        self.report_progress_frame.setObjectName("details-section")
+        progress_layout = QGridLayout(self.report_progress_frame)
+        self.report_status_label = QLabel()
+        self.report_progress_bar = QProgressBar()
+        self.report_progress_bar.setObjectName("report-progress")
+        cancel_report_btn = QPushButton("Cancel")
+        cancel_report_btn.setObjectName("button-delete")
+        cancel_report_btn.setFixedHeight(30)
+        cancel_report_btn.clicked.connect(self.cancel_report)
+        progress_layout.addWidget(self.report_status_label, 0, 0, 1, 2)
+        progress_layout.addWidget(self.report_progress_bar, 1, 0)
+        progress_layout.addWidget(cancel_report_btn, 1, 1)
+        self.report_progress_frame.hide()
+        left_layout.addWidget(self.report_progress_frame)
 
         # Connect signals after all methods are defined
         self.setup_connections(back_btn, generate_btn, search_box)
@@ -159,70 +219,31 @@ class BEOManagementWindow(QWidget):
         generate_btn.clicked.connect(self.generate_reports)
         search_box.textChanged.connect(self.filter_menu_items)
 
-    def load_menu_items(self):
-        try:
-            self.menu_tree.clear()
-            
-            # Create category items
-            category_items = {}
-            for category in sorted(MENU_CATEGORIES.keys()):
-                category_item = QTreeWidgetItem([category])
-                self.menu_tree.addTopLevelItem(category_item)
-                category_items[category] = category_item
-                
-                # Add subcategories if they exist
-                if MENU_CATEGORIES[category]:
-                    for subcategory in MENU_CATEGORIES[category]:
-                        subcat_item = QTreeWidgetItem([subcategory])
-                        category_item.addChild(subcat_item)
-                        category_items[f"{category}|{subcategory}"] = subcat_item
-
-            # Add menu items to appropriate categories
-            recipes = session.query(Recipe).order_by(Recipe.name).all()
-            for recipe in recipes:
-                recipe_item = QTreeWidgetItem([recipe.name])
-                recipe_item.setData(0, Qt.ItemDataRole.UserRole, recipe.id)
-                
-                if recipe.category and recipe.subcategory:
-                    # Add to subcategory
-                    key = f"{recipe.category}|{recipe.subcategory}"
-                    if key in category_items:
-                        category_items[key].addChild(recipe_item)
-                elif recipe.category:
-                    # Add to main category
-                    if recipe.category in category_items:
-                        category_items[recipe.category].addChild(recipe_item)
-                else:
-                    # Add to root if no category
-                    self.menu_tree.addTopLevelItem(recipe_item)
-
-            # Expand all categories
-            self.menu_tree.expandAll()
-            
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load menu items: {str(e)}")
-
     def add_menu_item(self):
-        selected_items = self.menu_tree.selectedItems()
-        if not selected_items or selected_items[0].childCount() > 0:  # No selection or is a category
+        selected_indexes = self.menu_tree.selectionModel().selectedIndexes()
+        if not selected_indexes or selected_indexes[0].data(Qt.ItemDataRole.UserRole) is None:  # No selection or is a category
             return
+        self.add_menu_item_row(selected_indexes[0].data(Qt.ItemDataRole.UserRole), selected_indexes[0].data())
 
-        # Create new row for selected item
+    def add_menu_item_row(self, recipe_id, menu_item_name, quantity=None):
+        # Create new row for the item
         row_widget = QFrame()
         row_widget.setObjectName("menu-item-row")
         row_layout = QHBoxLayout(row_widget)
         row_layout.setSpacing(10)
 
         # Menu item name (60% width)
-        menu_item_name = selected_items[0].text(0)
         name_label = QLabel(menu_item_name)
         name_label.setObjectName("menu-item-label")
         row_layout.addWidget(name_label, 60)
 
         # Quantity input (35% width)
         quantity_input = QLineEdit()
-        quantity_input.setPlaceholderText("Quantity")
+        quantity_input.setPlaceholderText("Portions")
+        quantity_input.setToolTip("Portions to serve; batches for recipes without a yield")
         quantity_input.setObjectName("quantity-input")
+        if quantity is not None:
+            quantity_input.setText(str(quantity))
         row_layout.addWidget(quantity_input, 35)
 
         # Delete button (5% width)
@@ -232,7 +253,7 @@ class BEOManagementWindow(QWidget):
         row_layout.addWidget(delete_btn, 5)
 
         self.selected_items_layout.addWidget(row_widget)
-        self.menu_item_selections.append((menu_item_name, quantity_input))
+        self.menu_item_selections.append((recipe_id, menu_item_name, quantity_input))
 
     def delete_menu_item_row(self, row_widget):
         index = None
@@ -246,45 +267,82 @@ class BEOManagementWindow(QWidget):
             self.menu_item_selections.pop(index)
 
     def filter_menu_items(self, search_text):
-        def filter_item(item, text):
-            # If the item matches, show it and its parents
-            if text.lower() in item.text(0).lower():
-                item.setHidden(False)
-                parent = item.parent()
-                while parent:
-                    parent.setHidden(False)
-                    parent = parent.parent()
-                return True
-            
-            # If it's a category/has children, check children
-            if item.childCount() > 0:
-                show_item = False
-                for i in range(item.childCount()):
-                    if filter_item(item.child(i), text):
-                        show_item = True
-                item.setHidden(not show_item)
-                return show_item
-            
-            # No match
-            item.setHidden(True)
-            return False
-
-        if not search_text:
-            # Show all items if search is empty
-            def show_all(item):
-                item.setHidden(False)
-                for i in range(item.childCount()):
-                    show_all(item.child(i))
-            
-            for i in range(self.menu_tree.topLevelItemCount()):
-                show_all(self.menu_tree.topLevelItem(i))
+        if search_text:
+            # Matches can be in nodes that have not been expanded yet
+            self.menu_tree_model.fetch_all()
+        self.menu_proxy.setFilterFixedString(search_text)
+        if search_text:
+            if self.menu_tree_model.all_fetched():
+                self.menu_tree.expandAll()
         else:
-            # Filter based on search text
-            for i in range(self.menu_tree.topLevelItemCount()):
-                filter_item(self.menu_tree.topLevelItem(i), search_text)
+            self.menu_tree.collapseAll()
 
-    def generate_reports(self):
-        # Now correctly indented to align with other methods
+    def tree_error(self, title, message):
+        # The tree model is shared, so only the window on screen reports
+        if self.isVisible():
+            QMessageBox.warning(self, title, message)
+
+    def expand_matches(self):
+        if self.menu_proxy.filterRegularExpression().pattern():
+            self.menu_tree.expandAll()
+
+    def clear_menu_items(self):
+        while self.selected_items_layout.count():
+            widget = self.selected_items_layout.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+        self.menu_item_selections = []
+
+    def new_event(self):
+        self.event_id = None
+        self.event_name_input.clear()
+        self.event_date_input.setDate(QDate.currentDate())
+        self.guest_count_input.clear()
+        self.special_requirements_input.clear()
+        self.status_input.setCurrentIndex(0)
+        self.clear_menu_items()
+
+    def load_saved_events(self):
+        def show(summaries):
+            self.saved_events_input.clear()
+            for summary in summaries:
+                self.saved_events_input.addItem(
+                    f"{summary.date:%m/%d/%Y} - {summary.name} ({summary.status.capitalize()})",
+                    summary.id
+                )
+            if self.event_id is not None:
+                self.saved_events_input.setCurrentIndex(self.saved_events_input.findData(self.event_id))
+
+        data_service().submit(event_summaries, show, key="beo:events")
+
+    def load_selected_event(self):
+        event_id = self.saved_events_input.currentData()
+        if event_id is None:
+            return
+        data_service().submit(
+            lambda session: load_event(session, event_id),
+            self.show_event,
+            lambda message: QMessageBox.warning(self, "Error", f"Failed to load event: {message}"),
+            key="beo:load"
+        )
+
+    def show_event(self, saved):
+        if saved is None:
+            QMessageBox.warning(self, "Error", "That event no longer exists.")
+            self.load_saved_events()
+            return
+        self.event_id = saved.id
+        self.event_name_input.setText(saved.event.name)
+        self.event_date_input.setDate(QDate(saved.event.date.year, saved.event.date.month, saved.event.date.day))
+        self.guest_count_input.setText(str(saved.event.guest_count))
+        self.special_requirements_input.setPlainText(saved.event.special_requirements)
+        self.status_input.setCurrentIndex(EVENT_STATUSES.index(saved.status))
+        self.clear_menu_items()
+        for recipe_id, name, quantity in saved.items:
+            self.add_menu_item_row(recipe_id, name, quantity)
+
+    def collect_event(self):
+        # (Event, selections, status) from the form, or None after warning
         if not self.event_name_input.text() or not self.guest_count_input.text():
             QMessageBox.warning(
                 self,
@@ -292,16 +350,25 @@ class BEOManagementWindow(QWidget):
                 "Event name and guest count are required.",
                 QMessageBox.StandardButton.Ok
             )
-            return
-
-        shopping_list = {}
-        allergens = set()
+            return None
 
         event_name = self.event_name_input.text()
-        event_date = self.event_date_input.date()
-        formatted_date = event_date.toString("dddd, MMMM d, yyyy")  # Includes day of week
-        guest_count = self.guest_count_input.text()
-        special_requirements = self.special_requirements_input.toPlainText()
+        try:
+            guest_count = int(self.guest_count_input.text())
+        except ValueError:
+            QMessageBox.warning(
+                self,
+                "Input Error",
+                "Guest count must be a whole number.",
+                QMessageBox.StandardButton.Ok
+            )
+            return None
+        event = Event(
+            event_name,
+            self.event_date_input.date().toPyDate(),
+            guest_count,
+            self.special_requirements_input.toPlainText()
+        )
 
         # Check if any menu items are selected
         if not self.menu_item_selections:
@@ -311,73 +378,148 @@ class BEOManagementWindow(QWidget):
                 "Please add at least one menu item.",
                 QMessageBox.StandardButton.Ok
             )
+            return None
+
+        selections = []
+        for recipe_id, menu_item_name, quantity_input in self.menu_item_selections:
+            if not quantity_input.text().strip():
+                continue
+            try:
+                selections.append((recipe_id, int(quantity_input.text())))
+            except ValueError:
+                QMessageBox.warning(
+                    self,
+                    "Input Error",
+                    f"Invalid quantity for {menu_item_name}",
+                    QMessageBox.StandardButton.Ok
+                )
+                return None
+        return event, selections, EVENT_STATUSES[self.status_input.currentIndex()]
+
+    def save_job(self, event, selections, status, then=None):
+        # Saves the event on the data service; then(session) runs in the
+        # same job after the commit and its result is passed to on_saved
+        event_id = self.event_id
+
+        def save(session):
+            saved_id = save_event(session, event, selections, status, event_id)
+            session.commit()
+            return saved_id, then(session) if then else None
+
+        def saved(result):
+            self.event_id = result[0]
+            self.load_saved_events()
+            return result[1]
+
+        return save, saved
+
+    def save_current_event(self):
+        collected = self.collect_event()
+        if collected is None:
             return
+        save, saved = self.save_job(*collected)
+        data_service().submit(
+            save,
+            saved,
+            lambda message: QMessageBox.warning(self, "Error", f"Failed to save event: {message}"),
+            key="beo:save"
+        )
 
-        try:
-            # Create organized menu items dictionary by category
-            menu_items_by_category = {}
-            
-            # Loop through each selected menu item
-            for menu_item_name, quantity_input in self.menu_item_selections:
-                if not quantity_input.text().strip():
-                    continue
-
-                recipe = session.query(Recipe).filter_by(name=menu_item_name).first()
-                if not recipe:
-                    continue
-
-                category = recipe.category or "Uncategorized"
-                if category not in menu_items_by_category:
-                    menu_items_by_category[category] = []
-                
-                try:
-                    ordered_quantity = int(quantity_input.text())
-                except ValueError:
-                    QMessageBox.warning(
-                        self,
-                        "Input Error",
-                        f"Invalid quantity for {menu_item_name}",
-                        QMessageBox.StandardButton.Ok
-                    )
-                    return
-
-                # Add to category list
-                menu_items_by_category[category].append({
-                    'recipe': recipe,
-                    'quantity': ordered_quantity
-                })
-
-                # Update shopping list
-                for ingredient in recipe.ingredients:
-                    ingredient_name = ingredient.ingredient
-                    ingredient_quantity = float(ingredient.quantity) * ordered_quantity
-                    uom = ingredient.uom
-
-                    # Convert the units if applicable
-                    converted_quantity, converted_uom = convert_units(ingredient_quantity, uom)
-                    if ingredient_name in shopping_list:
-                        shopping_list[ingredient_name]['quantity'] += converted_quantity
-                    else:
-                        shopping_list[ingredient_name] = {
-                            'quantity': converted_quantity, 
-                            'uom': converted_uom
-                        }
-
-                # Update allergens
-                allergens.update([a.allergen for a in recipe.allergens])
-
-            self.generate_pdf_report(
-                event_name, 
-                formatted_date,
-                guest_count, 
-                special_requirements, 
-                menu_items_by_category,
-                shopping_list, 
-                allergens
+    def generate_reports(self):
+        if not self.report_progress_frame.isHidden():
+            QMessageBox.warning(
+                self,
+                "Report in Progress",
+                "Wait for the current report to finish, or cancel it.",
+                QMessageBox.StandardButton.Ok
             )
+            return
+        collected = self.collect_event()
+        if collected is None:
+            return
+        event, selections, status = collected
+        save, saved = self.save_job(event, selections, status, self.build_job(event, selections))
+
+        def report_ready(result):
+            result = saved(result)
+            if self.report_cancel_requested:
+                self.report_finished()
+            else:
+                self.generate_pdf_report(result)
+
+        def report_failed(message):
+            self.report_finished()
+            QMessageBox.warning(self, "Error", f"Failed to generate report: {message}")
+
+        # The event is saved, recipes are loaded and the BEO computed off
+        # the GUI thread; the PDF is then rendered on the thread pool
+        self.report_started("Preparing report...")
+        data_service().submit(save, report_ready, report_failed, key="beo:report")
+
+    def build_job(self, event, selections):
+        def build(session):
+            # Only recipes that are new to this window's BEOs or were edited
+            # since the last report are loaded
+            recipes = recipe_snapshots.get(session, [recipe_id for recipe_id, _ in selections])
+            return compute_beo(event, selections, recipes)
+        return build
+
+    def export_data(self):
+        # Menu, ingredients, shopping list and allergens for purchasing and
+        # accounting; CSV carries the shopping list only
+        collected = self.collect_event()
+        if collected is None:
+            return
+        event, selections, _ = collected
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Export BEO Data",
+            export_filename(event.name, "xlsx"),
+            "Excel Workbook (*.xlsx);;JSON Lines (*.jsonl);;CSV Shopping List (*.csv)"
+        )
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += next(
+                (extension for extension in FORMATS.values() if f"*{extension}" in selected_filter), ".xlsx"
+            )
+        build = self.build_job(event, selections)
 
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to generate report: {str(e)}")
+        def export(session):
+            return export_beo(build(session), path)
+
+        data_service().submit(
+            export,
+            lambda paths: QMessageBox.information(self, "Export Complete", f"BEO data exported to {', '.join(paths)}"),
+            lambda message: QMessageBox.warning(self, "Error", f"Failed to export BEO data: {message}"),
+            key="beo:export"
+        )
+
+    def report_started(self, status):
+        self.report_cancel_requested = False
+        self.report_status_label.setText(status)
+        self.report_progress_bar.setRange(0, 0)
+        self.report_progress_frame.show()
+
+    def report_progress(self, done, total, label):
+        self.report_progress_bar.setRange(0, total)
+        self.report_progress_bar.setValue(done)
+        self.report_status_label.setText(f"{label} ({done}/{total})")
+
+    def report_finished(self):
+        self.report_job = None
+        self.report_cancel_requested = False
+        self.report_progress_frame.hide()
+
+    def cancel_report(self):
+        if self.report_job is not None:
+            self.report_job.cancel()
+            self.report_status_label.setText("Cancelling...")
+        else:
+            # Still saving and computing on the data service; let the save
+            # land so the event id is kept, then skip the render
+            self.report_cancel_requested = True
+            self.report_status_label.setText("Cancelling...")
 
     # def generate_pdf_report(self, event_name, event_date, guest_count, 
     #                       special_requirements, menu_items_by_category,
@@ -538,197 +680,28 @@ class BEOManagementWindow(QWidget):
     #         }
     #     """)
     #     msg.exec()
-    def generate_pdf_report(self, event_name, event_date, guest_count, 
-                       special_requirements, menu_items_by_category,
-                       shopping_list, allergens):
-        pdf_file = f"BEO_Report_{event_name.replace(' ', '_')}.pdf"
-        doc = SimpleDocTemplate(
-            pdf_file,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-        
-        # Create custom styles
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(
-            name='CoverTitle',
-            parent=styles['Title'],
-            fontSize=24,
-            textColor=colors.HexColor('#4a90e2'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        ))
-        styles.add(ParagraphStyle(
-            name='SectionTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#4a90e2'),
-            spaceBefore=20,
-            spaceAfter=10
-        ))
-        styles.add(ParagraphStyle(
-            name='SubsectionTitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#2d2d2d'),
-            spaceBefore=15,
-            spaceAfter=8
-        ))
-        
-        story = []
-
-        # Cover Page
-        story.append(Paragraph("Banquet Event Order", styles['CoverTitle']))
-        story.append(Spacer(1, 30))
-        
-        # Event Information Table
-        event_data = [
-            ["Event Name:", event_name],
-            ["Date:", event_date],
-            ["Guest Count:", guest_count],
-            ["Special Requirements:", special_requirements if special_requirements else "None"]
-        ]
-        
-        event_table = Table(event_data, colWidths=[2*inch, 4*inch])
-        event_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f5f5f5')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2d2d2d')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('TOPPADDING', (0, 0), (-1, -1), 12),
-            ('LEFTPADDING', (0, 0), (-1, -1), 15),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 15),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
-        ]))
-        story.append(event_table)
-        
-        # Allergens Warning (if any)
-        if allergens:
-            story.append(Spacer(1, 20))
-            allergens_text = "⚠️ ALLERGENS PRESENT: " + ", ".join(sorted(allergens))
-            story.append(Paragraph(
-                f'<para fontSize=12 textColor="red"><b>{allergens_text}</b></para>',
-                styles['Normal']
-            ))
-        
-        story.append(PageBreak())
-
-        # Menu Items Section
-        story.append(Paragraph("Menu Items", styles['SectionTitle']))
-        
-        for category, items in menu_items_by_category.items():
-            story.append(Paragraph(category, styles['SubsectionTitle']))
-            
-            for item in items:
-                recipe = item['recipe']
-                quantity = item['quantity']
-                
-                # Menu Item Header
-                item_header = f"{recipe.name} (Quantity: {quantity})"
-                story.append(Paragraph(f"<b>{item_header}</b>", styles['Normal']))
-                
-                if recipe.menu_description:
-                    story.append(Paragraph(
-                        f"<i>{recipe.menu_description}</i>",
-                        styles['Normal']
-                    ))
-                
-                # Ingredients Table
-                ingredient_data = [["Ingredient", "Quantity", "Unit"]]
-                for ingredient in recipe.ingredients:
-                    calculated_quantity = float(ingredient.quantity) * quantity
-                    converted_quantity, converted_uom = convert_units(
-                        calculated_quantity, 
-                        ingredient.uom
-                    )
-                    ingredient_data.append([
-                        ingredient.ingredient,
-                        f"{converted_quantity:.2f}",
-                        converted_uom
-                    ])
-                
-                ingredient_table = Table(
-                    ingredient_data,
-                    colWidths=[4*inch, 1.5*inch, 1.5*inch],
-                    style=TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a90e2')),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 11),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-                        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-                        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                        ('FONTSIZE', (0, 1), (-1, -1), 10),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dddddd')),
-                        ('ROWBACKGROUNDS', (0, 1), (-1, -1), 
-                        [colors.HexColor('#ffffff'), colors.HexColor('#f8f9fa')]),
-                    ])
-                )
-                story.append(ingredient_table)
-                story.append(Spacer(1, 15))
-            
-            story.append(Spacer(1, 20))
-
-        # New Page for Shopping List
-        story.append(PageBreak())
-        story.append(Paragraph("Consolidated Shopping List", styles['SectionTitle']))
-        
-        # Group shopping list by category (future enhancement)
-        shopping_data = [["Ingredient", "Total Quantity", "Unit"]]
-        for ingredient, details in sorted(shopping_list.items()):
-            shopping_data.append([
-                ingredient,
-                f"{details['quantity']:.2f}",
-                details['uom']
-            ])
-        
-        shopping_table = Table(
-            shopping_data,
-            colWidths=[4*inch, 1.5*inch, 1.5*inch],
-            style=TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4a90e2')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dddddd')),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), 
-                [colors.HexColor('#ffffff'), colors.HexColor('#f8f9fa')]),
-            ])
-        )
-        story.append(shopping_table)
-
-        # Footer with page numbers
-        def add_page_number(canvas, doc):
-            page_num = canvas.getPageNumber()
-            text = f"Page {page_num}"
-            canvas.saveState()
-            canvas.setFont('Helvetica', 9)
-            canvas.setFillColor(colors.HexColor('#666666'))
-            canvas.drawRightString(doc.pagesize[0] - 72, 72, text)
-            canvas.restoreState()
-
-        # Build the PDF with page numbers
-        doc.build(story, onFirstPage=add_page_number, onLaterPages=add_page_number)
-        
+    def generate_pdf_report(self, result):
+        job = ReportJob(result, report_filename(result.event.name))
+        job.signals.progress.connect(self.report_progress)
+        job.signals.finished.connect(self.report_generated)
+        job.signals.failed.connect(self.report_failed)
+        job.signals.cancelled.connect(self.report_finished)
+        self.report_job = job
+        self.report_started(f"Rendering {result.event.name}...")
+        start_report(job)
+
+    def report_failed(self, message):
+        self.report_finished()
+        QMessageBox.warning(self, "Error", f"Failed to generate report: {message}")
+
+    def report_generated(self, pdf_file):
+        self.report_finished()
         msg = QMessageBox(self)
         msg.setWindowTitle("Success")
         msg.setText(f"BEO Report has been generated: {pdf_file}")
         msg.setIcon(QMessageBox.Icon.Information)
+        open_btn = msg.addButton("Open", QMessageBox.ButtonRole.ActionRole)
+        msg.addButton(QMessageBox.StandardButton.Ok)
         msg.setStyleSheet("""
             QMessageBox {
                 background-color: #2d2d2d;
@@ -746,9 +719,12 @@ class BEOManagementWindow(QWidget):
             }
         """)
         msg.exec()
+        if msg.clickedButton() is open_btn:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.abspath(pdf_file)))
 
     def back_to_main(self):
         self.close()
+        self.main_window.load_stats()
         self.main_window.show()
 
     def apply_styles(self):
@@ -838,6 +814,18 @@ class BEOManagementWindow(QWidget):
                 opacity: 0.8;
             }
 
+            #report-progress {
+                background-color: #3d3d3d;
+                border: none;
+                border-radius: 5px;
+                text-align: center;
+            }
+
+            #report-progress::chunk {
+                background-color: #4a90e2;
+                border-radius: 5px;
+            }
+
             QScrollBar:vertical {
                 border: none;
                 background-color: #2d2d2d;
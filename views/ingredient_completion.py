@@ -0,0 +1,71 @@
+from PyQt6.QtCore import QStringListModel
+from PyQt6.QtWidgets import QCompleter
+
+from controllers.data_service import data_service
+from models.ingredient_catalog import ingredient_catalog
+
+# Suggestions shown in the completion popup
+COMPLETION_LIMIT = 20
+
+
+class IngredientCompletionModel(QStringListModel):
+    # One completion list shared by every ingredient row. It holds the ranked
+    # matches for whichever row is being typed in, taken from the in-memory
+    # catalog; the catalog is (re)loaded in the background when needed.
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loading = False
+        self.pending = None
+
+    def ensure_loaded(self):
+        if ingredient_catalog.loaded or self.loading:
+            return
+        self.loading = True
+        data_service().submit(ingredient_catalog.load, self.catalog_loaded, self.catalog_failed)
+
+    def catalog_loaded(self, catalog):
+        self.loading = False
+        if self.pending is not None:
+            completer = self.pending
+            self.pending = None
+            if completer.widget() is not None:
+                self.update_matches(completer, completer.widget().text())
+
+    def catalog_failed(self, message):
+        self.loading = False
+        self.pending = None
+
+    def update_matches(self, completer, text):
+        if not ingredient_catalog.loaded:
+            # Catch up with the row's text once the catalog is back
+            self.pending = completer
+            self.ensure_loaded()
+            return
+        self.pending = None
+        self.setStringList(ingredient_catalog.complete(text, COMPLETION_LIMIT))
+        if text.strip() and completer.widget() is not None and completer.widget().hasFocus():
+            completer.complete()
+
+    def attach(self, line_edit):
+        # The matches are already ranked, so the completer shows them as-is
+        completer = QCompleter(self, line_edit)
+        completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        line_edit.setCompleter(completer)
+        line_edit.textEdited.connect(lambda text: self.update_matches(completer, text))
+        self.ensure_loaded()
+        return completer
+
+    def preferred_uom(self, name):
+        entry = ingredient_catalog.lookup(name)
+        return entry[2] if entry else None
+
+
+_model = None
+
+
+def ingredient_completion_model():
+    global _model
+    if _model is None:
+        _model = IngredientCompletionModel()
+    return _model
@@ -1,9 +1,20 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
-                           QLabel, QLineEdit, QTableWidget, QTableWidgetItem,
-                           QComboBox, QFrame, QMessageBox, QHeaderView)
-from PyQt6.QtCore import Qt
+                           QLabel, QLineEdit, QTableView, QAbstractItemView,
+                           QFrame, QMessageBox, QHeaderView)
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont
-from models.models import session, MasterIngredient, Ingredient
+from models.models import MasterIngredient, Ingredient
+from models.usage_stats import usage_stats
+from controllers.data_service import data_service
+from models.ingredient_catalog import ingredient_catalog
+from .ingredient_table_model import (MasterIngredientTableModel, AllergenDelegate, ComboBoxDelegate,
+                                     DeleteButtonDelegate, CATEGORIES, UOMS, CATEGORY, UOM, ALLERGEN_FLAGS,
+                                     ACTIONS)
+
+# Quiet period after the last keystroke before searching
+SEARCH_DELAY_MS = 150
+# Most search results shown
+SEARCH_LIMIT = 200
 
 class IngredientManagementWindow(QWidget):
     def __init__(self, main_window):
@@ -30,33 +41,54 @@ class IngredientManagementWindow(QWidget):
         header_layout.addStretch()
         
         # Search and filter controls
-        search_box = QLineEdit()
-        search_box.setPlaceholderText("🔍 Search ingredients...")
-        search_box.setObjectName("search-box")
-        search_box.textChanged.connect(self.filter_ingredients)
-        header_layout.addWidget(search_box)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("🔍 Search ingredients...")
+        self.search_box.setObjectName("search-box")
+        header_layout.addWidget(self.search_box)
+
+        # Search once typing pauses rather than on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.filter_ingredients)
+        self.search_box.textChanged.connect(self.search_timer.start)
         
         main_layout.addWidget(header)
 
-        # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels([
-            "Ingredient Name", 
-            "Category", 
-            "Preferred UOM", 
-            "Times Used",
-            "Actions"
-        ])
+        # Table: a model paged in from the database, with delegates that only
+        # create editors for the cell being edited
+        self.table_model = MasterIngredientTableModel(self)
+        self.table_model.error.connect(lambda title, message: QMessageBox.warning(self, title, message))
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(
+            QAbstractItemView.EditTrigger.SelectedClicked
+            | QAbstractItemView.EditTrigger.DoubleClicked
+        )
+        self.table.verticalHeader().setDefaultSectionSize(36)
+        self.category_delegate = ComboBoxDelegate(CATEGORIES, self.table)
+        self.uom_delegate = ComboBoxDelegate(UOMS, self.table)
+        self.allergen_delegate = AllergenDelegate(self.table)
+        self.delete_delegate = DeleteButtonDelegate(self.table)
+        self.delete_delegate.clicked.connect(
+            lambda index: self.delete_ingredient(index.data(Qt.ItemDataRole.UserRole))
+        )
+        self.table.setItemDelegateForColumn(CATEGORY, self.category_delegate)
+        self.table.setItemDelegateForColumn(UOM, self.uom_delegate)
+        self.table.setItemDelegateForColumn(ALLERGEN_FLAGS, self.allergen_delegate)
+        self.table.setItemDelegateForColumn(ACTIONS, self.delete_delegate)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Fixed)
         self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Fixed)
         self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Fixed)
         self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeMode.Fixed)
+        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeMode.Fixed)
         self.table.setColumnWidth(1, 150)
         self.table.setColumnWidth(2, 150)
-        self.table.setColumnWidth(3, 100)
+        self.table.setColumnWidth(3, 200)
         self.table.setColumnWidth(4, 100)
+        self.table.setColumnWidth(5, 100)
         main_layout.addWidget(self.table)
 
         # Bottom buttons
@@ -82,92 +114,23 @@ class IngredientManagementWindow(QWidget):
         main_layout.addLayout(button_layout)
 
     def load_ingredients(self):
-        ingredients = session.query(MasterIngredient).order_by(MasterIngredient.name).all()
-        self.table.setRowCount(len(ingredients))
-        
-        for row, ingredient in enumerate(ingredients):
-            # Name
-            name_item = QTableWidgetItem(ingredient.name)
-            name_item.setData(Qt.ItemDataRole.UserRole, ingredient.id)
-            self.table.setItem(row, 0, name_item)
-            
-            # Category
-            category_combo = QComboBox()
-            categories = ["", "Protein", "Produce", "Dairy", "Dry Goods", "Spices", "Bakery", "Frozen", "Condiments"]
-            category_combo.addItems(categories)
-            if ingredient.category:
-                index = category_combo.findText(ingredient.category)
-                if index >= 0:
-                    category_combo.setCurrentIndex(index)
-            category_combo.currentTextChanged.connect(
-                lambda text, ing_id=ingredient.id: self.update_category(ing_id, text)
-            )
-            self.table.setCellWidget(row, 1, category_combo)
-            
-            # Preferred UOM
-            uom_combo = QComboBox()
-            uoms = ["", "oz", "lb", "cup", "tsp", "tbsp", "qt", "gallon", "each"]
-            uom_combo.addItems(uoms)
-            if ingredient.preferred_uom:
-                index = uom_combo.findText(ingredient.preferred_uom)
-                if index >= 0:
-                    uom_combo.setCurrentIndex(index)
-            uom_combo.currentTextChanged.connect(
-                lambda text, ing_id=ingredient.id: self.update_uom(ing_id, text)
-            )
-            self.table.setCellWidget(row, 2, uom_combo)
-            
-            # Times Used
-            times_used = session.query(Ingredient).filter_by(
-                master_ingredient_id=ingredient.id
-            ).count()
-            usage_item = QTableWidgetItem(str(times_used))
-            usage_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.table.setItem(row, 3, usage_item)
-            
-            # Delete button
-            delete_btn = QPushButton("×")
-            delete_btn.setObjectName("button-delete")
-            delete_btn.clicked.connect(lambda _, ing_id=ingredient.id: self.delete_ingredient(ing_id))
-            self.table.setCellWidget(row, 4, delete_btn)
-    def update_category(self, ingredient_id, new_category):
-        try:
-            ingredient = session.query(MasterIngredient).get(ingredient_id)
-            if ingredient:
-                ingredient.category = new_category if new_category != "" else None
-                session.commit()
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to update category: {str(e)}")
-
-    def update_uom(self, ingredient_id, new_uom):
-        try:
-            ingredient = session.query(MasterIngredient).get(ingredient_id)
-            if ingredient:
-                ingredient.preferred_uom = new_uom if new_uom != "" else None
-                session.commit()
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to update UOM: {str(e)}")
+        self.table_model.reload()
 
     def delete_ingredient(self, ingredient_id):
         try:
-            ingredient = session.query(MasterIngredient).get(ingredient_id)
-            if ingredient:
-                # Check if ingredient is in use
-                usage_count = session.query(Ingredient).filter_by(
-                    master_ingredient_id=ingredient_id
-                ).count()
+            row = self.table_model.row_of(ingredient_id)
+            if row is not None:
+                name = self.table_model.ingredient_name(row)
+                # Check if ingredient is in use, by the counts the table shows
+                usage_count = self.table_model.usage_counts.get(ingredient_id, 0)
                 
                 if usage_count > 0:
-                    QMessageBox.warning(
-                        self,
-                        "Cannot Delete",
-                        f"This ingredient is used in {usage_count} recipes and cannot be deleted."
-                    )
+                    self.warn_in_use(usage_count)
                     return
 
                 confirm = QMessageBox(self)
                 confirm.setWindowTitle("Confirm Delete")
-                confirm.setText(f"Are you sure you want to delete '{ingredient.name}'?")
+                confirm.setText(f"Are you sure you want to delete '{name}'?")
                 confirm.setIcon(QMessageBox.Icon.Question)
                 confirm.setStandardButtons(
                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
@@ -190,106 +153,54 @@ class IngredientManagementWindow(QWidget):
                 """)
                 
                 if confirm.exec() == QMessageBox.StandardButton.Yes:
-                    session.delete(ingredient)
-                    session.commit()
-                    self.load_ingredients()
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to delete ingredient: {str(e)}")
+                    def delete(session):
+                        # Checked again here, as recipes may have started
+                        # using it since the counts were loaded
+                        usage_count = usage_stats.count_for(session, ingredient_id)
+                        if usage_count > 0:
+                            return usage_count
+                        # Through the ORM, so the catalog drops just this one
+                        ingredient = session.get(MasterIngredient, ingredient_id)
+                        if ingredient is not None:
+                            session.delete(ingredient)
+                        session.commit()
+                        return 0
 
-    def add_new_ingredient(self):
-        try:
-            # Find the first empty row or add a new one
-            found_empty = False
-            for row in range(self.table.rowCount()):
-                if not self.table.item(row, 0) or not self.table.item(row, 0).text():
-                    found_empty = True
-                    break
-            
-            if not found_empty:
-                row = self.table.rowCount()
-                self.table.setRowCount(row + 1)
-            
-            # Add empty name cell that's editable
-            name_item = QTableWidgetItem("New Ingredient")
-            name_item.setFlags(name_item.flags() | Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 0, name_item)
-            
-            # Add combo boxes for category and UOM
-            category_combo = QComboBox()
-            categories = ["", "Protein", "Produce", "Dairy", "Dry Goods", "Spices", "Other"]
-            category_combo.addItems(categories)
-            self.table.setCellWidget(row, 1, category_combo)
-            
-            uom_combo = QComboBox()
-            uoms = ["", "oz", "lb", "cup", "tsp", "tbsp", "qt", "gallon", "each"]
-            uom_combo.addItems(uoms)
-            self.table.setCellWidget(row, 2, uom_combo)
-            
-            # Usage count starts at 0
-            usage_item = QTableWidgetItem("0")
-            usage_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.table.setItem(row, 3, usage_item)
-            
-            # Add delete button
-            delete_btn = QPushButton("×")
-            delete_btn.setObjectName("button-delete")
-            self.table.setCellWidget(row, 4, delete_btn)
-            
-            # Edit the name
-            self.table.editItem(name_item)
-            
-            # Save when editing is finished
-            name_item.setData(Qt.ItemDataRole.UserRole, None)  # No ID yet
-            self.table.itemChanged.connect(self.save_new_ingredient)
-            
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to add new ingredient: {str(e)}")
+                    def deleted(usage_count):
+                        if usage_count > 0:
+                            self.warn_in_use(usage_count)
+                        else:
+                            self.table_model.remove_ingredient(ingredient_id)
 
-    def save_new_ingredient(self, item):
-        if item.column() != 0:  # Only handle name column
-            return
-            
-        try:
-            ingredient_id = item.data(Qt.ItemDataRole.UserRole)
-            if ingredient_id is None:  # This is a new ingredient
-                name = item.text().strip()
-                if not name:
-                    return
-                
-                # Check for duplicates
-                existing = session.query(MasterIngredient).filter(
-                    MasterIngredient.name.ilike(name)
-                ).first()
-                if existing:
-                    QMessageBox.warning(
-                        self,
-                        "Duplicate Ingredient",
-                        f"An ingredient named '{name}' already exists."
+                    data_service().submit(
+                        delete,
+                        deleted,
+                        lambda message: QMessageBox.warning(self, "Error", f"Failed to delete ingredient: {message}")
                     )
-                    self.load_ingredients()
-                    return
-                
-                # Create new ingredient
-                new_ingredient = MasterIngredient(
-                    name=name,
-                    category=self.table.cellWidget(item.row(), 1).currentText() or None,
-                    preferred_uom=self.table.cellWidget(item.row(), 2).currentText() or None
-                )
-                session.add(new_ingredient)
-                session.commit()
-                
-                # Reload to get everything in order
-                self.table.itemChanged.disconnect(self.save_new_ingredient)
-                self.load_ingredients()
-                self.table.itemChanged.connect(self.save_new_ingredient)
-                
         except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to save ingredient: {str(e)}")
+            QMessageBox.warning(self, "Error", f"Failed to delete ingredient: {str(e)}")
+
+    def warn_in_use(self, usage_count):
+        QMessageBox.warning(
+            self,
+            "Cannot Delete",
+            f"This ingredient is used in {usage_count} recipes and cannot be deleted."
+        )
+
+    def add_new_ingredient(self):
+        # Add an unsaved row and edit its name; it is saved once named
+        index = self.table_model.add_placeholder()
+        self.table.scrollTo(index)
+        self.table.setCurrentIndex(index)
+        self.table.edit(index)
 
     def merge_ingredients(self):
         # Get selected ingredients
-        selected_items = self.table.selectedItems()
-        if len(selected_items) < 2:
+        selected_rows = sorted(
+            index.row() for index in self.table.selectionModel().selectedRows()
+            if index.data(Qt.ItemDataRole.UserRole) is not None
+        )
+        if len(selected_rows) < 2:
             QMessageBox.warning(
                 self,
                 "Selection Required",
@@ -297,55 +208,78 @@ class IngredientManagementWindow(QWidget):
             )
             return
             
-        try:
-            # Get the first selected item as the primary
-            primary_row = selected_items[0].row()
-            primary_name = self.table.item(primary_row, 0).text()
-            primary_id = self.table.item(primary_row, 0).data(Qt.ItemDataRole.UserRole)
-            
-            # Confirm merge
-            confirm = QMessageBox(self)
-            confirm.setWindowTitle("Confirm Merge")
-            confirm.setText(
-                f"Merge selected ingredients into '{primary_name}'?\n"
-                "This cannot be undone."
-            )
-            confirm.setIcon(QMessageBox.Icon.Question)
-            confirm.setStandardButtons(
-                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-            )
-            
-            if confirm.exec() == QMessageBox.StandardButton.Yes:
-                # Update all references to point to the primary ingredient
-                for item in selected_items[1:]:
-                    old_id = self.table.item(item.row(), 0).data(Qt.ItemDataRole.UserRole)
-                    session.query(Ingredient).filter_by(
-                        master_ingredient_id=old_id
-                    ).update({"master_ingredient_id": primary_id})
-                    
-                    # Delete the old master ingredient
-                    session.query(MasterIngredient).filter_by(id=old_id).delete()
+        # Get the first selected item as the primary
+        primary_name = self.table_model.ingredient_name(selected_rows[0])
+        primary_id = self.table_model.ingredient_id(selected_rows[0])
+        old_ids = [self.table_model.ingredient_id(row) for row in selected_rows[1:]]
+        
+        # Confirm merge
+        confirm = QMessageBox(self)
+        confirm.setWindowTitle("Confirm Merge")
+        confirm.setText(
+            f"Merge selected ingredients into '{primary_name}'?\n"
+            "This cannot be undone."
+        )
+        confirm.setIcon(QMessageBox.Icon.Question)
+        confirm.setStandardButtons(
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        
+        if confirm.exec() == QMessageBox.StandardButton.Yes:
+            def merge(session):
+                # The merged ingredient keeps every allergen of the others
+                primary = session.get(MasterIngredient, primary_id)
+                if primary is not None:
+                    for (mask,) in session.query(MasterIngredient.allergen_mask).filter(
+                        MasterIngredient.id.in_(old_ids)
+                    ):
+                        primary.allergen_mask |= mask
+
+                # Repoint the recipe lines row by row so the session listeners
+                # only recompute the recipes that use the merged ingredients
+                for ingredient in session.query(Ingredient).filter(
+                    Ingredient.master_ingredient_id.in_(old_ids)
+                ):
+                    ingredient.master_ingredient_id = primary_id
+
+                # Delete the old master ingredients
+                for old_id in old_ids:
+                    old = session.get(MasterIngredient, old_id)
+                    if old is not None:
+                        session.delete(old)
                 
                 session.commit()
-                self.load_ingredients()
-                
+
+            def merged(result):
+                self.filter_ingredients()
                 QMessageBox.information(
                     self,
                     "Success",
                     "Ingredients merged successfully!"
                 )
-                
-        except Exception as e:
-            session.rollback()
-            QMessageBox.warning(self, "Error", f"Failed to merge ingredients: {str(e)}")
 
-    def filter_ingredients(self, search_text):
-        search_text = search_text.lower()
-        for row in range(self.table.rowCount()):
-            name_item = self.table.item(row, 0)
-            if name_item:
-                name = name_item.text().lower()
-                self.table.setRowHidden(row, search_text not in name)
+            data_service().submit(
+                merge,
+                merged,
+                lambda message: QMessageBox.warning(self, "Error", f"Failed to merge ingredients: {message}")
+            )
+
+    def filter_ingredients(self):
+        self.search_timer.stop()
+        search_text = self.search_box.text().strip()
+        if not search_text:
+            self.table_model.reload()
+        elif ingredient_catalog.loaded:
+            self.table_model.reload(ingredient_catalog.search(search_text, SEARCH_LIMIT))
+        else:
+            # The catalog is dropped whenever an ingredient changes; search
+            # again once it has been reloaded
+            data_service().submit(
+                ingredient_catalog.load,
+                lambda catalog: self.filter_ingredients(),
+                lambda message: QMessageBox.warning(self, "Error", f"Failed to search ingredients: {message}"),
+                key="ingredients:catalog"
+            )
 
     def back_to_main(self):
         self.close()
@@ -359,19 +293,19 @@ class IngredientManagementWindow(QWidget):
                 font-size: 14px;
             }
             
-            QTableWidget {
+            QTableView {
                 background-color: #2d2d2d;
                 border: none;
                 border-radius: 5px;
                 gridline-color: #3d3d3d;
             }
             
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
                 border: none;
             }
             
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #4a90e2;
                 color: white;
             }
@@ -0,0 +1,364 @@
+from PyQt6.QtCore import QAbstractTableModel, QEvent, QModelIndex, QRectF, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter
+from PyQt6.QtWidgets import QComboBox, QListWidget, QListWidgetItem, QStyledItemDelegate
+
+from controllers.data_service import data_service
+from models.allergens import ALLERGENS, allergen_names
+from models.models import MasterIngredient
+from models.usage_stats import usage_stats
+
+CATEGORIES = ["", "Protein", "Produce", "Dairy", "Dry Goods", "Spices", "Bakery", "Frozen", "Condiments"]
+UOMS = ["", "oz", "lb", "cup", "tsp", "tbsp", "qt", "gallon", "each"]
+
+NAME, CATEGORY, UOM, ALLERGEN_FLAGS, TIMES_USED, ACTIONS = range(6)
+HEADERS = ["Ingredient Name", "Category", "Preferred UOM", "Allergens", "Times Used", "Actions"]
+
+# Row field and label of each column written back to the database
+FIELDS = {
+    CATEGORY: (2, "category", "category"),
+    UOM: (3, "preferred_uom", "UOM"),
+    ALLERGEN_FLAGS: (4, "allergen_mask", "allergens"),
+}
+
+# Rows loaded per fetchMore call
+PAGE_SIZE = 200
+
+ROW_COLUMNS = (
+    MasterIngredient.id,
+    MasterIngredient.name,
+    MasterIngredient.category,
+    MasterIngredient.preferred_uom,
+    MasterIngredient.allergen_mask
+)
+
+
+def fetch_page(session, after_name, limit):
+    # Keyset pagination on the unique name column, so every page is an index
+    # range scan however deep the user has scrolled
+    query = session.query(*ROW_COLUMNS)
+    if after_name is not None:
+        query = query.filter(MasterIngredient.name > after_name)
+    return [list(row) for row in query.order_by(MasterIngredient.name).limit(limit)]
+
+
+def fetch_rows(session, ingredient_ids):
+    # Rows for search results, in the ranked order of the ids
+    rows = {
+        row[0]: list(row)
+        for row in session.query(*ROW_COLUMNS).filter(MasterIngredient.id.in_(ingredient_ids))
+    }
+    return [rows[ingredient_id] for ingredient_id in ingredient_ids if ingredient_id in rows]
+
+
+class MasterIngredientTableModel(QAbstractTableModel):
+    # Master ingredients as plain [id, name, category, uom, allergen mask]
+    # rows, paged in as the view scrolls, or a ranked list of search results.
+    # Edits are written through the data service.
+    error = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.usage_counts = {}
+        # Ranked ingredient ids while showing search results, else None
+        self.result_ids = None
+        self.last_name = None
+        self.exhausted = False
+        self.fetching = False
+        self.generation = 0
+
+    def reload(self, result_ids=None):
+        # Page through every ingredient, or show just the given ids in order.
+        # Results of pages requested before the reload are discarded.
+        self.result_ids = result_ids
+        self.generation += 1
+        self.beginResetModel()
+        self.rows = []
+        self.last_name = None
+        self.exhausted = False
+        self.fetching = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def ingredient_id(self, row):
+        return self.rows[row][0]
+
+    def ingredient_name(self, row):
+        return self.rows[row][1]
+
+    def row_of(self, ingredient_id):
+        for row, values in enumerate(self.rows):
+            if values[0] == ingredient_id:
+                return row
+        return None
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        ingredient_id, name, category, uom, mask = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.EditRole and column == ALLERGEN_FLAGS:
+            return mask
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if column == NAME:
+                return name
+            if column == CATEGORY:
+                return category or ""
+            if column == UOM:
+                return uom or ""
+            if column == ALLERGEN_FLAGS:
+                return ", ".join(allergen_names(mask))
+            if column == TIMES_USED:
+                return str(self.usage_counts.get(ingredient_id, 0))
+        elif role == Qt.ItemDataRole.UserRole:
+            return ingredient_id
+        elif role == Qt.ItemDataRole.TextAlignmentRole and column == TIMES_USED:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() in FIELDS:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        elif index.column() == NAME and self.rows[index.row()][0] is None:
+            # Only a new, unsaved ingredient can be named in place
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or not index.isValid():
+            return False
+        row = self.rows[index.row()]
+        column = index.column()
+        if column == NAME:
+            name = value.strip()
+            if not name or row[0] is not None:
+                return False
+            row[1] = name
+            self.dataChanged.emit(index, index)
+            self.save_new(row)
+            return True
+        if column in FIELDS:
+            if column == ALLERGEN_FLAGS:
+                value = value or 0
+            else:
+                value = value or None
+            field = FIELDS[column][0]
+            if row[field] == value:
+                return False
+            row[field] = value
+            self.dataChanged.emit(index, index)
+            if row[0] is not None:
+                self.update_field(row[0], column, value)
+            return True
+        return False
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self.exhausted and not self.fetching
+
+    def fetchMore(self, parent):
+        if parent.isValid() or self.exhausted or self.fetching:
+            return
+        self.fetching = True
+        generation = self.generation
+        after_name = self.last_name
+        result_ids = self.result_ids
+        first_page = after_name is None
+
+        def fetch(session):
+            if result_ids is not None:
+                rows = fetch_rows(session, result_ids)
+            else:
+                rows = fetch_page(session, after_name, PAGE_SIZE)
+            counts = dict(usage_stats.counts(session)) if first_page else None
+            return rows, counts
+
+        data_service().submit(
+            fetch,
+            lambda result: self.append_page(generation, *result),
+            lambda message: self.page_failed(generation, message)
+        )
+
+    def page_failed(self, generation, message):
+        # A failure from before a reset is stale; otherwise allow a retry
+        if generation != self.generation:
+            return
+        self.fetching = False
+        self.error.emit("Error", f"Failed to load ingredients: {message}")
+
+    def append_page(self, generation, rows, counts):
+        if generation != self.generation:
+            return
+        self.fetching = False
+        if counts is not None:
+            self.usage_counts = counts
+        # Search results arrive in one piece
+        self.exhausted = self.result_ids is not None or len(rows) < PAGE_SIZE
+        if rows:
+            self.last_name = rows[-1][1]
+        # Ingredients added in this window may already be listed
+        loaded = {row[0] for row in self.rows}
+        rows = [row for row in rows if row[0] not in loaded]
+        if rows:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+    # Writes
+
+    def update_field(self, ingredient_id, column, value):
+        _, attribute, label = FIELDS[column]
+
+        def save(session):
+            ingredient = session.get(MasterIngredient, ingredient_id)
+            if ingredient:
+                setattr(ingredient, attribute, value)
+                session.commit()
+
+        data_service().submit(
+            save,
+            on_error=lambda message: self.error.emit("Error", f"Failed to update {label}: {message}")
+        )
+
+    def add_placeholder(self):
+        # New rows go on top so paging further rows in never moves them
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.rows.insert(0, [None, "New Ingredient", None, None, 0])
+        self.endInsertRows()
+        return self.index(0, NAME)
+
+    def save_new(self, row):
+        name, category, uom, mask = row[1], row[2], row[3], row[4]
+
+        def save(session):
+            # Check for duplicates
+            existing = session.query(MasterIngredient).filter(
+                MasterIngredient.name.ilike(name)
+            ).first()
+            if existing:
+                return None
+            ingredient = MasterIngredient(name=name, category=category, preferred_uom=uom, allergen_mask=mask)
+            session.add(ingredient)
+            session.commit()
+            return ingredient.id
+
+        def saved(ingredient_id):
+            if ingredient_id is None:
+                self.remove_row(row)
+                self.error.emit("Duplicate Ingredient", f"An ingredient named '{name}' already exists.")
+                return
+            row[0] = ingredient_id
+            if row in self.rows:
+                index = self.index(self.rows.index(row), NAME)
+                self.dataChanged.emit(index, index)
+
+        data_service().submit(
+            save,
+            saved,
+            lambda message: self.error.emit("Error", f"Failed to save ingredient: {message}")
+        )
+
+    def remove_row(self, row):
+        if row in self.rows:
+            position = self.rows.index(row)
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self.rows[position]
+            self.endRemoveRows()
+
+    def remove_ingredient(self, ingredient_id):
+        position = self.row_of(ingredient_id)
+        if position is not None:
+            self.remove_row(self.rows[position])
+
+
+class ComboBoxDelegate(QStyledItemDelegate):
+    # Only the cell being edited gets a combo box; every other row is painted
+    def __init__(self, items, parent=None):
+        super().__init__(parent)
+        self.items = items
+
+    def createEditor(self, parent, option, index):
+        editor = QComboBox(parent)
+        editor.addItems(self.items)
+        editor.activated.connect(lambda _: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentIndex(max(editor.findText(index.data(Qt.ItemDataRole.EditRole)), 0))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.ItemDataRole.EditRole)
+
+
+class AllergenDelegate(QStyledItemDelegate):
+    # Edits an allergen mask as a checklist of models.allergens.ALLERGENS,
+    # written back when the editor closes
+    def createEditor(self, parent, option, index):
+        editor = QListWidget(parent)
+        for name in ALLERGENS:
+            item = QListWidgetItem(name, editor)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Unchecked)
+        return editor
+
+    def setEditorData(self, editor, index):
+        mask = index.data(Qt.ItemDataRole.EditRole) or 0
+        for position in range(editor.count()):
+            checked = mask & (1 << position)
+            editor.item(position).setCheckState(Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked)
+
+    def setModelData(self, editor, model, index):
+        mask = 0
+        for position in range(editor.count()):
+            if editor.item(position).checkState() == Qt.CheckState.Checked:
+                mask |= 1 << position
+        model.setData(index, mask, Qt.ItemDataRole.EditRole)
+
+    def updateEditorGeometry(self, editor, option, index):
+        # Drop down from the cell far enough to show every allergen
+        rect = option.rect
+        rect.setHeight(editor.sizeHintForRow(0) * editor.count() + 2 * editor.frameWidth())
+        editor.setGeometry(rect)
+
+
+class DeleteButtonDelegate(QStyledItemDelegate):
+    # Paints the red "×" button and reports clicks, without a widget per row
+    clicked = pyqtSignal(QModelIndex)
+
+    def paint(self, painter, option, index):
+        if index.data(Qt.ItemDataRole.UserRole) is None:
+            return
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        button = QRectF(option.rect).adjusted(6, 4, -6, -4)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#e25555"))
+        painter.drawRoundedRect(button, 3, 3)
+        painter.setPen(QColor("white"))
+        font = painter.font()
+        font.setBold(True)
+        painter.setFont(font)
+        painter.drawText(button, Qt.AlignmentFlag.AlignCenter, "×")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and index.data(Qt.ItemDataRole.UserRole) is not None):
+            self.clicked.emit(index)
+            return True
+        return False
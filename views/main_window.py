@@ -2,7 +2,10 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                            QLabel, QFrame)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
-from models.models import session, Recipe, MasterIngredient  # Add MasterIngredient here
+from models.models import Recipe, MasterIngredient  # Add MasterIngredient here
+from controllers.data_service import data_service
+from controllers.event_store import recent_event_count
+from models.costing import refresh_due_costs
 from .recipe_window import RecipeManagementWindow
 from .beo_window import BEOManagementWindow
 from .ingredient_management_window import IngredientManagementWindow  # Add this import too
@@ -38,7 +41,7 @@ class MainWindow(QWidget):
         recipe_card = self.create_card(
             "Recipe Management",
             "Create, edit, and manage your recipe database",
-            f"Active Recipes: {session.query(Recipe).count()}",
+            "Active Recipes: …",
             self.open_recipe_management
         )
         cards_layout.addWidget(recipe_card)
@@ -47,7 +50,7 @@ class MainWindow(QWidget):
         beo_card = self.create_card(
             "BEO Management",
             "Plan and manage banquet events",
-            "Recent Events: 0",
+            "Recent Events: …",
             self.open_beo_management
         )
         cards_layout.addWidget(beo_card)
@@ -56,13 +59,36 @@ class MainWindow(QWidget):
         ingredient_card = self.create_card(
             "Ingredient Management",
             "Manage master ingredients list and categories",
-            f"Total Ingredients: {session.query(MasterIngredient).count()}",
+            "Total Ingredients: …",
             self.open_ingredient_management
         )
         cards_layout.addWidget(ingredient_card)
 
         main_layout.addLayout(cards_layout)
 
+        self.recipe_stats = recipe_card.findChild(QLabel, "card-stats")
+        self.ingredient_stats = ingredient_card.findChild(QLabel, "card-stats")
+        self.event_stats = beo_card.findChild(QLabel, "card-stats")
+        self.load_stats()
+
+    def load_stats(self):
+        def fetch(session):
+            # Prices dated ahead may have come into effect since the last run
+            if refresh_due_costs(session):
+                session.commit()
+            return (
+                session.query(Recipe).count(),
+                session.query(MasterIngredient).count(),
+                recent_event_count(session)
+            )
+
+        def show(counts):
+            self.recipe_stats.setText(f"Active Recipes: {counts[0]}")
+            self.ingredient_stats.setText(f"Total Ingredients: {counts[1]}")
+            self.event_stats.setText(f"Recent Events: {counts[2]}")
+
+        data_service().submit(fetch, show, key="main:stats")
+
     def create_card(self, title, description, stats, click_handler):
         card = QFrame()
         card.setObjectName("card")
@@ -0,0 +1,233 @@
+from bisect import bisect_right
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt, pyqtSignal
+from sqlalchemy import or_
+
+from controllers.data_service import data_service
+from menu_categories import MENU_CATEGORIES
+from models.loaders import recipe_summaries
+from models.models import Recipe
+
+
+class TreeNode:
+    def __init__(self, name, parent=None, recipe_id=None, category=None, subcategory=None):
+        self.name = name
+        self.parent = parent
+        self.recipe_id = recipe_id
+        self.category = category
+        self.subcategory = subcategory
+        self.children = []
+        # Recipes are leaves; category, subcategory and root nodes load their
+        # recipes the first time they are expanded
+        self.fetched = recipe_id is not None
+        self.fetching = False
+
+    def row(self):
+        return self.parent.children.index(self) if self.parent else 0
+
+    def first_recipe_row(self):
+        for row, child in enumerate(self.children):
+            if child.recipe_id is not None:
+                return row
+        return len(self.children)
+
+
+class RecipeTreeModel(QAbstractItemModel):
+    # MENU_CATEGORIES hierarchy with recipes as leaves. Only (id, name,
+    # category, subcategory) is ever loaded, one node at a time, and saves and
+    # deletes are applied in place rather than by reloading the tree.
+
+    # (title, message) when a node fails to load
+    error = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = TreeNode("")
+        self.category_nodes = {}
+        self.recipe_nodes = {}
+        for category in sorted(MENU_CATEGORIES.keys()):
+            category_node = TreeNode(category, self.root, category=category)
+            self.root.children.append(category_node)
+            self.category_nodes[(category, None)] = category_node
+            for subcategory in MENU_CATEGORIES[category]:
+                subcategory_node = TreeNode(
+                    subcategory, category_node, category=category, subcategory=subcategory
+                )
+                category_node.children.append(subcategory_node)
+                self.category_nodes[(category, subcategory)] = subcategory_node
+
+    # Placement rules: recipes with a known category and subcategory go under
+    # the subcategory, otherwise under the category, otherwise at the root
+
+    def placement(self, category, subcategory):
+        if category in MENU_CATEGORIES:
+            if subcategory in MENU_CATEGORIES[category]:
+                return self.category_nodes[(category, subcategory)]
+            return self.category_nodes[(category, None)]
+        return self.root
+
+    def criteria(self, node):
+        if node is self.root:
+            return [or_(
+                Recipe.category.is_(None),
+                Recipe.category.notin_(list(MENU_CATEGORIES))
+            )]
+        if node.subcategory is not None:
+            return [Recipe.category == node.category, Recipe.subcategory == node.subcategory]
+        return [
+            Recipe.category == node.category,
+            or_(
+                Recipe.subcategory.is_(None),
+                Recipe.subcategory.notin_(MENU_CATEGORIES[node.category])
+            )
+        ]
+
+    # Qt model interface
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        parent_node = self.node(parent)
+        if column != 0 or not 0 <= row < len(parent_node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, parent_node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self.root:
+            return QModelIndex()
+        return self.createIndex(parent_node.row(), 0, parent_node)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        return bool(node.children) or not node.fetched
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return node.name
+        if role == Qt.ItemDataRole.UserRole:
+            return node.recipe_id
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return "Menu Items"
+        return None
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return not node.fetched and not node.fetching
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        if node.fetched or node.fetching:
+            return
+        node.fetching = True
+        criteria = self.criteria(node)
+        data_service().submit(
+            lambda session: recipe_summaries(session, *criteria),
+            lambda rows: self.fill(node, rows),
+            lambda message: self.fetch_failed(node, message)
+        )
+
+    def all_fetched(self):
+        return self.root.fetched and all(node.fetched for node in self.category_nodes.values())
+
+    def fetch_all(self):
+        # Load every remaining node with a single query, e.g. before filtering
+        if self.all_fetched():
+            return
+        data_service().submit(
+            recipe_summaries,
+            self.fill_all,
+            lambda message: self.error.emit("Error", f"Failed to load recipes: {message}"),
+            key="recipe-tree:all"
+        )
+
+    # Loading
+
+    def node_index(self, node):
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row(), 0, node)
+
+    def fill(self, node, rows):
+        node.fetching = False
+        if node.fetched:
+            return
+        node.fetched = True
+        if not rows:
+            # Drop the expand arrow of an empty node
+            index = self.node_index(node)
+            self.dataChanged.emit(index, index)
+            return
+        first = len(node.children)
+        self.beginInsertRows(self.node_index(node), first, first + len(rows) - 1)
+        for recipe_id, name, category, subcategory in rows:
+            recipe_node = TreeNode(name, node, recipe_id, category, subcategory)
+            node.children.append(recipe_node)
+            self.recipe_nodes[recipe_id] = recipe_node
+        self.endInsertRows()
+
+    def fetch_failed(self, node, message):
+        # Let the node be expanded again to retry
+        node.fetching = False
+        self.error.emit("Error", f"Failed to load recipes: {message}")
+
+    def fill_all(self, rows):
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(self.placement(row[2], row[3]), []).append(row)
+        for node in [self.root, *self.category_nodes.values()]:
+            self.fill(node, grouped.get(node, []))
+
+    # Incremental updates
+
+    def recipe_saved(self, recipe_id, name, category, subcategory):
+        self.recipe_deleted(recipe_id)
+        parent_node = self.placement(category, subcategory)
+        if not parent_node.fetched:
+            # It will be loaded with the rest of its node
+            return
+        first = parent_node.first_recipe_row()
+        names = [child.name for child in parent_node.children[first:]]
+        row = first + bisect_right(names, name)
+        self.beginInsertRows(self.node_index(parent_node), row, row)
+        recipe_node = TreeNode(name, parent_node, recipe_id, category, subcategory)
+        parent_node.children.insert(row, recipe_node)
+        self.recipe_nodes[recipe_id] = recipe_node
+        self.endInsertRows()
+
+    def recipe_deleted(self, recipe_id):
+        recipe_node = self.recipe_nodes.pop(recipe_id, None)
+        if recipe_node is None:
+            return
+        parent_node = recipe_node.parent
+        row = recipe_node.row()
+        self.beginRemoveRows(self.node_index(parent_node), row, row)
+        del parent_node.children[row]
+        self.endRemoveRows()
+
+
+_model = None
+
+
+def recipe_tree_model():
+    global _model
+    if _model is None:
+        _model = RecipeTreeModel()
+    return _model
@@ -1,22 +1,50 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                            QLabel, QLineEdit, QTextEdit, QComboBox, QFrame,
-                           QGridLayout,QFormLayout,QListWidget, QScrollArea, QMessageBox, QCompleter,
-                           QTreeWidget, QTreeWidgetItem)
+                           QGridLayout,QFormLayout,QListWidget, QScrollArea, QMessageBox,
+                           QTreeView)
 
-from PyQt6.QtCore import Qt, QStringListModel
+from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
-from models.models import session, Recipe, Ingredient, Allergen, MasterIngredient
+from models.allergens import ALLERGENS, allergen_names, ingredient_masks
+from models.ingredient_catalog import ingredient_catalog
+from models.loaders import recipe_ids_by_name
+from models.recipe_graph import YIELD_COLUMNS, recipe_yield
+from models.models import Recipe, Ingredient, Allergen
+from controllers.data_service import data_service
+from .ingredient_completion import ingredient_completion_model
+from .recipe_tree_model import recipe_tree_model
 from menu_categories import MENU_CATEGORIES
 
+
+def link_master_ingredients(session, ingredients):
+    # Resolve every line to its master ingredient from the in-memory catalog
+    # so the usage statistics see the recipe as soon as it is committed
+    catalog = ingredient_catalog.load(session)
+    for ingredient in ingredients:
+        entry = catalog.lookup(ingredient.ingredient)
+        ingredient.master_ingredient_id = entry[0] if entry else None
+
+
+def link_sub_recipes(session, ingredients):
+    # A line named after another recipe, and not after a master ingredient,
+    # uses that recipe; a recipe that ends up using itself fails the commit
+    unlinked = [ingredient for ingredient in ingredients if ingredient.master_ingredient_id is None]
+    recipe_ids = recipe_ids_by_name(session, [ingredient.ingredient for ingredient in unlinked])
+    for ingredient in ingredients:
+        ingredient.sub_recipe_id = recipe_ids.get(ingredient.ingredient) if ingredient in unlinked else None
+
+
 class RecipeManagementWindow(QWidget):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
         self.setWindowTitle("FEAST MASTER - Recipe Management")
         self.setMinimumSize(1000, 700)
-        self.current_recipe = None
+        self.current_recipe_id = None
         self.ingredient_rows = []
-        self.allergens = ["Dairy", "Eggs", "Peanuts", "Tree Nuts", "Fish", "Shellfish", "Soy", "Wheat"]
+        self.allergens = ALLERGENS
+        # Allergens of the open recipe that come from its linked ingredients
+        self.derived_allergens = set()
         
         # Create recipe list combo box before loading names
         self.recipe_list = QComboBox()
@@ -24,7 +52,6 @@ class RecipeManagementWindow(QWidget):
         
         self.setup_ui()
         self.apply_styles()
-        self.load_recipe_names()
 
     def setup_ui(self):
         main_layout = QHBoxLayout(self)  # Changed to horizontal layout
@@ -50,12 +77,14 @@ class RecipeManagementWindow(QWidget):
         search_box.setObjectName("search-box")
         left_layout.addWidget(search_box)
 
-        # New Tree Widget for recipes
-        self.recipe_tree = QTreeWidget()
-        self.recipe_tree.setHeaderLabels(["Menu Items"])
+        # Recipe tree, backed by the model shared with the BEO window
+        self.recipe_tree_model = recipe_tree_model()
+        self.recipe_tree_model.error.connect(self.tree_error)
+        self.recipe_tree = QTreeView()
+        self.recipe_tree.setModel(self.recipe_tree_model)
         self.recipe_tree.setObjectName("recipe-tree")
         self.recipe_tree.setMinimumHeight(300)
-        self.recipe_tree.itemClicked.connect(self.on_recipe_selected)
+        self.recipe_tree.clicked.connect(self.on_recipe_selected)
         left_layout.addWidget(self.recipe_tree)
 
         # Action Buttons
@@ -118,6 +147,24 @@ class RecipeManagementWindow(QWidget):
         details_layout.addWidget(QLabel("Description:"), 3, 0)
         details_layout.addWidget(self.menu_description_input, 3, 1)
 
+        # Yield: what one batch (the ingredients as listed) makes, and the
+        # portion served when the yield is a weight or volume
+        self.yield_quantity_input, self.yield_uom_input = self.amount_inputs("Qty", "portions, kg, qt...")
+        self.portion_size_input, self.portion_uom_input = self.amount_inputs("Size", "g, oz, ml...")
+        self.batch_increment_input = QLineEdit()
+        self.batch_increment_input.setPlaceholderText("Round batches up to a multiple of, e.g. 1 or 0.5")
+        self.batch_increment_input.setObjectName("ingredient-input")
+        for row, (label, widgets) in enumerate((
+            ("Yield per Batch:", (self.yield_quantity_input, self.yield_uom_input)),
+            ("Portion Size:", (self.portion_size_input, self.portion_uom_input)),
+            ("Batch Rounding:", (self.batch_increment_input,)),
+        ), 4):
+            row_layout = QHBoxLayout()
+            for widget in widgets:
+                row_layout.addWidget(widget)
+            details_layout.addWidget(QLabel(label), row, 0)
+            details_layout.addLayout(row_layout, row, 1)
+
         right_layout.addLayout(details_layout)
 
         # Ingredients Section
@@ -162,57 +209,38 @@ class RecipeManagementWindow(QWidget):
         back_btn.clicked.connect(self.back_to_main)
         save_btn.clicked.connect(self.save_recipe)
 
-    def load_recipe_names(self):
-            try:
-                self.recipe_tree.clear()
-                
-                # Create category items
-                category_items = {}
-                for category in sorted(MENU_CATEGORIES.keys()):
-                    category_item = QTreeWidgetItem([category])
-                    self.recipe_tree.addTopLevelItem(category_item)
-                    category_items[category] = category_item
-                    
-                    # Add subcategories if they exist
-                    if MENU_CATEGORIES[category]:
-                        for subcategory in MENU_CATEGORIES[category]:
-                            subcat_item = QTreeWidgetItem([subcategory])
-                            category_item.addChild(subcat_item)
-                            # Store with combined key for subcategories
-                            category_items[f"{category}|{subcategory}"] = subcat_item
-
-                # Add recipes to appropriate categories
-                recipes = session.query(Recipe).order_by(Recipe.name).all()
-                for recipe in recipes:
-                    recipe_item = QTreeWidgetItem([recipe.name])
-                    recipe_item.setData(0, Qt.ItemDataRole.UserRole, recipe.id)
-                    
-                    if recipe.category and recipe.subcategory:
-                        # Add to subcategory
-                        key = f"{recipe.category}|{recipe.subcategory}"
-                        if key in category_items:
-                            category_items[key].addChild(recipe_item)
-                    elif recipe.category:
-                        # Add to main category
-                        if recipe.category in category_items:
-                            category_items[recipe.category].addChild(recipe_item)
-                    else:
-                        # Add to root if no category
-                        self.recipe_tree.addTopLevelItem(recipe_item)
-
-                # Expand all categories
-                self.recipe_tree.expandAll()
-                
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Failed to load recipes: {str(e)}")
-
-    def on_recipe_selected(self, item):
+    def amount_inputs(self, quantity_placeholder, uom_placeholder):
+        quantity_input = QLineEdit()
+        quantity_input.setPlaceholderText(quantity_placeholder)
+        quantity_input.setObjectName("ingredient-input")
+        uom_input = QLineEdit()
+        uom_input.setPlaceholderText(uom_placeholder)
+        uom_input.setObjectName("ingredient-input")
+        return quantity_input, uom_input
+
+    def yield_inputs(self):
+        return (self.yield_quantity_input, self.yield_uom_input, self.portion_size_input,
+                self.portion_uom_input, self.batch_increment_input)
+
+    def selected_recipe(self):
+        # (id, name) of the selected recipe, or None for no selection or a category
+        indexes = self.recipe_tree.selectionModel().selectedIndexes()
+        if not indexes:
+            return None
+        recipe_id = indexes[0].data(Qt.ItemDataRole.UserRole)
+        if recipe_id is None:
+            return None
+        return recipe_id, indexes[0].data()
+
+    def tree_error(self, title, message):
+        # The tree model is shared, so only the window on screen reports
+        if self.isVisible():
+            QMessageBox.warning(self, title, message)
+
+    def on_recipe_selected(self, index):
         # Only load recipe if it's a leaf node (actual recipe, not a category)
-        if item.childCount() == 0:
-            recipe_name = item.text(0)
-            recipe = session.query(Recipe).filter_by(name=recipe_name).first()
-            if recipe:
-                self.edit_recipe()
+        if index.data(Qt.ItemDataRole.UserRole) is not None:
+            self.edit_recipe()
 
     def add_ingredient_row(self):
         row_widget = QFrame()
@@ -225,21 +253,15 @@ class RecipeManagementWindow(QWidget):
         ingredient_input.setPlaceholderText("Ingredient name")
         ingredient_input.setObjectName("ingredient-input")
         
-        # Create completer from master ingredients
-        master_ingredients = session.query(MasterIngredient.name).all()
-        ingredient_list = [item[0] for item in master_ingredients]
-        completer = QCompleter(ingredient_list)
-        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        completer.setFilterMode(Qt.MatchFlag.MatchContains)
-        ingredient_input.setCompleter(completer)
+        # Completer over the shared, in-memory master ingredient catalog
+        completion_model = ingredient_completion_model()
+        completion_model.attach(ingredient_input)
         
         # When an ingredient is selected, automatically fill in the preferred UOM
         def on_ingredient_selected(text):
-            master_ingredient = session.query(MasterIngredient).filter(
-                MasterIngredient.name.ilike(text)
-            ).first()
-            if master_ingredient and master_ingredient.preferred_uom:
-                uom_input.setText(master_ingredient.preferred_uom)
+            preferred_uom = completion_model.preferred_uom(text)
+            if preferred_uom:
+                uom_input.setText(preferred_uom)
                 
         ingredient_input.editingFinished.connect(
             lambda: on_ingredient_selected(ingredient_input.text())
@@ -279,72 +301,53 @@ class RecipeManagementWindow(QWidget):
             self.ingredients_layout.itemAt(index).widget().deleteLater()
             self.ingredient_rows.pop(index)
 
-    def load_recipe_names(self):
-        try:
-            self.recipe_tree.clear()
-            
-            # Create category items
-            category_items = {}
-            for category in sorted(MENU_CATEGORIES.keys()):
-                category_item = QTreeWidgetItem([category])
-                self.recipe_tree.addTopLevelItem(category_item)
-                category_items[category] = category_item
-                
-                # Add subcategories if they exist
-                if MENU_CATEGORIES[category]:
-                    for subcategory in MENU_CATEGORIES[category]:
-                        subcat_item = QTreeWidgetItem([subcategory])
-                        category_item.addChild(subcat_item)
-                        # Store with combined key for subcategories
-                        category_items[f"{category}|{subcategory}"] = subcat_item
-
-            # Add recipes to appropriate categories
-            recipes = session.query(Recipe).order_by(Recipe.name).all()
-            for recipe in recipes:
-                recipe_item = QTreeWidgetItem([recipe.name])
-                recipe_item.setData(0, Qt.ItemDataRole.UserRole, recipe.id)
-                
-                if recipe.category and recipe.subcategory:
-                    # Add to subcategory
-                    key = f"{recipe.category}|{recipe.subcategory}"
-                    if key in category_items:
-                        category_items[key].addChild(recipe_item)
-                elif recipe.category:
-                    # Add to main category
-                    if recipe.category in category_items:
-                        category_items[recipe.category].addChild(recipe_item)
-                else:
-                    # Add to root if no category
-                    self.recipe_tree.addTopLevelItem(recipe_item)
-
-            # Expand all categories
-            self.recipe_tree.expandAll()
-            
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to load recipes: {str(e)}")
-
     def edit_recipe(self):
-    # Get the selected item from the tree
-        selected_items = self.recipe_tree.selectedItems()
-        if not selected_items or selected_items[0].childCount() > 0:  # No selection or is a category
+        # Get the selected recipe from the tree
+        selected = self.selected_recipe()
+        if selected is None:  # No selection or is a category
             return
-            
-        recipe_name = selected_items[0].text(0)
-        recipe = session.query(Recipe).filter_by(name=recipe_name).first()
+        recipe_id = selected[0]
+
+        def fetch(session):
+            recipe = session.get(Recipe, recipe_id)
+            if recipe is None:
+                return None
+            return {
+                'id': recipe.id,
+                'name': recipe.name,
+                'menu_description': recipe.menu_description,
+                'category': recipe.category,
+                'subcategory': recipe.subcategory,
+                'ingredients': [
+                    (ingredient.ingredient, ingredient.quantity, ingredient.uom)
+                    for ingredient in recipe.ingredients
+                ],
+                'allergens': [allergen.allergen for allergen in recipe.allergens],
+                'derived_allergens': allergen_names(ingredient_masks(session, [recipe.id]).get(recipe.id, 0)),
+                'yield': tuple(recipe_yield(recipe)),
+            }
 
+        data_service().submit(
+            fetch,
+            self.show_recipe,
+            lambda message: QMessageBox.warning(self, "Error", f"Failed to load recipe: {message}"),
+            key="recipes:edit"
+        )
+
+    def show_recipe(self, recipe):
         if recipe:
-            self.current_recipe = recipe
-            self.recipe_name_input.setText(recipe.name)
-            self.menu_description_input.setText(recipe.menu_description)
+            self.current_recipe_id = recipe['id']
+            self.recipe_name_input.setText(recipe['name'])
+            self.menu_description_input.setText(recipe['menu_description'])
             
             # Set categories
-            if recipe.category:
-                index = self.category_combo.findText(recipe.category)
+            if recipe['category']:
+                index = self.category_combo.findText(recipe['category'])
                 if index >= 0:
                     self.category_combo.setCurrentIndex(index)
-                    self.update_subcategories(recipe.category)
-                    if recipe.subcategory:
-                        subindex = self.subcategory_combo.findText(recipe.subcategory)
+                    self.update_subcategories(recipe['category'])
+                    if recipe['subcategory']:
+                        subindex = self.subcategory_combo.findText(recipe['subcategory'])
                         if subindex >= 0:
                             self.subcategory_combo.setCurrentIndex(subindex)
 
@@ -352,26 +355,28 @@ class RecipeManagementWindow(QWidget):
             self.clear_ingredient_rows()
 
             # Add ingredient rows for each ingredient
-            for ingredient in recipe.ingredients:
+            for name, quantity, uom in recipe['ingredients']:
                 self.add_ingredient_row()
                 ingredient_input, quantity_input, uom_input = self.ingredient_rows[-1]
-                ingredient_input.setText(ingredient.ingredient)
-                quantity_input.setText(str(ingredient.quantity))
-                uom_input.setText(ingredient.uom)
-
-            # Set allergens
-            for i in range(self.allergen_list.count()):
-                item = self.allergen_list.item(i)
-                item.setSelected(item.text() in [a.allergen for a in recipe.allergens])
+                ingredient_input.setText(name)
+                quantity_input.setText(str(quantity))
+                uom_input.setText(uom)
+
+            self.show_allergens(recipe['allergens'], recipe['derived_allergens'])
+
+            for widget, value in zip(self.yield_inputs(), recipe['yield']):
+                if isinstance(value, float):
+                    value = f"{value:g}"
+                widget.setText(value or "")
     
-    def update_ingredient_completer(self):
-        master_ingredients = session.query(MasterIngredient.name).all()
-        ingredient_list = [item[0] for item in master_ingredients]
-        for row in self.ingredient_rows:
-            ingredient_input = row[0]
-            completer = ingredient_input.completer()
-            if completer:
-                completer.setModel(QStringListModel(ingredient_list))
+    def show_allergens(self, allergens, derived):
+        # Allergens from linked ingredients are shown ticked but not saved as
+        # the recipe's own; the recipe gets them for as long as it uses them
+        self.derived_allergens = set(derived)
+        for i in range(self.allergen_list.count()):
+            item = self.allergen_list.item(i)
+            item.setSelected(item.text() in allergens or item.text() in self.derived_allergens)
+            item.setToolTip("From ingredients" if item.text() in self.derived_allergens else "")
 
     def save_recipe(self):
         recipe_name = self.recipe_name_input.text()
@@ -388,89 +393,125 @@ class RecipeManagementWindow(QWidget):
             )
             return
 
-        try:
-            if self.current_recipe:
-                recipe = self.current_recipe
+        # Collect ingredients
+        ingredient_lines = []
+        for row in self.ingredient_rows:
+            ingredient_input, quantity_input, uom_input = row
+            ingredient_name = ingredient_input.text().strip()
+            quantity_text = quantity_input.text().strip()
+            uom = uom_input.text().strip()
+
+            if ingredient_name and quantity_text and uom:
+                try:
+                    ingredient_lines.append((ingredient_name, float(quantity_text), uom))
+                except ValueError:
+                    QMessageBox.warning(
+                        self,
+                        "Input Error",
+                        f"Invalid quantity for ingredient: {ingredient_name}",
+                        QMessageBox.StandardButton.Ok
+                    )
+                    return
+
+        allergens = [
+            item.text() for item in self.allergen_list.selectedItems() if item.text() not in self.derived_allergens
+        ]
+        recipe_id = self.current_recipe_id
+
+        # Yield columns: numbers for the quantities, text for the units
+        yield_values = {}
+        for column, widget in zip(YIELD_COLUMNS, self.yield_inputs()):
+            text = widget.text().strip()
+            if column.endswith('_uom'):
+                yield_values[column] = text or None
+                continue
+            try:
+                yield_values[column] = float(text) if text else None
+            except ValueError:
+                QMessageBox.warning(
+                    self,
+                    "Input Error",
+                    f"Invalid number for {column.replace('_', ' ')}: {text}",
+                    QMessageBox.StandardButton.Ok
+                )
+                return
+
+        def save(session):
+            if recipe_id:
+                recipe = session.get(Recipe, recipe_id)
                 recipe.name = recipe_name
                 recipe.menu_description = menu_description
                 recipe.category = category
                 recipe.subcategory = subcategory
                 recipe.ingredients.clear()
+                recipe.allergens.clear()
+                for column, value in yield_values.items():
+                    setattr(recipe, column, value)
             
             else:
                 recipe = Recipe(
                     name=recipe_name, 
                     menu_description=menu_description,
                     category=category,
-                    subcategory=subcategory
+                    subcategory=subcategory,
+                    **yield_values
                 )        
 
             # Add ingredients
-            for row in self.ingredient_rows:
-                ingredient_input, quantity_input, uom_input = row
-                ingredient_name = ingredient_input.text().strip()
-                quantity_text = quantity_input.text().strip()
-                uom = uom_input.text().strip()
-
-                if ingredient_name and quantity_text and uom:
-                    try:
-                        quantity = float(quantity_text)
-                        ingredient = Ingredient(
-                            ingredient=ingredient_name,
-                            quantity=quantity,
-                            uom=uom
-                        )
-                        recipe.ingredients.append(ingredient)
-                    except ValueError:
-                        QMessageBox.warning(
-                            self,
-                            "Input Error",
-                            f"Invalid quantity for ingredient: {ingredient_name}",
-                            QMessageBox.StandardButton.Ok
-                        )
-                        return
-
-                for item in self.allergen_list.selectedItems():  # Added back allergens
-                    allergen = Allergen(allergen=item.text())
-                    recipe.allergens.append(allergen)
-
+            for ingredient_name, quantity, uom in ingredient_lines:
+                recipe.ingredients.append(Ingredient(
+                    ingredient=ingredient_name,
+                    quantity=quantity,
+                    uom=uom
+                ))
+
+            for allergen in allergens:
+                recipe.allergens.append(Allergen(allergen=allergen))
+
+            link_master_ingredients(session, recipe.ingredients)
+            link_sub_recipes(session, recipe.ingredients)
             session.add(recipe)
             session.commit()
+            return recipe.id, recipe.name, recipe.category, recipe.subcategory
 
-            msg = QMessageBox(self)
-            msg.setWindowTitle("Success")
-            msg.setText(f"Recipe '{recipe_name}' saved successfully!")
-            msg.setIcon(QMessageBox.Icon.Information)
-            msg.setStyleSheet("""
-                QMessageBox {
-                    background-color: #2d2d2d;
-                    color: white;
-                }
-                QPushButton {
-                    background-color: #4a90e2;
-                    color: white;
-                    border: none;
-                    padding: 5px 15px;
-                    border-radius: 3px;
-                }
-                QPushButton:hover {
-                    background-color: #357abd;
-                }
-            """)
-            msg.exec()
-
-            self.clear_form()
-            self.load_recipe_names()
-
-        except Exception as e:
-            session.rollback()
-            QMessageBox.warning(self, "Error", f"Failed to save recipe: {str(e)}")
+        data_service().submit(
+            save,
+            self.recipe_saved,
+            lambda message: QMessageBox.warning(self, "Error", f"Failed to save recipe: {message}")
+        )
+
+    def recipe_saved(self, summary):
+        self.recipe_tree_model.recipe_saved(*summary)
+
+        msg = QMessageBox(self)
+        msg.setWindowTitle("Success")
+        msg.setText(f"Recipe '{summary[1]}' saved successfully!")
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.setStyleSheet("""
+            QMessageBox {
+                background-color: #2d2d2d;
+                color: white;
+            }
+            QPushButton {
+                background-color: #4a90e2;
+                color: white;
+                border: none;
+                padding: 5px 15px;
+                border-radius: 3px;
+            }
+            QPushButton:hover {
+                background-color: #357abd;
+            }
+        """)
+        msg.exec()
+
+        self.clear_form()
 
     def delete_recipe(self):
-        if self.recipe_list.currentIndex() == 0:  # "-- Select Recipe --"
+        selected = self.selected_recipe()
+        if selected is None:  # No selection or is a category
             return
-            
-        recipe_name = self.recipe_list.currentText()
+        recipe_id, recipe_name = selected
         
         confirm = QMessageBox(self)
         confirm.setWindowTitle("Confirm Delete")
@@ -497,33 +538,41 @@ class RecipeManagementWindow(QWidget):
         """)
         
         if confirm.exec() == QMessageBox.StandardButton.Yes:
-            recipe = session.query(Recipe).filter_by(name=recipe_name).first()
-            if recipe:
-                try:
+            def delete(session):
+                recipe = session.get(Recipe, recipe_id)
+                if recipe:
                     session.delete(recipe)
                     session.commit()
-                    self.load_recipe_names()
-                    self.clear_form()
-                    
-                    QMessageBox.information(
-                        self,
-                        "Success",
-                        f"Recipe '{recipe_name}' has been deleted.",
-                        QMessageBox.StandardButton.Ok
-                    )
-                except Exception as e:
-                    session.rollback()
-                    QMessageBox.warning(
-                        self,
-                        "Error",
-                        f"Failed to delete recipe: {str(e)}",
-                        QMessageBox.StandardButton.Ok
-                    )
+
+            def deleted(result):
+                self.recipe_tree_model.recipe_deleted(recipe_id)
+                self.clear_form()
+                
+                QMessageBox.information(
+                    self,
+                    "Success",
+                    f"Recipe '{recipe_name}' has been deleted.",
+                    QMessageBox.StandardButton.Ok
+                )
+
+            data_service().submit(
+                delete,
+                deleted,
+                lambda message: QMessageBox.warning(
+                    self,
+                    "Error",
+                    f"Failed to delete recipe: {message}",
+                    QMessageBox.StandardButton.Ok
+                )
+            )
 
     def clear_form(self):
-        self.current_recipe = None
+        self.current_recipe_id = None
         self.recipe_name_input.clear()
         self.menu_description_input.clear()
+        for widget in self.yield_inputs():
+            widget.clear()
+        self.show_allergens([], [])
         self.clear_ingredient_rows()
         self.add_ingredient_row()
         self.recipe_list.setCurrentIndex(0)